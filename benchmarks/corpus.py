@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Times the compiler phases on the valid stories of the e2e corpus:
+    lex: the tokens of a story (also part of parse)
+    parse: the parse tree
+    lowering: the lowering passes
+    semantics: the function and type resolvers
+    folding: the constant folding
+    json: the JSON compiler
+The throughput of every phase is reported for the whole corpus, together
+with the peak memory traced while compiling the corpus and single stories.
+
+The results can be written as JSON with -o and compared with a previous
+run with --baseline, which fails if a phase became slower than the
+threshold.
+
+Usage: python benchmarks/corpus.py [-n RUNS] [-o RESULTS] [--baseline FILE]
+                                   [--threshold RATIO] [PATTERN]
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from glob import glob
+from os import path
+
+root_dir = path.dirname(path.dirname(path.realpath(__file__)))
+e2e_dir = path.join(root_dir, 'tests', 'e2e')
+
+phases = ('lex', 'parse', 'lowering', 'semantics', 'folding', 'json')
+
+
+def load_corpus(pattern):
+    """
+    Loads the stories which have a compiled .json next to them.
+    """
+    sys.path.insert(0, e2e_dir)
+    from utils import parse_features
+    from storyscript.Features import Features
+    corpus = OrderedDict()
+    for story in sorted(glob(path.join(e2e_dir, '**', pattern),
+                             recursive=True)):
+        if not story.endswith('.story') or \
+                not path.exists(story[:-len('.story')] + '.json'):
+            continue
+        with io.open(story, 'r') as f:
+            source = f.read()
+        features = Features(parse_features({'globals': True}, source))
+        corpus[path.relpath(story, e2e_dir)] = (source, features)
+    return corpus
+
+
+def compile_story(source, features, parser):
+    """
+    Compiles a story, returning the times of its phases and passes.
+    """
+    from storyscript.Profiler import Profile, phase
+    from storyscript.Story import Story
+    story = Story(source, features)
+    story.profile = Profile()
+    with phase(story.profile, 'lex'):
+        list(story.lex(parser))
+    story.parse(parser=parser)
+    story.compile()
+    return {name: measures['time']
+            for name, measures in story.profile.phases.items()}
+
+
+def time_corpus(corpus, parser, runs):
+    """
+    Returns the median time of the phases of every story.
+    """
+    times = {storypath: [] for storypath in corpus}
+    for i in range(runs):
+        for storypath, (source, features) in corpus.items():
+            times[storypath].append(compile_story(source, features, parser))
+    medians = OrderedDict()
+    for storypath, results in times.items():
+        names = results[0].keys()
+        medians[storypath] = OrderedDict(
+            (name, statistics.median(r[name] for r in results))
+            for name in names)
+    return medians
+
+
+def trace_memory(corpus, parser):
+    """
+    Returns the peak memory of compiling the corpus and of every story.
+    """
+    tracemalloc.start()
+    for source, features in corpus.values():
+        compile_story(source, features, parser)
+    corpus_peak = tracemalloc.get_traced_memory()[1]
+    peaks = OrderedDict()
+    for storypath, (source, features) in corpus.items():
+        tracemalloc.clear_traces()
+        compile_story(source, features, parser)
+        peaks[storypath] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return corpus_peak, peaks
+
+
+def throughput(seconds, lines, stories):
+    return OrderedDict((
+        ('time', seconds),
+        ('lines_per_sec', lines / seconds if seconds else None),
+        ('stories_per_sec', stories / seconds if seconds else None),
+    ))
+
+
+def benchmark(corpus, runs):
+    from storyscript.parser import Parser
+    parser = Parser()
+    # warm up the parser and the mutation table
+    for source, features in corpus.values():
+        compile_story(source, features, parser)
+    medians = time_corpus(corpus, parser, runs)
+    corpus_peak, peaks = trace_memory(corpus, parser)
+
+    stories = OrderedDict()
+    totals = OrderedDict((name, 0.0) for name in phases)
+    lines = 0
+    for storypath, times in medians.items():
+        story_lines = len(corpus[storypath][0].splitlines())
+        lines += story_lines
+        for name in phases:
+            totals[name] += times.get(name, 0.0)
+        stories[storypath] = OrderedDict((
+            ('lines', story_lines),
+            ('phases', times),
+            ('peak_memory', peaks[storypath]),
+        ))
+    # lexing is part of parsing
+    totals['total'] = sum(totals[name] for name in phases if name != 'lex')
+    return OrderedDict((
+        ('python', platform.python_version()),
+        ('runs', runs),
+        ('corpus', OrderedDict((
+            ('stories', len(corpus)),
+            ('lines', lines),
+            ('phases', OrderedDict(
+                (name, throughput(seconds, lines, len(corpus)))
+                for name, seconds in totals.items())),
+            ('peak_memory', corpus_peak),
+        ))),
+        ('stories', stories),
+    ))
+
+
+def regressions(results, baseline, threshold):
+    """
+    Lists the phases of the corpus which became slower than the baseline
+    by more than `threshold`.
+    """
+    slower = []
+    old_phases = baseline['corpus']['phases']
+    for name, measures in results['corpus']['phases'].items():
+        old = old_phases.get(name)
+        if old is None or not old['time']:
+            continue
+        ratio = measures['time'] / old['time'] - 1
+        if ratio > threshold:
+            slower.append((name, old['time'], measures['time'], ratio))
+    return slower
+
+
+def print_results(results, slowest=5):
+    corpus = results['corpus']
+    print(f'{corpus["stories"]} stories, {corpus["lines"]} lines, '
+          f'median of {results["runs"]} runs')
+    print(f'{"phase":<10} {"time":>10} {"lines/s":>10} {"stories/s":>10}')
+    for name, measures in corpus['phases'].items():
+        print(f'{name:<10} {measures["time"] * 1000:>8.1f}ms '
+              f'{measures["lines_per_sec"] or 0:>10.0f} '
+              f'{measures["stories_per_sec"] or 0:>10.0f}')
+    print(f'peak memory: {corpus["peak_memory"] / 2**20:.1f} MiB')
+
+    def total(story):
+        times = story[1]['phases']
+        return sum(times.get(name, 0.0) for name in phases if name != 'lex')
+
+    print('slowest stories:')
+    stories = sorted(results['stories'].items(), key=total, reverse=True)
+    for storypath, story in stories[:slowest]:
+        print(f'  {storypath:<50} {total((storypath, story)) * 1000:>8.1f}ms '
+              f'{story["peak_memory"] / 2**10:>8.0f} KiB')
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip())
+    args.add_argument('pattern', nargs='?', default='*.story',
+                      help='Glob of the stories in tests/e2e')
+    args.add_argument('-n', dest='runs', type=int, default=5)
+    args.add_argument('-o', dest='output',
+                      help='Write the results as JSON to a file')
+    args.add_argument('--baseline',
+                      help='Fail if a phase is slower than in these results')
+    args.add_argument('--threshold', type=float, default=0.1,
+                      help='Allowed slowdown against the baseline')
+    options = args.parse_args()
+
+    sys.path.insert(0, root_dir)
+    corpus = load_corpus(options.pattern)
+    if not corpus:
+        print(f'No stories match {options.pattern}')
+        sys.exit(1)
+    start = time.perf_counter()
+    results = benchmark(corpus, options.runs)
+    print_results(results)
+    print(f'benchmarked in {time.perf_counter() - start:.1f}s')
+
+    if options.output:
+        with io.open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if options.baseline:
+        with io.open(options.baseline, 'r') as f:
+            baseline = json.load(f)
+        slower = regressions(results, baseline, options.threshold)
+        for name, old, new, ratio in slower:
+            print(f'{name} regressed: {old * 1000:.1f}ms -> '
+                  f'{new * 1000:.1f}ms (+{ratio:.0%})')
+        if slower:
+            sys.exit(1)
+        print(f'No phase regressed by more than {options.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Times the JSON compiler on a generated story with long if/else if chains,
+try/catch blocks, service assignments and services in nested output scopes.
+
+Usage: python benchmarks/json_lines.py [-n RUNS] [-l LINES] [-c CHAIN]
+"""
+import argparse
+import statistics
+import sys
+from os import path
+
+root_dir = path.dirname(path.dirname(path.realpath(__file__)))
+
+
+def generate(lines, chain):
+    """
+    Generates a story of about `lines` lines, whose if/else if chains have
+    `chain` branches.
+    """
+    story = []
+    block = 0
+    while len(story) < lines:
+        story.append(f'v{block} = {block}')
+        story.append(f'if v{block} == 0')
+        story.append(f'    r{block}_0 = alpine echo message: "0"')
+        for i in range(1, chain):
+            story.append(f'else if v{block} == {i}')
+            story.append(f'    r{block}_{i} = alpine echo message: "{i}"')
+        story.append('else')
+        story.append(f'    foreach [1, 2] as item{block}')
+        story.append(f'        alpine echo message: "{{item{block}}}"')
+        story.append('try')
+        story.append(f'    t{block} = alpine echo message: "try"')
+        story.append(f'catch as e{block}')
+        story.append(f'    c{block} = alpine echo message: "catch"')
+        block += 1
+    return '\n'.join(story) + '\n'
+
+
+def compile_story(source, parser):
+    from storyscript.Features import Features
+    from storyscript.Profiler import Profile
+    from storyscript.Story import Story
+    story = Story(source, features=Features(None))
+    story.profile = Profile()
+    story.parse(parser=parser)
+    story.compile()
+    return story.profile.phases['json']['time']
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip())
+    args.add_argument('-n', dest='runs', type=int, default=5)
+    args.add_argument('-l', dest='lines', type=int, default=10000)
+    args.add_argument('-c', dest='chain', type=int, default=20)
+    options = args.parse_args()
+
+    sys.path.insert(0, root_dir)
+    from storyscript.parser import Parser
+    source = generate(options.lines, options.chain)
+    parser = Parser()
+    seconds = statistics.median(compile_story(source, parser)
+                                for i in range(options.runs))
+    print(f'{len(source.splitlines())} lines, chains of {options.chain}, '
+          f'median of {options.runs} runs')
+    print(f'{"json":<24} {seconds * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Times the symbol resolution of deeply nested blocks:
+    story: the semantic analysis of a generated story with nested
+        foreach, if/else and try blocks, which declare variables on every
+        level and use the variables of the outer levels
+    resolve: resolving the variables of all levels from the innermost of
+        nested scopes
+
+Usage: python benchmarks/scopes.py [-n RUNS] [-d DEPTH] [-v VARIABLES]
+"""
+import argparse
+import statistics
+import sys
+import time
+from os import path
+
+root_dir = path.dirname(path.dirname(path.realpath(__file__)))
+
+blocks = ('foreach [1, 2] as i{level}', 'if v0_0 > 0', 'try')
+
+
+def generate(depth, variables):
+    """
+    Generates a story with `depth` nested blocks and `variables` variables
+    per block.
+    """
+    lines = []
+    closing = []
+    for level in range(depth):
+        indent = '    ' * level
+        for i in range(variables):
+            # use a variable of an outer level
+            used = f'v{level // 2}_{i}' if level else str(i)
+            lines.append(f'{indent}v{level}_{i} = {used} + 1')
+        if level == depth - 1:
+            break
+        block = blocks[level % len(blocks)]
+        lines.append(indent + block.format(level=level))
+        if block == 'try':
+            closing.append(f'{indent}catch as e{level}\n{indent}    x = 1')
+        elif block.startswith('if'):
+            closing.append(f'{indent}else\n{indent}    x = 2')
+        else:
+            closing.append(None)
+    for close in reversed(closing):
+        if close is not None:
+            lines.append(close)
+    return '\n'.join(lines) + '\n'
+
+
+def compile_story(source, parser):
+    from storyscript.Features import Features
+    from storyscript.Profiler import Profile
+    from storyscript.Story import Story
+    story = Story(source, features=Features(None))
+    story.profile = Profile()
+    story.parse(parser=parser)
+    story.compile()
+    return story.profile.phases
+
+
+def resolve(depth, variables):
+    """
+    Resolves all variables of `depth` nested scopes from the innermost.
+    """
+    from storyscript.compiler.semantics.symbols.Scope import Scope
+    from storyscript.compiler.semantics.symbols.Symbols import Symbol
+    from storyscript.compiler.semantics.types.Types import IntType
+    scope = Scope.root()
+    names = []
+    for level in range(depth):
+        scope = Scope(parent=scope)
+        for i in range(variables):
+            name = f'v{level}_{i}'
+            scope.insert(Symbol(name, IntType.instance()))
+            names.append(name)
+    start = time.perf_counter()
+    for i in range(10):
+        for name in names:
+            scope.resolve(name)
+    return time.perf_counter() - start
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip())
+    args.add_argument('-n', dest='runs', type=int, default=5)
+    args.add_argument('-d', dest='depth', type=int, default=50)
+    args.add_argument('-v', dest='variables', type=int, default=40)
+    options = args.parse_args()
+
+    sys.path.insert(0, root_dir)
+    from storyscript.parser import Parser
+    source = generate(options.depth, options.variables)
+    parser = Parser()
+    compile_story(source, parser)
+    runs = [compile_story(source, parser) for i in range(options.runs)]
+    print(f'{options.depth} levels, '
+          f'{options.depth * options.variables} variables, '
+          f'median of {options.runs} runs')
+    seconds = statistics.median(r['semantics/TypeResolver']['time']
+                                for r in runs)
+    print(f'{"story: TypeResolver":<24} {seconds * 1000:>8.1f}ms')
+    seconds = statistics.median(resolve(options.depth, options.variables)
+                                for i in range(options.runs))
+    print(f'{"resolve: 10 lookups/var":<24} {seconds * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Times the semantic analysis of a generated story which is heavy on nested
+list and map types, e.g. Map[string,List[int]], with their indexing,
+arithmetic and casts, and the type operations on such types on their own.
+
+Usage: python benchmarks/semantic_types.py [-n RUNS] [-b BLOCKS]
+"""
+import argparse
+import statistics
+import sys
+import time
+from os import path
+
+root_dir = path.dirname(path.dirname(path.realpath(__file__)))
+
+block = """
+m{i} = {{"a": [{i}, 2], "b": [3, 4.5]}}
+l{i} = m{i}["a"] + [1, 2]
+n{i} = {{"x": m{i}, "y": {{"z": [1.0]}}}}
+k{i} = n{i}["x"]["b"][0] + 1.5
+c{i} = [m{i}, m{i}] as List[Map[string,List[float]]]
+d{i} = {{"a": [[1], [2.0]]}} as Map[string,List[List[float]]]
+e{i} = d{i}["a"][0][0] * 2 + k{i}
+f{i} = [n{i}, {{"x": {{"a": [1]}}, "y": {{"z": [2]}}}}]
+"""
+
+
+def compile_story(source, parser):
+    from storyscript.Features import Features
+    from storyscript.Profiler import Profile
+    from storyscript.Story import Story
+    story = Story(source, features=Features(None))
+    story.profile = Profile()
+    story.parse(parser=parser)
+    story.compile()
+    return story.profile.phases
+
+
+def type_operations(n):
+    """
+    Builds nested types and compares, converts and adds them `n` times.
+    """
+    from lark.lexer import Token
+    from storyscript.compiler.semantics.types.Types import FloatType, \
+        IntType, ListType, MapType, StringType
+    plus = Token('PLUS', '+')
+    start = time.perf_counter()
+    for i in range(n):
+        ints = MapType(StringType.instance(), ListType(IntType.instance()))
+        floats = MapType(StringType.instance(),
+                         ListType(FloatType.instance()))
+        assert ints != floats
+        ints.implicit_to(floats)
+        ListType(ints).binary_op(ListType(floats), plus)
+    return time.perf_counter() - start
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip())
+    args.add_argument('-n', dest='runs', type=int, default=10)
+    args.add_argument('-b', dest='blocks', type=int, default=200)
+    options = args.parse_args()
+
+    sys.path.insert(0, root_dir)
+    from storyscript.compiler.semantics.types import Types
+    from storyscript.parser import Parser
+    source = ''.join(block.format(i=i) for i in range(options.blocks))
+    parser = Parser()
+    compile_story(source, parser)
+    runs = [compile_story(source, parser) for i in range(options.runs)]
+    lines = len(source.splitlines())
+    print(f'{options.blocks} blocks, {lines} lines, '
+          f'median of {options.runs} runs')
+    for name in ('semantics/FunctionResolver', 'semantics/TypeResolver',
+                 'semantics'):
+        seconds = statistics.median(r[name]['time'] for r in runs)
+        print(f'{name:<28} {seconds * 1000:>8.1f}ms')
+    seconds = statistics.median(type_operations(10000)
+                                for i in range(options.runs))
+    print(f'{"10000 type operations":<28} {seconds * 1000:>8.1f}ms')
+    interned = getattr(Types.BaseType, '_interned', None)
+    if interned is not None:
+        print(f'{len(interned)} interned types')
+
+
+if __name__ == '__main__':
+    main()
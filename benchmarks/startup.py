@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the startup time of the parser paths:
+    cached: the on-disk parser cache (warm cache)
+    dynamic: building the LALR tables from scratch (cold cache)
+
+Usage: python benchmarks/startup.py [-n RUNS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+
+root_dir = path.dirname(path.dirname(path.realpath(__file__)))
+
+program = """
+import time
+start = time.perf_counter()
+from storyscript.parser import Parser, ParserCache
+imported = time.perf_counter()
+Parser(cache=ParserCache({cache!r}))
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def run(cache):
+    code = program.format(cache=cache)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], cwd=root_dir,
+                         stdout=subprocess.PIPE, check=True,
+                         universal_newlines=True).stdout
+    total = time.perf_counter() - start
+    imported, parser = map(float, out.split())
+    return total, imported, parser
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip())
+    args.add_argument('-n', dest='runs', type=int, default=5)
+    runs = args.parse_args().runs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = path.join(tmp, 'cache')
+        paths = {
+            'cached': lambda i: run(cache),
+            'dynamic': lambda i: run(path.join(tmp, f'cold{i}')),
+        }
+        # warm up the on-disk cache
+        run(cache)
+        print(f'{"path":<10} {"process":>10} {"import":>10} {"parser":>10}')
+        for name, fn in paths.items():
+            results = [fn(i) for i in range(runs)]
+            medians = [statistics.median(r) * 1000 for r in zip(*results)]
+            print(f'{name:<10}' + ''.join(f'{m:>8.1f}ms' for m in medians))
+
+
+if __name__ == '__main__':
+    os.environ.pop('STORYSCRIPT_CACHE_DIR', None)
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the child lookups of Tree.node against the previous lookups, which
+split every path, on the e2e corpus:
+    lookups: replays all lookups of compiling the corpus on the final trees
+    compile: compiles the whole corpus
+
+Usage: python benchmarks/tree_lookup.py [-n RUNS]
+"""
+import argparse
+import io
+import statistics
+import sys
+import time
+from glob import glob
+from os import path
+
+root_dir = path.dirname(path.dirname(path.realpath(__file__)))
+e2e_dir = path.join(root_dir, 'tests', 'e2e')
+
+
+def load_corpus():
+    sys.path.insert(0, e2e_dir)
+    from utils import parse_features
+    corpus = []
+    for story in sorted(glob(path.join(e2e_dir, '**', '*.story'),
+                             recursive=True)):
+        with io.open(story, 'r') as f:
+            source = f.read()
+        corpus.append((source, parse_features({'globals': True}, source)))
+    return corpus
+
+
+def compile_corpus(corpus):
+    from storyscript.Api import Api
+    start = time.perf_counter()
+    for source, features in corpus:
+        Api.loads(source, features)
+    return time.perf_counter() - start
+
+
+def replay_lookups(lookups, fn):
+    start = time.perf_counter()
+    for tree, name in lookups:
+        fn(tree, name)
+    return time.perf_counter() - start
+
+
+def split_node(tree, path):
+    current = None
+    for shard in path.split('.'):
+        if current is None:
+            current = tree.walk(tree, shard)
+        else:
+            current = tree.walk(current, shard)
+    return current
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.strip())
+    args.add_argument('-n', dest='runs', type=int, default=5)
+    runs = args.parse_args().runs
+
+    sys.path.insert(0, root_dir)
+    from storyscript.parser import Tree
+    corpus = load_corpus()
+    node = Tree.node
+    lookups = []
+
+    def recorded(self, path):
+        lookups.append((self, path))
+        return node(self, path)
+
+    # warm up the parser and record the lookups of one run
+    Tree.node = recorded
+    compile_corpus(corpus)
+    Tree.node = node
+
+    modes = {
+        'node': node,
+        'split': split_node,
+    }
+    print(f'{len(corpus)} stories, {len(lookups)} lookups per run')
+    print(f'{"mode":<10} {"lookups":>10} {"compile":>10}')
+    for name, fn in modes.items():
+        Tree.node = fn
+        replay = statistics.median(replay_lookups(lookups, fn)
+                                   for i in range(runs))
+        full = statistics.median(compile_corpus(corpus)
+                                 for i in range(runs))
+        print(f'{name:<10} {replay * 1000:>8.1f}ms {full * 1000:>8.1f}ms')
+    Tree.node = node
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+import asyncio
+
 from .Bundle import Bundle
 from .Features import Features
+from .Profiler import Profile, Profiler
 from .Story import Story
-from .exceptions import StoryError
+from .exceptions import BundleError, StoryError
 
 
 class StoryscriptCompilationResult:
@@ -16,13 +19,16 @@ class StoryscriptCompilationResult:
         self._errors = errors
         self._deprecations = []
         self._warnings = []
+        self._profile = None
 
     @classmethod
-    def from_result(cls, story):
+    def from_result(cls, story, profile=None):
         """
         Creates a CompilationResult from a result.
         """
-        return cls(story, errors=[])
+        result = cls(story, errors=[])
+        result._profile = profile
+        return result
 
     @classmethod
     def from_error(cls, error):
@@ -55,6 +61,13 @@ class StoryscriptCompilationResult:
         """
         return self._deprecations
 
+    def profile(self):
+        """
+        Returns the time and the allocated memory blocks of the phases of
+        the compilation, if it was profiled.
+        """
+        return self._profile
+
     def success(self):
         """
         Returns `True` if the compilation succeeded.
@@ -74,14 +87,21 @@ class Api:
     Exposes functionalities for external use
     """
     @staticmethod
-    def loads(string, features=None):
+    def loads(string, features=None, profile=False):
         """
-        Load story from a string.
+        Load story from a string. With `profile`, the phases of the
+        compilation are profiled.
         """
         features = Features(features)
         try:
-            s = Story(string, features).process()
-            return StoryscriptCompilationResult.from_result(s)
+            story = Story(string, features)
+            if profile:
+                story.profile = Profile()
+            s = story.process()
+            phases = None
+            if profile:
+                phases = story.profile.phases
+            return StoryscriptCompilationResult.from_result(s, phases)
         except StoryError as e:
             return StoryscriptCompilationResult.from_error(e)
         except Exception as e:
@@ -111,16 +131,85 @@ class Api:
                 return StoryscriptCompilationResult.from_error(e)
 
     @staticmethod
-    def load_map(files, features=None):
+    async def aloads(string, features=None, executor=None, semaphore=None):
+        """
+        Load story from a string without blocking the event loop. The story
+        is compiled in `executor`, which may be a thread or process pool, or
+        in the default executor of the loop. If `semaphore` is given, the
+        compilation waits for it.
+        """
+        features = Features(features)
+        bundle = Bundle(story_files={'story': string}, features=features)
+        try:
+            await bundle.acompile('story', executor=executor,
+                                  semaphore=semaphore)
+            s = bundle.stories['story']
+            return StoryscriptCompilationResult.from_result(s)
+        except StoryError as e:
+            return StoryscriptCompilationResult.from_error(e)
+        except asyncio.CancelledError:
+            # an Exception before Python 3.8
+            raise
+        except Exception as e:
+            if features.debug:
+                raise e
+            else:
+                e = StoryError.internal_error(e)
+                return StoryscriptCompilationResult.from_error(e)
+
+    @staticmethod
+    async def aload_map(files, features=None, executor=None, semaphore=None,
+                        all_errors=False):
         """
-        Load multiple stories from a file mapping
+        Load multiple stories from a file mapping without blocking the event
+        loop. The stories are compiled concurrently like with `aloads`.
+        With `all_errors`, the errors of all stories are returned.
         """
         features = Features(features)
         try:
-            s = Bundle(story_files=files, features=features).bundle()
+            bundle = Bundle(story_files=files, features=features)
+            s = await bundle.abundle(executor=executor, semaphore=semaphore,
+                                     all_errors=all_errors)
             return StoryscriptCompilationResult.from_result(s)
         except StoryError as e:
             return StoryscriptCompilationResult.from_error(e)
+        except BundleError as e:
+            return StoryscriptCompilationResult(None, errors=e.errors)
+        except asyncio.CancelledError:
+            # an Exception before Python 3.8
+            raise
+        except Exception as e:
+            if features.debug:
+                raise e
+            else:
+                e = StoryError.internal_error(e)
+                return StoryscriptCompilationResult.from_error(e)
+
+    @staticmethod
+    def load_map(files, features=None, jobs=1, all_errors=False,
+                 profile=False):
+        """
+        Load multiple stories from a file mapping, compiling them with `jobs`
+        processes. With `all_errors`, the errors of all stories are returned
+        instead of the first error. With `profile`, the phases of compiling
+        every story are profiled.
+        """
+        features = Features(features)
+        try:
+            profiler = None
+            if profile:
+                profiler = Profiler()
+            bundle = Bundle(story_files=files, features=features,
+                            profiler=profiler)
+            s = bundle.bundle(jobs=jobs, all_errors=all_errors)
+            results = None
+            if profile:
+                results = profiler.results()
+            return StoryscriptCompilationResult.from_result(s, results)
+        except StoryError as e:
+            return StoryscriptCompilationResult.from_error(e)
+        except BundleError as e:
+            return StoryscriptCompilationResult(None, errors=e.errors)
         except Exception as e:
             if features.debug:
                 raise e
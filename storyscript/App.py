@@ -2,6 +2,8 @@
 import json
 
 from .Bundle import Bundle
+from .BundleWriter import BundleWriter, _clean_dict
+from .Watcher import Watcher
 from .exceptions import StoryError
 from .parser import Grammar
 
@@ -22,20 +24,87 @@ class App:
 
     @staticmethod
     def compile(path, ignored_path=None, ebnf=None, concise=False,
-                first=False, features=None):
+                first=False, features=None, jobs=1, cache=None, stream=None,
+                compact=False, all_errors=False, profiler=None):
         """
-        Parses and compiles stories found in path, returning JSON
+        Parses and compiles stories found in path, returning JSON.
+        Compiled stories are reused from `cache` if given. With a `stream`,
+        the JSON is written to it while the stories are compiled. With
+        `all_errors`, the errors of all stories are raised as a BundleError.
+        The compiled stories are profiled with `profiler` if given.
         """
         bundle = Bundle.from_path(path, ignored_path=ignored_path,
-                                  features=features)
-        result = bundle.bundle(ebnf=ebnf)
+                                  features=features, cache=cache,
+                                  profiler=profiler)
+        if stream is not None and not first:
+            writer = BundleWriter(stream, compact=compact, concise=concise)
+            bundle.bundle(ebnf=ebnf, jobs=jobs, writer=writer,
+                          all_errors=all_errors)
+            return None
+        result = bundle.bundle(ebnf=ebnf, jobs=jobs, all_errors=all_errors)
         if concise:
             result = _clean_dict(result)
         if first:
             if len(result['stories']) != 1:
                 raise StoryError.create_error('first_option_more_stories')
             result = next(iter(result['stories'].values()))
-        return json.dumps(result, indent=2)
+        if compact:
+            result = json.dumps(result, separators=(',', ':'))
+        else:
+            result = json.dumps(result, indent=2)
+        if stream is None:
+            return result
+        stream.write(result)
+
+    @staticmethod
+    def parse_watch(path, ignored_path=None, ebnf=None, lower=False,
+                    features=None):
+        """
+        Parses stories found in path whenever they change, yielding the tree
+        or the error of every changed story
+        """
+        watcher = Watcher(path, ignored_path=ignored_path)
+        bundle = Bundle(story_files=watcher.sources, features=features)
+        parser = bundle.parser(ebnf)
+        for stories in watcher.watch():
+            bundle.unload_removed()
+            for story in stories:
+                try:
+                    bundle.parse([story], parser=parser, lower=lower)
+                except StoryError as e:
+                    yield story, e
+                    continue
+                yield story, bundle.stories.pop(story)
+
+    @staticmethod
+    def compile_watch(path, ignored_path=None, ebnf=None, concise=False,
+                      first=False, compact=False, features=None):
+        """
+        Compiles stories found in path whenever they change, yielding the
+        JSON or the error of every changed story. The parser is kept between
+        compilations. With `first`, only the compiled story is written
+        instead of a dict of the story path.
+        """
+        watcher = Watcher(path, ignored_path=ignored_path)
+        bundle = Bundle(story_files=watcher.sources, features=features)
+        parser = bundle.parser(ebnf)
+        for stories in watcher.watch():
+            bundle.unload_removed()
+            for story in stories:
+                try:
+                    bundle.compile([story], parser=parser)
+                except StoryError as e:
+                    yield story, e
+                    continue
+                result = bundle.stories.pop(story)
+                if concise:
+                    result = _clean_dict(result)
+                if not first:
+                    result = {story: result}
+                if compact:
+                    yield story, json.dumps(result, separators=(',', ':'))
+                else:
+                    yield story, json.dumps(result, indent=2)
 
     @staticmethod
     def lex(path, features, ebnf=None):
@@ -50,12 +119,3 @@ class App:
         Returns the current grammar
         """
         return Grammar().build()
-
-
-def _clean_dict(d):
-    """
-    Removes all falsy elements from a nested dict
-    """
-    if not isinstance(d, dict):
-        return d
-    return {k: _clean_dict(v) for k, v in d.items() if v}
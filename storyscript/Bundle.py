@@ -1,10 +1,55 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 from .Features import Features
-from .Story import Story
-from .parser import Parser
+from .GitIgnore import GitIgnore
+from .Story import Story, _parser
+from .exceptions import BundleError, StoryError
+from .parser import Grammar, Parser
+
+
+# the parser of a worker process of a parallel compilation
+_worker = {}
+
+
+def _init_worker(ebnf):
+    """
+    Builds the parser of a worker process, s.t. it's warm before the first
+    story is compiled.
+    """
+    if ebnf is None:
+        _worker['parser'] = _parser()
+    else:
+        _worker['parser'] = Parser(ebnf=ebnf)
+
+
+def _compile_worker(source, features):
+    """
+    Compiles a story in a worker process. Errors are only reported as `None`,
+    as they are raised again by the parent process.
+    """
+    try:
+        story = Story(source, features=Features(features))
+        story.parse(parser=_worker.get('parser'))
+        story.compile()
+        return story.compiled
+    except Exception:
+        return None
+
+
+async def _offload(executor, semaphore, fn, *args):
+    """
+    Calls `fn` in an executor, waiting for `semaphore` first if given.
+    """
+    loop = asyncio.get_event_loop()
+    if semaphore is None:
+        return await loop.run_in_executor(executor, fn, *args)
+    async with semaphore:
+        return await loop.run_in_executor(executor, fn, *args)
 
 
 class Bundle:
@@ -12,7 +57,8 @@ class Bundle:
     Bundles all stories that must be compiled together.
     """
 
-    def __init__(self, story_files=None, features=None):
+    def __init__(self, story_files=None, features=None, cache=None,
+                 profiler=None):
         self.stories = {}
         if isinstance(features, Features):
             self.features = features
@@ -21,6 +67,18 @@ class Bundle:
         if story_files is None:
             story_files = {}
         self.story_files = story_files
+        # the Story of every loaded story, by path
+        self.loaded = {}
+        # a CompileCache for compiled stories, or None
+        self.cache = cache
+        # a Profiler which compiled stories are profiled with, or None
+        self.profiler = profiler
+        # the cache keys of the stories which are compiled
+        self.cache_keys = {}
+        # a BundleWriter which stories are passed to, or None
+        self.writer = None
+        # the errors of every story if they are collected, or None
+        self.errors = None
 
     @staticmethod
     def gitignores():
@@ -37,50 +95,50 @@ class Bundle:
             return []
         return p.stdout.split('\n')
 
-    @staticmethod
-    def ignores(path):
-        ignores = []
-        if os.path.isdir(path):
-            for root, subdirs, files in os.walk(path):
-                for file in files:
-                    if file.endswith('.story'):
-                        story = os.path.relpath(os.path.join(root, file))
-                        ignores.append(story)
-            return ignores
-        return [os.path.relpath(path)]
-
-    @staticmethod
-    def filter_path(root, filename, ignores):
-        if filename.endswith('.story'):
-            path = os.path.relpath(os.path.join(root, filename))
-            if path not in ignores:
-                return path
-        return None
+    @classmethod
+    def ignored(cls, ignored_path=None):
+        """
+        Get the matcher of ignored stories. The ignore rules of git are
+        matched natively, unless STORYSCRIPT_GIT_IGNORES is set, in which case
+        the list of ignored files is asked from git.
+        """
+        if os.getenv('STORYSCRIPT_GIT_IGNORES'):
+            ignores = GitIgnore.from_files(cls.gitignores())
+        else:
+            ignores = GitIgnore.from_directory(os.getcwd())
+        if ignored_path:
+            ignores.ignore(ignored_path)
+        return ignores
 
     @classmethod
-    def parse_directory(cls, directory, ignored_path=None):
+    def parse_directory(cls, directory, ignored_path=None, ignores=None):
         """
-        Parse a directory to find stories.
+        Parse a directory to find stories. The ignored stories are looked up
+        unless they are given with `ignores`. Ignored directories aren't
+        entered.
         """
         paths = []
-        ignores = cls.gitignores()
-        if ignored_path:
-            ignores = ignores + cls.ignores(ignored_path)
+        if ignores is None:
+            ignores = cls.ignored(ignored_path)
         for root, subdirs, files in os.walk(directory):
+            absolute = os.path.abspath(root)
+            subdirs[:] = [subdir for subdir in subdirs
+                          if not ignores.ignored(absolute, subdir, True)]
             for file in files:
-                path = cls.filter_path(root, file, ignores)
-                if path:
-                    paths.append(path)
+                if file.endswith('.story') and \
+                        not ignores.ignored(absolute, file):
+                    paths.append(os.path.relpath(os.path.join(root, file)))
         return paths
 
     @classmethod
-    def from_path(cls, path, ignored_path=None, features=None):
+    def from_path(cls, path, ignored_path=None, features=None, cache=None,
+                  profiler=None):
         """
         Load a bundle of stories from the filesystem.
         If a directory is given. all `.story` files in the directory will be
         loaded.
         """
-        bundle = Bundle(features=features)
+        bundle = Bundle(features=features, cache=cache, profiler=profiler)
         if os.path.isdir(path):
             for story in cls.parse_directory(path, ignored_path=ignored_path):
                 bundle.load_story(story)
@@ -90,11 +148,27 @@ class Bundle:
 
     def load_story(self, path):
         """
-        Reads a story file and adds it to the loaded stories
+        Reads a story file and adds it to the loaded stories. Every story is
+        only read once and the same Story is returned until its source is
+        replaced in `story_files`.
         """
         if path not in self.story_files:
             self.story_files[path] = Story.read(path)
-        return Story(self.story_files[path], features=self.features)
+        source = self.story_files[path]
+        story = self.loaded.get(path)
+        if story is None or story.story is not source:
+            story = Story(source, features=self.features)
+            self.loaded[path] = story
+        return story
+
+    def unload_removed(self):
+        """
+        Forgets the loaded stories which have been removed from
+        `story_files`.
+        """
+        for path in list(self.loaded):
+            if path not in self.story_files:
+                del self.loaded[path]
 
     def find_stories(self):
         """
@@ -130,17 +204,184 @@ class Bundle:
         """
         for storypath in stories:
             story = self.load_story(storypath)
+            story.profile = None
+            if self.profiler is not None:
+                story.profile = self.profiler.profile(storypath)
+            if self.errors is None:
+                story.parse(parser=parser)
+                story.compile()
+            elif not self.try_compile(storypath, story, parser):
+                continue
+            self.add_story(storypath, story.compiled)
+            # the source and its lines are kept, but not the results
+            story.tree = None
+            story.compiled = None
+
+    def try_compile(self, storypath, story, parser):
+        """
+        Compiles a story, collecting its errors instead of raising them.
+        All syntax errors are found, but compiling stops at the first error.
+        Returns whether the story compiled.
+        """
+        try:
             story.parse(parser=parser)
-            story.compile()
-            self.stories[storypath] = story.compiled
+        except StoryError as e:
+            errors = story.syntax_errors(parser, error=e.error)
+        else:
+            try:
+                story.compile()
+                return True
+            except StoryError as e:
+                errors = [e]
+        for error in errors:
+            # the errors of all stories are reported together
+            error.path = storypath
+        self.errors[storypath] = errors
+        return False
+
+    def raise_errors(self, entrypoint):
+        """
+        Raises the collected errors in the order of the stories.
+        """
+        if self.errors:
+            errors = []
+            for storypath in entrypoint:
+                errors += self.errors.get(storypath, [])
+            raise BundleError(errors)
 
-    def bundle(self, ebnf=None):
+    def add_story(self, storypath, compiled):
         """
-        Makes the bundle
+        Adds a compiled story to the bundle and to the cache. If the bundle is
+        written while it's compiled, the story is only passed to the writer.
+        """
+        key = self.cache_keys.pop(storypath, None)
+        if key is not None:
+            self.cache.save(key, compiled)
+        if self.writer is None:
+            self.stories[storypath] = compiled
+        else:
+            self.writer.add(storypath, compiled)
+
+    def compile_parallel(self, stories, parser, ebnf, jobs):
+        """
+        Compiles the stories in a pool of `jobs` processes, or one process per
+        CPU if `jobs` is 0. A story that failed is compiled again in this
+        process, s.t. the first error is the same as with `compile`.
+        """
+        if jobs == 0:
+            jobs = os.cpu_count()
+        sources = []
+        for storypath in stories:
+            sources.append(self.load_story(storypath).story)
+        features = self.features.features
+        chunksize = max(1, len(sources) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(ebnf,)) as executor:
+            results = list(executor.map(_compile_worker, sources,
+                                        repeat(features),
+                                        chunksize=chunksize))
+        for storypath, compiled in zip(stories, results):
+            if compiled is None:
+                self.compile([storypath], parser=parser)
+            else:
+                self.add_story(storypath, compiled)
+
+    def load_cached(self, stories, parser):
+        """
+        Loads the compiled stories from the cache. Returns the cache keys of
+        the stories which must be compiled.
+        """
+        if parser is None:
+            grammar = Grammar().build()
+        else:
+            grammar = parser.grammar()
+        missing = {}
+        for storypath in stories:
+            source = self.load_story(storypath).story
+            key = self.cache.key(source, self.features, grammar)
+            compiled = self.cache.load(key)
+            if compiled is None:
+                missing[storypath] = key
+            else:
+                self.add_story(storypath, compiled)
+        return missing
+
+    def bundle(self, ebnf=None, jobs=1, writer=None, all_errors=False):
+        """
+        Makes the bundle. With `jobs` other than 1, the stories are compiled
+        in parallel. With a cache, only the stories which changed are
+        compiled. With a `writer`, the bundle is written while it's compiled
+        instead of being returned. With `all_errors`, the errors of all
+        stories are raised as a BundleError instead of the first error.
+        Profiled stories are always compiled in this process.
         """
         entrypoint = self.find_stories()
         parser = self.parser(ebnf)
-        self.compile(entrypoint, parser=parser)
+        self.writer = writer
+        self.errors = {} if all_errors else None
+        if writer is not None:
+            writer.begin(entrypoint)
+        stories = entrypoint
+        if self.cache is not None:
+            self.cache_keys = self.load_cached(entrypoint, parser)
+            stories = list(self.cache_keys)
+        if jobs != 1 and len(stories) > 1 and self.profiler is None:
+            self.compile_parallel(stories, parser=parser, ebnf=ebnf,
+                                  jobs=jobs)
+        else:
+            self.compile(stories, parser=parser)
+        self.raise_errors(entrypoint)
+        if writer is not None:
+            writer.end()
+            return None
+        if self.cache is not None:
+            # keep the order of a bundle compiled without the cache
+            self.stories = {storypath: self.stories[storypath]
+                            for storypath in entrypoint}
+        return {'stories': self.stories, 'services': self.services(),
+                'entrypoint': entrypoint}
+
+    async def acompile(self, storypath, executor=None, semaphore=None):
+        """
+        Compiles a story in `executor`, or in the default executor of the
+        event loop. As errors can't be passed between processes, a story that
+        failed in a process pool is compiled again in the default executor.
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            source = self.load_story(storypath).story
+            compiled = await _offload(executor, semaphore, _compile_worker,
+                                      source, self.features.features)
+            if compiled is not None:
+                self.add_story(storypath, compiled)
+                return
+            executor = None
+        await _offload(executor, semaphore, self.compile, [storypath], None)
+
+    async def abundle(self, executor=None, semaphore=None, all_errors=False):
+        """
+        Makes the bundle, compiling all stories concurrently. The first error
+        is the same as with `bundle`, and the other stories are cancelled.
+        With `all_errors`, the errors of all stories are raised like with
+        `bundle`.
+        """
+        entrypoint = self.find_stories()
+        self.errors = {} if all_errors else None
+        tasks = [asyncio.ensure_future(self.acompile(storypath, executor,
+                                                     semaphore))
+                 for storypath in entrypoint]
+        try:
+            for task in tasks:
+                await task
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # errors of later stories are dropped
+                    task.exception()
+        self.raise_errors(entrypoint)
+        self.stories = {storypath: self.stories[storypath]
+                        for storypath in entrypoint}
         return {'stories': self.stories, 'services': self.services(),
                 'entrypoint': entrypoint}
 
@@ -160,6 +401,5 @@ class Bundle:
         parser = self.parser(ebnf)
         results = {}
         for story in stories:
-            results[story] = Story.from_file(story, features=self.features) \
-                                  .lex(parser=parser)
+            results[story] = self.load_story(story).lex(parser=parser)
         return results
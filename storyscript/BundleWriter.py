@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import json
+
+
+def _clean_dict(d):
+    """
+    Removes all falsy elements from a nested dict
+    """
+    if not isinstance(d, dict):
+        return d
+    return {k: _clean_dict(v) for k, v in d.items() if v}
+
+
+class BundleWriter:
+    """
+    Writes the JSON of a bundle to a stream while it's compiled, s.t. every
+    story is written as soon as it and the stories before it are compiled.
+    The output is the same as `json.dumps(bundle, indent=2)`, or without
+    whitespace if `compact` is set. With `concise`, falsy elements are left
+    out as with `_clean_dict`.
+    """
+
+    def __init__(self, stream, compact=False, concise=False):
+        self.stream = stream
+        self.compact = compact
+        self.concise = concise
+        self.entrypoint = []
+        # stories which were compiled before the stories preceding them
+        self.pending = {}
+        self.position = 0
+        self.services = set()
+        self.keys = 0
+        self.stories = 0
+
+    def dumps(self, value, level):
+        """
+        Serializes a value nested `level` times.
+        """
+        if self.compact:
+            return json.dumps(value, separators=(',', ':'))
+        return json.dumps(value, indent=2).replace('\n',
+                                                   '\n' + '  ' * level)
+
+    def newline(self, level):
+        if self.compact:
+            return ''
+        return '\n' + '  ' * level
+
+    def key(self, name, level):
+        """
+        Writes the key of an element of a dict.
+        """
+        separator = ':' if self.compact else ': '
+        self.stream.write(self.newline(level) + json.dumps(name) + separator)
+
+    def begin(self, entrypoint):
+        self.entrypoint = entrypoint
+        self.stream.write('{')
+        if entrypoint or not self.concise:
+            self.key('stories', 1)
+            self.keys += 1
+            self.stream.write('{')
+        self.flush()
+
+    def add(self, storypath, compiled):
+        """
+        Adds a compiled story, writing it and the stories after it which
+        are waiting for it.
+        """
+        self.services.update(compiled['services'])
+        self.pending[storypath] = compiled
+        self.flush()
+
+    def flush(self):
+        while self.position < len(self.entrypoint):
+            storypath = self.entrypoint[self.position]
+            if storypath not in self.pending:
+                return
+            self.write_story(storypath, self.pending.pop(storypath))
+            self.position += 1
+
+    def write_story(self, storypath, compiled):
+        if self.concise:
+            if not compiled:
+                return
+            compiled = _clean_dict(compiled)
+        if self.stories > 0:
+            self.stream.write(',')
+        self.stories += 1
+        self.key(storypath, 2)
+        self.stream.write(self.dumps(compiled, 2))
+
+    def end(self):
+        """
+        Writes the services and the entrypoint once all stories were added.
+        """
+        if self.keys > 0:
+            if self.stories > 0:
+                self.stream.write(self.newline(1))
+            self.stream.write('}')
+        services = sorted(self.services)
+        for name, value in (('services', services),
+                            ('entrypoint', self.entrypoint)):
+            if self.concise and not value:
+                continue
+            if self.keys > 0:
+                self.stream.write(',')
+            self.keys += 1
+            self.key(name, 1)
+            self.stream.write(self.dumps(value, 1))
+        if self.keys > 0:
+            self.stream.write(self.newline(0))
+        self.stream.write('}')
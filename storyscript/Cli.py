@@ -1,16 +1,24 @@
 # -*- coding: utf-8 -*-
+import cProfile
 import io
+import json as jsonlib
 import os
+import shutil
+import tempfile
 
 import click
 
 from click_alias import ClickAliasedGroup
 
 from .App import App
+from .Client import Client
+from .CompileCache import CompileCache
 from .Features import Features
+from .Profiler import Profiler
 from .Project import Project
+from .Server import Server
 from .Version import version as app_version
-from .exceptions import StoryError
+from .exceptions import BundleError, StoryError
 
 
 story_features = Features.all_feature_names()
@@ -45,8 +53,20 @@ class Cli:
 
     version_help = 'Prints Storyscript version'
     silent_help = 'Silent mode. Return syntax errors only.'
+    json_help = ('Print the JSON once all stories have been compiled. With '
+                 'OUTPUT, the JSON is written while they are compiled')
     ebnf_help = 'Load the grammar from a file. Useful for development'
     preview_help = 'Activate upcoming Storyscript features'
+    jobs_help = 'Number of processes compiling stories. 0 uses all CPUs'
+    no_cache_help = 'Compile all stories instead of reusing cached results'
+    watch_help = 'Watch the stories and process them again when they change'
+    server_help = 'Let the server process the stories if it is running'
+    socket_help = 'Path of the socket of the server'
+    compact_help = 'Write the JSON without whitespace'
+    all_errors_help = 'Report the errors of all stories instead of the first'
+    profile_help = ('Print the time and the allocated memory blocks of '
+                    'every phase, as JSON with --json. Disables the cache')
+    cprofile_help = 'Write cProfile statistics of the command to a file'
 
     @click.group(invoke_without_command=True, cls=ClickAliasedGroup)
     @click.option('--version', '-v', is_flag=True, help=version_help)
@@ -74,16 +94,37 @@ class Cli:
                   multiple=True, help=preview_help)
     @click.option('--ignore', default=None,
                   help='Specify path of ignored files')
-    def parse(path, debug, ebnf, raw, ignore, lower, preview):
+    @click.option('--watch', is_flag=True, help=watch_help)
+    @click.option('--server', is_flag=True, help=server_help)
+    def parse(path, debug, ebnf, raw, ignore, lower, preview, watch, server):
         """
         Parses stories, producing the abstract syntax tree.
         """
         try:
-            trees = App.parse(path, ignored_path=ignore, ebnf=ebnf,
-                              lower=lower, features=preview)
-            for story, tree in trees.items():
+            response = None
+            if server and not debug and not watch:
+                response = Cli.forward('parse', path=path,
+                                       ignored_path=ignore, ebnf=ebnf,
+                                       lower=lower, features=preview,
+                                       raw=raw)
+            if response is not None:
+                for story, tree in response['result'].items():
+                    click.echo('File: {}'.format(story))
+                    click.echo(tree)
+                return
+            if watch:
+                trees = App.parse_watch(path, ignored_path=ignore, ebnf=ebnf,
+                                        lower=lower, features=preview)
+            else:
+                trees = App.parse(path, ignored_path=ignore, ebnf=ebnf,
+                                  lower=lower, features=preview).items()
+            for story, tree in trees:
                 click.echo('File: {}'.format(story))
-                if raw:
+                if isinstance(tree, StoryError):
+                    if debug:
+                        raise tree.error
+                    tree.echo()
+                elif raw:
                     click.echo(tree)
                 else:
                     click.echo(tree.pretty())
@@ -104,7 +145,7 @@ class Cli:
     @main.command(aliases=['c'])
     @click.argument('path', default=os.getcwd())
     @click.argument('output', required=False)
-    @click.option('--json', '-j', is_flag=True)
+    @click.option('--json', '-j', is_flag=True, help=json_help)
     @click.option('--silent', '-s', is_flag=True, help=silent_help)
     @click.option('--debug', is_flag=True)
     @click.option('--concise', '-c', is_flag=True)
@@ -114,31 +155,60 @@ class Cli:
                   help='Specify path of ignored files')
     @click.option('--preview', callback=preview_cb, is_eager=True,
                   multiple=True, help=preview_help)
+    @click.option('--jobs', type=click.IntRange(min=0), default=1,
+                  help=jobs_help)
+    @click.option('--no-cache', is_flag=True, help=no_cache_help)
+    @click.option('--watch', is_flag=True, help=watch_help)
+    @click.option('--server', is_flag=True, help=server_help)
+    @click.option('--compact', is_flag=True, help=compact_help)
+    @click.option('--all-errors', is_flag=True, help=all_errors_help)
+    @click.option('--profile', is_flag=True, help=profile_help)
+    @click.option('--cprofile', default=None, help=cprofile_help)
     def compile(path, output, json, silent, debug, ebnf, ignore, concise,
-                first, preview):
+                first, preview, jobs, no_cache, watch, server, compact,
+                all_errors, profile, cprofile):
         """
         Compiles stories and validates syntax
         """
+        if cprofile:
+            Cli.start_cprofile(cprofile)
+        cache, profiler = Cli.compile_profiler(no_cache, profile)
+        options = {'ignored_path': ignore, 'ebnf': ebnf, 'concise': concise,
+                   'first': first, 'features': preview, 'jobs': jobs,
+                   'compact': compact, 'all_errors': all_errors}
         try:
-            results = App.compile(path, ignored_path=ignore,
-                                  ebnf=ebnf, concise=concise, first=first,
-                                  features=preview)
+            if watch:
+                Cli.compile_watch(path, json, silent, debug, **options)
+                return
+            response = None
+            if server and not debug and not profile and not cprofile:
+                response = Cli.forward('compile', path=path,
+                                       cache=not no_cache, **options)
+            if response is not None:
+                results = response['result']
+                counts = response.get('cache')
+            elif json and not silent:
+                Cli.write_json(output, path=path, cache=cache,
+                               profiler=profiler, **options)
+                Cli.echo_profile(profiler, json)
+                return
+            else:
+                results = App.compile(path, cache=cache, profiler=profiler,
+                                      **options)
+                Cli.echo_profile(profiler, json)
+                counts = None
+                if cache is not None:
+                    counts = {'hits': cache.hits, 'misses': cache.misses}
             if not silent:
-                if json:
-                    if output:
-                        with io.open(output, 'w') as f:
-                            f.write(results)
-                        exit()
-                    click.echo(results)
-                else:
-                    msg = 'Script syntax passed!'
-                    click.echo(click.style(msg, fg='green'))
-        except StoryError as e:
+                Cli.echo_compiled(results, output, json, counts)
+        except (StoryError, BundleError) as e:
             if debug:
                 raise e.error
             else:
                 e.echo()
                 exit(1)
+        except click.UsageError:
+            raise
         except Exception as e:
             if debug:
                 raise e
@@ -146,6 +216,124 @@ class Cli:
                 StoryError.internal_error(e).echo()
                 exit(1)
 
+    @staticmethod
+    def compile_profiler(no_cache, profile):
+        """
+        Returns the compile cache and the profiler of the compile command.
+        Profiled stories are always compiled, thus they disable the cache.
+        """
+        if profile:
+            return None, Profiler()
+        if no_cache:
+            return None, None
+        return CompileCache(), None
+
+    @staticmethod
+    def compile_watch(path, json, silent, debug, ignored_path=None,
+                      ebnf=None, concise=False, first=False, features=None,
+                      jobs=1, compact=False, all_errors=False):
+        """
+        Compiles the stories whenever they change. Every changed story is
+        compiled on its own, thus the options of whole bundles are rejected.
+        """
+        if jobs != 1 or all_errors:
+            raise click.UsageError('--watch compiles every changed story on '
+                                   'its own, thus --jobs and --all-errors '
+                                   'are not supported')
+        results = App.compile_watch(path, ignored_path=ignored_path,
+                                    ebnf=ebnf, concise=concise, first=first,
+                                    compact=compact, features=features)
+        for story, result in results:
+            if isinstance(result, StoryError):
+                click.echo('File: {}'.format(story))
+                if debug:
+                    raise result.error
+                result.echo()
+            elif silent:
+                continue
+            elif json:
+                click.echo(result)
+            else:
+                click.echo('File: {}'.format(story))
+                msg = 'Script syntax passed!'
+                click.echo(click.style(msg, fg='green'))
+
+    @staticmethod
+    def echo_compiled(results, output, json, counts):
+        """
+        Prints the compiled stories or writes them to the output file.
+        """
+        if json:
+            if output:
+                with io.open(output, 'w') as f:
+                    f.write(results)
+                exit()
+            click.echo(results)
+        else:
+            msg = 'Script syntax passed!'
+            click.echo(click.style(msg, fg='green'))
+            if counts is not None:
+                click.echo('Cache: {hits} hits, {misses} misses'
+                           .format(**counts))
+
+    @staticmethod
+    def start_cprofile(path):
+        """
+        Profiles the command with cProfile, writing the statistics to `path`
+        when it ends.
+        """
+        profile = cProfile.Profile()
+
+        def dump():
+            profile.disable()
+            profile.dump_stats(path)
+
+        click.get_current_context().call_on_close(dump)
+        profile.enable()
+
+    @staticmethod
+    def echo_profile(profiler, json):
+        """
+        Prints the profiles of the compiled stories to stderr, s.t. they don't
+        mix with the compiled stories.
+        """
+        if profiler is None:
+            return
+        if json:
+            click.echo(jsonlib.dumps(profiler.results(), indent=2), err=True)
+        else:
+            click.echo(profiler.table(), err=True)
+
+    # the size of the JSON which is spooled in memory, in bytes
+    spool_size = 8 * 1024 * 1024
+
+    @staticmethod
+    def write_json(output, **options):
+        """
+        Writes the compiled stories to the output file while they are
+        compiled. The output file is only replaced once all stories have been
+        compiled. Without an output file, the stories are spooled, in memory
+        or in a temporary file if they are large, and only printed once all
+        of them have been compiled. Errors are printed to stdout as well,
+        thus streaming would mix them with an incomplete JSON.
+        """
+        if not output:
+            with tempfile.SpooledTemporaryFile(Cli.spool_size,
+                                               mode='w+') as f:
+                App.compile(stream=f, **options)
+                f.seek(0)
+                shutil.copyfileobj(f, click.get_text_stream('stdout'))
+            click.echo()
+            return
+        tmp_output = f'{output}.tmp'
+        try:
+            with io.open(tmp_output, 'w') as f:
+                App.compile(stream=f, **options)
+            os.replace(tmp_output, output)
+        finally:
+            if os.path.exists(tmp_output):
+                os.remove(tmp_output)
+
     @staticmethod
     @main.command(aliases=['l'])
     @click.argument('path', default=os.getcwd())
@@ -153,16 +341,27 @@ class Cli:
     @click.option('--debug', is_flag=True)
     @click.option('--preview', callback=preview_cb, is_eager=True,
                   multiple=True, help=preview_help)
-    def lex(path, ebnf, debug, preview):
+    @click.option('--server', is_flag=True, help=server_help)
+    def lex(path, ebnf, debug, preview, server):
         """
         Shows lexer tokens for given stories
         """
         try:
-            results = App.lex(path, ebnf=ebnf, features=preview)
+            response = None
+            if server and not debug:
+                response = Cli.forward('lex', path=path, ebnf=ebnf,
+                                       features=preview)
+            if response is not None:
+                results = response['result']
+            else:
+                results = {}
+                for file, tokens in App.lex(path, ebnf=ebnf,
+                                            features=preview).items():
+                    results[file] = [(t.type, t.value) for t in tokens]
             for file, tokens in results.items():
                 click.echo('File: {}'.format(file))
-                for n, token in enumerate(tokens):
-                    click.echo('{} {} {}'.format(n, token.type, token.value))
+                for n, (token_type, value) in enumerate(tokens):
+                    click.echo('{} {} {}'.format(n, token_type, value))
         except StoryError as e:
             if debug:
                 raise e.error
@@ -176,6 +375,43 @@ class Cli:
                 StoryError.internal_error(e).echo()
                 exit(1)
 
+    @staticmethod
+    @main.command()
+    @click.option('--socket', 'path', default=None, help=socket_help)
+    def serve(path):
+        """
+        Compiles stories for clients of a Unix domain socket
+        """
+        try:
+            server = Server(path=path)
+        except StoryError as e:
+            e.echo()
+            exit(1)
+        click.echo('Listening on {}'.format(server.server_address))
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def forward(method, **params):
+        """
+        Forwards a command to the server if it is running. Returns the
+        response of the server, or None if no server is running.
+        """
+        client = Client()
+        if not client.connect():
+            return None
+        try:
+            response = client.request(method, cwd=os.getcwd(), **params)
+        finally:
+            client.close()
+        if response['errors']:
+            for error in response['errors']:
+                click.echo(error)
+            exit(1)
+        return response
+
     @staticmethod
     @main.command(aliases=['g'])
     def grammar():
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import json
+import socket
+
+from .Server import Server
+
+
+class Client:
+    """
+    Sends requests to a running server.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = Server.default_path()
+        self.path = path
+        self.socket = None
+        self.requests = 0
+
+    def connect(self):
+        """
+        Connects to the server. Returns `False` if no server is running.
+        """
+        if self.socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                return False
+            self.socket = sock
+            self.file = sock.makefile('rwb')
+        return True
+
+    def close(self):
+        if self.socket is not None:
+            try:
+                self.file.close()
+            except OSError:
+                # the unsent request of a closed connection is dropped
+                pass
+            self.socket.close()
+            self.socket = None
+
+    def request(self, method, **params):
+        """
+        Sends a request and returns the response of the server. As the
+        server closes idle connections, the request is sent again over a
+        new connection if the connection has been closed.
+        """
+        try:
+            return self.send(method, params)
+        except ConnectionError:
+            self.close()
+            if not self.connect():
+                raise
+            return self.send(method, params)
+
+    def send(self, method, params):
+        """
+        Sends a request over the current connection.
+        """
+        self.requests += 1
+        request = {'id': self.requests, 'method': method, 'params': params}
+        self.file.write(json.dumps(request).encode('utf8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('The server closed the connection')
+        return json.loads(line)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import json
+import os
+
+from .Version import version as compiler_version
+from .parser import ParserCache
+
+
+class CompileCache:
+    """
+    Stores compiled stories on disk. Entries are addressed by everything the
+    output of the compiler depends on: the story source, the features, the
+    compiler version, the compiler sources and the grammar.
+    """
+
+    # bump whenever the format of the compiled stories changes
+    version = 1
+    max_age = ParserCache.max_age
+    # the number of stories which are kept
+    max_entries = 10000
+    # the hash of the sources of the package, computed once
+    _sources = None
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.path.join(ParserCache.default_directory(),
+                                     'stories')
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.pruned = False
+
+    @classmethod
+    def sources(cls):
+        """
+        Hashes the sources of the package. Source checkouts have no release
+        version, so edits of the compiler would otherwise return stale
+        stories.
+        """
+        if cls._sources is None:
+            root = os.path.dirname(os.path.realpath(__file__))
+            sources = hashlib.sha256()
+            for directory, directories, files in os.walk(root):
+                directories.sort()
+                for name in sorted(files):
+                    if not name.endswith('.py'):
+                        continue
+                    path = os.path.join(directory, name)
+                    sources.update(os.path.relpath(path, root).encode('utf8'))
+                    with io.open(path, 'rb') as f:
+                        sources.update(f.read())
+            cls._sources = sources.hexdigest()
+        return cls._sources
+
+    @classmethod
+    def key(cls, source, features, grammar):
+        """
+        Computes the cache key of a story.
+        """
+        features = json.dumps(features.features, sort_keys=True)
+        text = (f'{cls.version}\n{compiler_version}\n{cls.sources()}\n'
+                f'{features}\n'
+                f'{hashlib.sha256(grammar.encode("utf8")).hexdigest()}\n'
+                f'{source}')
+        return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def load(self, key):
+        """
+        Loads a compiled story or returns `None` if the cache is missing or
+        unusable. Hits and misses are counted.
+        """
+        try:
+            with io.open(self.path(key), 'r', encoding='utf8') as f:
+                compiled = json.load(f)
+        except Exception:
+            compiled = None
+        if compiled is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            ParserCache.used(self.path(key))
+        return compiled
+
+    def save(self, key, compiled):
+        """
+        Saves a compiled story to the cache. The old stories are pruned on
+        the first save.
+        """
+        ParserCache.write(self.path(key),
+                          lambda: json.dumps(compiled).encode('utf8'))
+        if not self.pruned:
+            self.pruned = True
+            ParserCache.prune(self.directory, ('.json', '.tmp'),
+                              self.max_age, self.max_entries)
@@ -211,6 +211,10 @@ class ErrorCodes:
         'E0131',
         "`{left}` can't be dot-accessed with `{name}` of type `{right}`"
     )
+    server_running = (
+        'E0132',
+        'A server is already listening on `{path}`'
+    )
 
     @staticmethod
     def is_error(error_name):
@@ -9,6 +9,7 @@ class Features:
     defaults = {
         'globals': False,  # makes global variables writable
         'debug': False,    # enable debug output
+        'fold': True,      # fold constant expressions at compile time
     }
 
     def __init__(self, features):
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+import subprocess
+
+
+def _translate(pattern):
+    """
+    Translates a gitignore glob to a regular expression. `*`, `?` and ranges
+    don't match slashes, `**` matches across directories.
+    """
+    i = 0
+    n = len(pattern)
+    regex = ''
+    while i < n:
+        if pattern.startswith('**/', i) and (i == 0 or pattern[i - 1] == '/'):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i) and i + 2 == n and \
+                i > 0 and pattern[i - 1] == '/':
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            while i < n and pattern[i] == '*':
+                i += 1
+            regex += '[^/]*'
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                regex += re.escape('[')
+                i += 1
+                continue
+            chars = pattern[i + 1:end]
+            if chars[0] in '!^':
+                chars = '^' + chars[1:]
+            regex += '[' + chars.replace('\\', '\\\\') + ']'
+            i = end + 1
+        elif pattern[i] == '\\' and i + 1 < n:
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+class _Patterns:
+    """
+    The patterns of a gitignore file, which match paths relative to the
+    directory of the file. The last matching pattern decides if a path is
+    ignored.
+    """
+
+    literal = re.compile(r'[^*?\[\\]+')
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            rule = self.parse(line)
+            if rule is not None:
+                self.rules.append(rule)
+        self.negations = any(negate for negate, *_ in self.rules)
+        # without negations, it only matters whether any pattern matches:
+        # literal names are looked up in sets and the other patterns are
+        # combined into a single expression
+        self.names = set()
+        self.dir_names = set()
+        files = []
+        dirs = []
+        for negate, regex, dir_only, name in self.rules:
+            if name is not None:
+                (self.dir_names if dir_only else self.names).add(name)
+                continue
+            dirs.append(regex)
+            if not dir_only:
+                files.append(regex)
+        self.files = self.combine(files)
+        self.dirs = self.combine(dirs)
+
+    @staticmethod
+    def combine(regexes):
+        if not regexes:
+            return None
+        return re.compile('|'.join(f'(?:{r.pattern})' for r in regexes))
+
+    @classmethod
+    def parse(cls, line):
+        """
+        Parses a line into `(negate, regex, dir_only, name)`, where `name` is
+        set for patterns matching a literal name in any directory.
+        """
+        line = line.rstrip('\r\n')
+        while line.endswith(' ') and not line.endswith('\\ '):
+            line = line[:-1]
+        if not line or line.startswith('#'):
+            return None
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        elif line.startswith('\\!') or line.startswith('\\#'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            return None
+        anchored = '/' in line
+        line = line.lstrip('/')
+        name = None
+        if not anchored and cls.literal.fullmatch(line):
+            name = line
+        regex = _translate(line)
+        if not anchored:
+            regex = '(?:.*/)?' + regex
+        return negate, re.compile(regex), dir_only, name
+
+    def match(self, path, name, is_dir):
+        """
+        Returns `True` if the path is ignored, `False` if it has been
+        included again and `None` if no pattern matched.
+        """
+        if not self.negations:
+            if name in self.names or (is_dir and name in self.dir_names):
+                return True
+            regex = self.dirs if is_dir else self.files
+            if regex is not None and regex.fullmatch(path):
+                return True
+            return None
+        for negate, regex, dir_only, _ in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(path):
+                return not negate
+        return None
+
+
+class GitIgnore:
+    """
+    Matches paths against the ignore rules of a git repository, i.e. the
+    .gitignore files, .git/info/exclude and the global excludes file, and
+    against explicitly ignored paths. As in git, the rules don't apply to
+    tracked files. Alternatively, the list of ignored files can be given,
+    e.g. from git itself.
+    """
+
+    def __init__(self, root=None, files=None):
+        self.root = root
+        self.files = files
+        self.paths = set()
+        # the patterns which apply in a directory, by its path in the root
+        self.chains = {}
+        # the ignored directories which contain tracked files, whose other
+        # files are ignored too
+        self.ignored_dirs = set()
+        # the tracked files and directories within these directories
+        self.tracked_files = set()
+        self.tracked_dirs = set()
+
+    @staticmethod
+    def find_root(directory):
+        """
+        Finds the worktree which contains a directory.
+        """
+        directory = os.path.abspath(directory)
+        while True:
+            if os.path.exists(os.path.join(directory, '.git')):
+                return directory
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+
+    @classmethod
+    def from_directory(cls, directory):
+        """
+        Creates the matcher of the repository containing a directory.
+        """
+        return cls(root=cls.find_root(directory))
+
+    @classmethod
+    def from_files(cls, files):
+        """
+        Creates a matcher for a list of ignored files, relative to the
+        working directory.
+        """
+        return cls(files=set(files))
+
+    def ignore(self, path):
+        """
+        Ignores a file or all files of a directory.
+        """
+        self.paths.add(os.path.abspath(path))
+
+    @staticmethod
+    def read(path):
+        try:
+            with io.open(path, 'r', encoding='utf8') as f:
+                return f.readlines()
+        except (OSError, UnicodeDecodeError):
+            return []
+
+    def excludes(self):
+        """
+        Returns the lines of the global excludes file and of
+        .git/info/exclude.
+        """
+        config = os.getenv('XDG_CONFIG_HOME')
+        if not config:
+            config = os.path.join(os.path.expanduser('~'), '.config')
+        lines = self.read(os.path.join(config, 'git', 'ignore'))
+        git = os.path.join(self.root, '.git')
+        if os.path.isdir(git):
+            lines += self.read(os.path.join(git, 'info', 'exclude'))
+        return lines
+
+    def list_tracked(self, path):
+        """
+        Lists the files tracked by git in a path of the root. Only the path
+        is listed, s.t. large repositories aren't listed as a whole. Without
+        git, no files are tracked.
+        """
+        command = ['git', '--literal-pathspecs', 'ls-files', '-z', '--', path]
+        try:
+            p = subprocess.run(command, cwd=self.root,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+        except OSError:
+            return []
+        if p.returncode != 0:
+            return []
+        return [f for f in p.stdout.decode('utf8').split('\0') if f]
+
+    def tracked(self, path, is_dir):
+        """
+        Checks whether git tracks a file, or any file of a directory, by its
+        path in the root. The tracked files of ignored directories are
+        listed once, when the directory is checked.
+        """
+        parent = path.rpartition('/')[0]
+        if parent in self.ignored_dirs:
+            if is_dir:
+                return path in self.tracked_dirs
+            return path in self.tracked_files
+        files = self.list_tracked(path)
+        if is_dir:
+            for file in files:
+                self.tracked_files.add(file)
+                directory = file.rpartition('/')[0]
+                while directory != path and directory not in self.tracked_dirs:
+                    self.tracked_dirs.add(directory)
+                    directory = directory.rpartition('/')[0]
+        return len(files) > 0
+
+    def chain(self, directory):
+        """
+        Returns the patterns which apply in a directory as `(base, patterns)`
+        tuples, with the most specific patterns last.
+        """
+        chain = self.chains.get(directory)
+        if chain is not None:
+            return chain
+        if directory == '':
+            chain = (('', _Patterns(self.excludes())),)
+        else:
+            chain = self.chain(directory.rpartition('/')[0])
+        path = os.path.join(self.root, directory, '.gitignore')
+        lines = self.read(path)
+        if lines:
+            chain = chain + ((directory, _Patterns(lines)),)
+        self.chains[directory] = chain
+        return chain
+
+    def ignored(self, directory, name, is_dir=False):
+        """
+        Checks whether an entry of an absolute directory is ignored. The
+        parent directories are expected to have been checked before.
+        """
+        path = os.path.join(directory, name)
+        if path in self.paths:
+            return True
+        if self.files and os.path.relpath(path) in self.files:
+            return True
+        if self.root is None or name == '.git':
+            return name == '.git'
+        relative = os.path.relpath(directory, self.root)
+        if relative == '.':
+            relative = ''
+        elif relative == '..' or relative.startswith('..' + os.sep):
+            return False
+        relative = relative.replace(os.sep, '/')
+        if not self.matches(relative, name, is_dir):
+            return False
+        path = f'{relative}/{name}'.lstrip('/')
+        if not self.tracked(path, is_dir):
+            return True
+        if is_dir:
+            self.ignored_dirs.add(path)
+        return False
+
+    def matches(self, relative, name, is_dir):
+        """
+        Checks whether the ignore rules match an entry of a directory, given
+        by its path in the root.
+        """
+        if relative in self.ignored_dirs:
+            # files of ignored directories can't be included again
+            return True
+        for base, patterns in reversed(self.chain(relative)):
+            if base:
+                path = f'{relative[len(base) + 1:]}/{name}'.lstrip('/')
+            else:
+                path = f'{relative}/{name}'.lstrip('/')
+            result = patterns.match(path, name, is_dir)
+            if result is not None:
+                return result
+        return False
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+from collections import OrderedDict
+
+
+class _Phase:
+    """
+    Measures a phase of a profile while it's entered.
+    """
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        # phases are listed before the phases within them
+        self.profile.add(self.name, 0.0)
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        blocks = sys.getallocatedblocks() - self.blocks
+        self.profile.add(self.name, seconds, blocks)
+
+
+class _NoPhase:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_phase = _NoPhase()
+
+
+def phase(profile, name):
+    """
+    Measures a phase if a story is profiled, i.e. `profile` isn't None.
+    """
+    if profile is None:
+        return _no_phase
+    return _Phase(profile, name)
+
+
+class Profile:
+    """
+    The wall time and the change of allocated memory blocks of the phases of
+    compiling a story. The passes of a phase are named `phase/pass`. Phases
+    which rewrite nodes, like folding, count them as well.
+    """
+
+    def __init__(self):
+        self.phases = OrderedDict()
+
+    def add(self, name, seconds, blocks=None):
+        measures = self.phases.setdefault(name, {'time': 0.0, 'blocks': None})
+        measures['time'] += seconds
+        if blocks is not None:
+            measures['blocks'] = (measures['blocks'] or 0) + blocks
+
+    def count(self, name, nodes):
+        """
+        Counts the nodes a phase rewrote.
+        """
+        measures = self.phases.setdefault(name, {'time': 0.0, 'blocks': None})
+        measures['nodes'] = measures.get('nodes', 0) + nodes
+
+
+class Profiler:
+    """
+    Collects the profiles of compiled stories.
+    """
+
+    def __init__(self):
+        self.profiles = OrderedDict()
+
+    def profile(self, storypath):
+        """
+        Starts a new profile of a story.
+        """
+        profile = Profile()
+        self.profiles[storypath] = profile
+        return profile
+
+    def total(self):
+        """
+        Sums the phases of all stories.
+        """
+        total = Profile()
+        for profile in self.profiles.values():
+            for name, measures in profile.phases.items():
+                total.add(name, measures['time'], measures['blocks'])
+                if 'nodes' in measures:
+                    total.count(name, measures['nodes'])
+        return total.phases
+
+    def results(self):
+        stories = OrderedDict()
+        for storypath, profile in self.profiles.items():
+            stories[storypath] = profile.phases
+        return {'stories': stories, 'total': self.total()}
+
+    def table(self):
+        """
+        Formats the phases of all stories as a table.
+        """
+        total = self.total()
+        # the nodes are only shown if a phase counted them
+        counted = any('nodes' in measures for measures in total.values())
+        rows = [('Phase', 'Time (ms)', 'Blocks', 'Nodes')]
+        for name, measures in total.items():
+            # passes are indented below their phase
+            depth = name.count('/')
+            label = '  ' * depth + name.rsplit('/', 1)[-1]
+            blocks = measures['blocks']
+            nodes = measures.get('nodes')
+            rows.append((label, '{:.2f}'.format(measures['time'] * 1000),
+                         '' if blocks is None else '{:+d}'.format(blocks),
+                         '' if nodes is None else str(nodes)))
+        columns = 4 if counted else 3
+        widths = [max(len(row[i]) for row in rows) for i in range(columns)]
+        lines = ['{} stories'.format(len(self.profiles))]
+        for row in rows:
+            cells = [row[0].ljust(widths[0])]
+            for i in range(1, columns):
+                cells.append(row[i].rjust(widths[i]))
+            lines.append('  '.join(cells))
+        return '\n'.join(lines)
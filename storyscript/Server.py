@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import socketserver
+
+from .Api import Api
+from .App import App
+from .CompileCache import CompileCache
+from .compiler.semantics.functions.MutationTable import MutationTable
+from .exceptions import BundleError, StoryError
+from .parser import ParserCache
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Answers every line of a connection with a line of JSON. Connections
+    which stay idle for `timeout` seconds are closed, as they would block
+    the other clients.
+    """
+
+    timeout = 5
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                response = self.server.respond(line)
+                self.wfile.write(json.dumps(response).encode('utf8') + b'\n')
+        except socket.timeout:
+            pass
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    Compiles stories for clients which connect to a Unix domain socket, s.t.
+    the parser and the mutation table are only built once. Requests are
+    lines of JSON like `{"id": 1, "method": "loads", "params": {...}}`, which
+    are answered with `{"id": 1, "result": ..., "errors": [...]}`.
+    Requests are handled one after another, as requests with paths are
+    handled in the working directory of the client. Thus idle connections
+    are closed after `_Handler.timeout` seconds.
+    """
+
+    methods = ('loads', 'load_map', 'compile', 'parse', 'lex')
+
+    def __init__(self, path=None):
+        if path is None:
+            path = self.default_path()
+        if self.running(path):
+            raise StoryError.create_error('server_running', path=path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            # left over by a server which didn't stop cleanly
+            os.remove(path)
+        super().__init__(path, _Handler)
+
+    @staticmethod
+    def running(path):
+        """
+        Checks whether a server is listening on the socket at `path`.
+        """
+        # the client needs the default path of the server
+        from .Client import Client
+        client = Client(path)
+        try:
+            return client.connect()
+        finally:
+            client.close()
+
+    @staticmethod
+    def default_path():
+        """
+        Returns the path of the socket, which can be overwritten with
+        STORYSCRIPT_SOCKET.
+        """
+        path = os.getenv('STORYSCRIPT_SOCKET')
+        if path:
+            return path
+        return os.path.join(ParserCache.default_directory(), 'server.sock')
+
+    @staticmethod
+    def warm_up():
+        """
+        Builds the parser and the mutation table before the first request.
+        """
+        MutationTable.init()
+        Api.loads('a = 1').check_success()
+
+    def serve(self):
+        self.warm_up()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            os.remove(self.server_address)
+
+    def respond(self, line):
+        """
+        Answers a request. Requests with a `cwd` are handled in this working
+        directory. Invalid requests and internal errors are reported as
+        errors.
+        """
+        request_id = None
+        working_directory = os.getcwd()
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            method = request['method']
+            assert method in self.methods, f'Unknown method {method}'
+            params = request.get('params', {})
+            cwd = params.pop('cwd', None)
+            if cwd is not None:
+                os.chdir(cwd)
+            response = getattr(self, method)(**params)
+        except StoryError as e:
+            response = {'result': None, 'errors': [e.message()]}
+        except BundleError as e:
+            response = {'result': None, 'errors': e.messages()}
+        except Exception as e:
+            error = StoryError.internal_error(e)
+            response = {'result': None, 'errors': [error.message()]}
+        finally:
+            os.chdir(working_directory)
+        response['id'] = request_id
+        return response
+
+    @staticmethod
+    def result(result):
+        errors = [e.message() for e in result.errors()]
+        return {'result': result.result(), 'errors': errors}
+
+    def loads(self, source, features=None):
+        return self.result(Api.loads(source, features=features))
+
+    def load_map(self, files, features=None, all_errors=False):
+        return self.result(Api.load_map(files, features=features,
+                                        all_errors=all_errors))
+
+    def compile(self, path, ignored_path=None, ebnf=None, concise=False,
+                first=False, features=None, jobs=1, cache=True,
+                compact=False, all_errors=False):
+        compile_cache = None
+        if cache:
+            compile_cache = CompileCache()
+        result = App.compile(path, ignored_path=ignored_path, ebnf=ebnf,
+                             concise=concise, first=first, features=features,
+                             jobs=jobs, cache=compile_cache, compact=compact,
+                             all_errors=all_errors)
+        response = {'result': result, 'errors': []}
+        if compile_cache is not None:
+            response['cache'] = {'hits': compile_cache.hits,
+                                 'misses': compile_cache.misses}
+        return response
+
+    def parse(self, path, ignored_path=None, ebnf=None, lower=False,
+              features=None, raw=False):
+        trees = App.parse(path, ignored_path=ignored_path, ebnf=ebnf,
+                          lower=lower, features=features)
+        result = {}
+        for story, tree in trees.items():
+            if raw:
+                result[story] = str(tree)
+            else:
+                result[story] = tree.pretty()
+        return {'result': result, 'errors': []}
+
+    def lex(self, path, ebnf=None, features=None):
+        results = App.lex(path, ebnf=ebnf, features=features)
+        result = {}
+        for story, tokens in results.items():
+            result[story] = [[token.type, token.value] for token in tokens]
+        return {'result': result, 'errors': []}
@@ -1,36 +1,81 @@
 # -*- coding: utf-8 -*-
 import io
+import mmap
 import os
+import threading
 from functools import lru_cache
 
-
 from lark.exceptions import UnexpectedInput, UnexpectedToken
 
+from .Profiler import phase
 from .compiler import Compiler
 from .compiler.lowering import Lowering
 from .exceptions import CompilerError, StoryError, StorySyntaxError
 from .parser import Parser
 
 
+_local = threading.local()
+_lock = threading.Lock()
+
+
 @lru_cache(maxsize=1)
-def _parser():
+def _shared_parser():
     """
-    Cached instance of the parser
+    Cached instance of the parser, whose parse tables are shared by the
+    parsers of all threads
     """
     return Parser()
 
 
+def _parser():
+    """
+    Cached instance of the parser for the current thread
+    """
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        with _lock:
+            parser = _shared_parser().copy()
+        _local.parser = parser
+    return parser
+
+
 class Story:
     """
     Represents a single story and exposes methods for reading, parsing and
     compiling it.
     """
 
+    # stories of at least this size are read with mmap
+    mmap_size = 2 ** 20
+
     def __init__(self, story, features, path=None):
         self.story = story
         self.path = path
-        self.lines = story.splitlines(keepends=False)
+        self._lines = None
         self.features = features
+        # a Profile which the phases of compiling are recorded in, or None
+        self.profile = None
+
+    @property
+    def lines(self):
+        """
+        The lines of the story, which are only split when they are needed.
+        """
+        if self._lines is None:
+            self._lines = self.story.splitlines(keepends=False)
+        return self._lines
+
+    @staticmethod
+    def read_mmap(file):
+        """
+        Reads a large story without copying it into a buffer first,
+        translating newlines like a file opened in text mode.
+        """
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            source = str(m, file.encoding)
+        if '\r' in source:
+            source = source.replace('\r\n', '\n').replace('\r', '\n')
+        return source
 
     @classmethod
     def read(cls, path):
@@ -40,6 +85,8 @@ class Story:
         has_error = False
         try:
             with io.open(path, 'r') as file:
+                if os.fstat(file.fileno()).st_size >= cls.mmap_size:
+                    return cls.read_mmap(file)
                 r = file.read()
                 return r
         except FileNotFoundError:
@@ -77,8 +124,9 @@ class Story:
         if parser is None:
             parser = self._parser()
         try:
-            self.tree = parser.parse(self.story,
-                                     allow_single_quotes=allow_single_quotes)
+            with phase(self.profile, 'parse'):
+                self.tree = parser.parse(
+                    self.story, allow_single_quotes=allow_single_quotes)
             if lower:
                 proc = Lowering(parser, features=self.features)
                 self.tree = proc.process(self.tree)
@@ -89,13 +137,25 @@ class Story:
         except UnexpectedInput as error:
             raise self.error(error) from error
 
+    def syntax_errors(self, parser, error=None, allow_single_quotes=False):
+        """
+        Finds all syntax errors of the story. `error` is the first error, if
+        the story was already parsed.
+        """
+        if parser is None:
+            parser = self._parser()
+        errors = parser.parse_errors(self.story, allow_single_quotes,
+                                     error=error)
+        return [self.error(error) for error in errors]
+
     def compile(self):
         """
         Compiles the story and stores the result.
         """
         try:
             self.compiled = Compiler.compile(self.tree, story=self,
-                                             features=self.features)
+                                             features=self.features,
+                                             profile=self.profile)
         except (CompilerError, StorySyntaxError) as error:
             raise self.error(error) from error
 
@@ -119,7 +179,7 @@ class Story:
 
     def _parser(self):
         """
-        Returns the default Parser instance (cached)
+        Returns the default Parser instance of the current thread (cached)
         """
         return _parser()
 
@@ -4,8 +4,6 @@ import io
 import subprocess
 from os import path
 
-import pkg_resources
-
 root_dir = path.abspath(path.dirname(path.dirname(__file__)))
 
 
@@ -37,6 +35,9 @@ def read_version_file():
 
 
 def read_version_package():
+    # pkg_resources is slow to import and only needed for installed packages
+    # without a VERSION file
+    import pkg_resources
     resource_package = 'storyscript'
     ver = pkg_resources.resource_string(resource_package, 'VERSION')
     return ver.decode('utf8').strip()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+from .Bundle import Bundle
+from .Story import Story
+from .exceptions import StoryError
+
+
+class Watcher:
+    """
+    Polls the stories found in a path for changes. Stories are only read
+    again when their size or modification time changed.
+    """
+
+    def __init__(self, path, ignored_path=None, interval=0.1):
+        self.path = path
+        self.interval = interval
+        self.ignores = None
+        if os.path.isdir(path):
+            self.ignores = Bundle.ignored(ignored_path)
+        # the size and modification time of every story
+        self.stats = {}
+        # the source of every story, by path
+        self.sources = {}
+
+    def find_stories(self):
+        if self.ignores is None:
+            return [self.path]
+        return Bundle.parse_directory(self.path, ignores=self.ignores)
+
+    def poll(self):
+        """
+        Returns the stories which were added or whose content changed since
+        the last poll. Stories which were removed are forgotten.
+        """
+        changed = []
+        stats = {}
+        for path in self.find_stories():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stat = (stat.st_mtime_ns, stat.st_size)
+            if self.stats.get(path) != stat:
+                try:
+                    source = Story.read(path)
+                except StoryError:
+                    continue
+                if self.sources.get(path) != source:
+                    self.sources[path] = source
+                    changed.append(path)
+            stats[path] = stat
+        for path in list(self.sources):
+            if path not in stats:
+                del self.sources[path]
+        self.stats = stats
+        return changed
+
+    def watch(self):
+        """
+        Yields the changed stories whenever some stories changed, starting
+        with all stories.
+        """
+        while True:
+            changed = self.poll()
+            if changed:
+                yield changed
+            time.sleep(self.interval)
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from storyscript.Profiler import phase
+from storyscript.compiler.folding.ConstantFolder import ConstantFolder
 from storyscript.compiler.json.JSONCompiler import JSONCompiler
 from storyscript.compiler.lowering.Lowering import Lowering
 from storyscript.compiler.semantics.Semantics import Semantics
@@ -7,16 +9,41 @@ from storyscript.compiler.semantics.Semantics import Semantics
 class Compiler:
 
     @classmethod
-    def generate(cls, tree, features):
+    def generate(cls, tree, features, profile=None):
         """
-        Parses an AST and checks it.
+        Parses an AST and checks it. The phases are recorded in `profile`
+        if given.
         """
-        tree = Lowering(parser=tree.parser, features=features).process(tree)
-        return Semantics(features=features).process(tree)
+        lowering = Lowering(parser=tree.parser, features=features)
+        with phase(profile, 'lowering'):
+            tree = lowering.process(tree, profiled=profile is not None)
+        if profile is not None:
+            for name, seconds in lowering.timings.items():
+                profile.add(f'lowering/{name}', seconds,
+                            lowering.blocks.get(name))
+        with phase(profile, 'semantics'):
+            return Semantics(features=features).process(tree,
+                                                        profile=profile)
 
     @classmethod
-    def compile(cls, tree, story, features, backend='json'):
+    def fold(cls, tree, profile=None):
+        """
+        Folds the constant expressions of a checked AST. The number of
+        folded operations is recorded in `profile` if given.
+        """
+        folder = ConstantFolder()
+        with phase(profile, 'folding'):
+            tree = folder.fold(tree)
+        if profile is not None:
+            profile.count('folding', folder.folded)
+        return tree
+
+    @classmethod
+    def compile(cls, tree, story, features, backend='json', profile=None):
         assert backend == 'json'
         compiler = JSONCompiler(story)
-        tree = cls.generate(tree, features)
-        return compiler.compile(tree)
+        tree = cls.generate(tree, features, profile=profile)
+        if features.fold:
+            tree = cls.fold(tree, profile=profile)
+        with phase(profile, 'json'):
+            return compiler.compile(tree)
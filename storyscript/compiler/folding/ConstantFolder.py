@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+import math
+from collections import Counter
+
+from lark.lexer import Token
+
+from storyscript.compiler.json.Objects import Objects
+from storyscript.compiler.lowering.Faketree import FakeTree
+from storyscript.compiler.lowering.utils import unicode_escape
+from storyscript.compiler.semantics.types.Types import BooleanType, \
+    FloatType, IntType, StringType, TimeType
+from storyscript.exceptions import CompilerError
+from storyscript.parser import Tree
+
+
+# integers outside of this range are left to the runtime
+_int_min = -2 ** 63
+_int_max = 2 ** 63 - 1
+
+
+def _sum(type_, left, right):
+    if type_ in (IntType.instance(), FloatType.instance(),
+                 StringType.instance(), TimeType.instance()):
+        return left + right
+
+
+def _subtraction(type_, left, right):
+    if type_ in (IntType.instance(), FloatType.instance(),
+                 TimeType.instance()):
+        return left - right
+
+
+def _multiplication(type_, left, right):
+    if type_ in (IntType.instance(), FloatType.instance()):
+        return left * right
+
+
+def _division(type_, left, right):
+    # the rounding of integer divisions is up to the runtime
+    if type_ == FloatType.instance() and right != 0:
+        return left / right
+
+
+def _modulus(type_, left, right):
+    # the sign of the remainder of negative numbers is up to the runtime
+    if type_ == IntType.instance() and left >= 0 and right > 0:
+        return left % right
+
+
+def _exponential(type_, left, right):
+    if type_ == IntType.instance() and right >= 0:
+        if abs(left) > 1 and right >= 64:
+            # the result is out of range anyway
+            return None
+        return left ** right
+
+
+def _and(type_, left, right):
+    if type_ == BooleanType.instance():
+        return left and right
+
+
+def _or(type_, left, right):
+    if type_ == BooleanType.instance():
+        return left or right
+
+
+def _equal(type_, left, right):
+    return left == right
+
+
+def _less(type_, left, right):
+    if type_ in (IntType.instance(), FloatType.instance(),
+                 TimeType.instance()):
+        return left < right
+
+
+def _less_equal(type_, left, right):
+    if type_ in (IntType.instance(), FloatType.instance(),
+                 TimeType.instance()):
+        return left <= right
+
+
+class ConstantFolder:
+    """
+    Evaluates the operations on literals of a checked AST at compile time,
+    s.t. the runtime doesn't evaluate them on every execution. Operations
+    which might fail, like a division by zero or an integer overflow, are
+    left to the runtime and fail there as before.
+    Compiler-inserted assignments of constants, e.g. the string templates
+    "{60 * 60}", are inlined into their references.
+    """
+
+    # the operations by their operator, and whether they return a boolean
+    operations = {
+        'PLUS': (_sum, False),
+        'DASH': (_subtraction, False),
+        'MULTIPLIER': (_multiplication, False),
+        'BSLASH': (_division, False),
+        'MODULUS': (_modulus, False),
+        'POWER': (_exponential, False),
+        'AND': (_and, True),
+        'OR': (_or, True),
+        'EQUAL': (_equal, True),
+        'LESSER': (_less, True),
+        'LESSER_EQUAL': (_less_equal, True),
+    }
+
+    # the types of casts by their names, which are also used by the casts
+    # the semantic analysis inserted
+    cast_types = {
+        'boolean': BooleanType,
+        'int': IntType,
+        'float': FloatType,
+        'string': StringType,
+        'time': TimeType,
+    }
+
+    # the nodes which are folded after their children
+    visited = frozenset(('expression', 'entity', 'assignment', 'block'))
+
+    def __init__(self):
+        # the number of operations evaluated at compile time
+        self.folded = 0
+        # the constants of compiler-inserted assignments, by their names
+        self.constants = {}
+        # the number of inlined and of all references to these names
+        self.inlined = Counter()
+        self.references = Counter()
+
+    def fold(self, tree):
+        """
+        Folds the constant expressions of a tree.
+        """
+        self.visit(tree)
+        return tree
+
+    def visit(self, tree):
+        for c in tree.children:
+            if isinstance(c, Tree):
+                self.visit(c)
+            elif c.type == 'NAME' and c.value.startswith(FakeTree.prefix):
+                self.references[c.value] += 1
+        if tree.data in self.visited:
+            getattr(self, tree.data)(tree)
+
+    def fake_name(self, path):
+        """
+        Returns the name of a path to a compiler-inserted variable or None.
+        """
+        if path is None or len(path.children) != 1:
+            return None
+        name = path.children[0]
+        if isinstance(name, Token) and name.type == 'NAME' and \
+                name.value.startswith(FakeTree.prefix):
+            return name.value
+        return None
+
+    def assignment(self, tree):
+        """
+        Remembers the constants of compiler-inserted assignments.
+        """
+        name = self.fake_name(tree.path)
+        if name is None:
+            return
+        child = tree.assignment_fragment.base_expression.child(0)
+        if child.data == 'expression':
+            constant = self.constant(child)
+            if constant is not None:
+                self.constants[name] = constant
+
+    def entity(self, tree):
+        """
+        Inlines a constant of a compiler-inserted assignment.
+        """
+        name = self.fake_name(tree.path)
+        if name is None or name not in self.constants:
+            return
+        tree.children[0] = self.values(tree, *self.constants[name])
+        self.inlined[name] += 1
+
+    def block(self, tree):
+        """
+        Removes the compiler-inserted assignments of constants which have
+        been inlined into all their references.
+        """
+        children = []
+        for c in tree.children:
+            name = self.fake_name(c.path) if c.data == 'assignment' else None
+            # the path of the assignment is a reference too
+            if name not in self.constants or \
+                    self.inlined[name] < self.references[name] - 1:
+                children.append(c)
+        if len(children) < len(tree.children):
+            tree.children = children
+
+    def constant(self, tree):
+        """
+        Returns the type and value of a literal expression or None.
+        """
+        if len(tree.children) != 1:
+            return None
+        entity = tree.children[0]
+        if entity.data != 'entity' or entity.children[0].data != 'values':
+            return None
+        literal = entity.children[0].children[0]
+        if not isinstance(literal, Tree):
+            return None
+        try:
+            if literal.data == 'number':
+                token = literal.children[0]
+                if token.type == 'FLOAT':
+                    return FloatType.instance(), float(token.value)
+                return IntType.instance(), int(token.value)
+            elif literal.data == 'string':
+                value = unicode_escape(literal, literal.children[0].value)
+                return StringType.instance(), value
+            elif literal.data == 'boolean':
+                value = literal.children[0].value == 'true'
+                return BooleanType.instance(), value
+            elif literal.data == 'time':
+                return TimeType.instance(), Objects.time(literal)['ms']
+        except CompilerError:
+            # invalid literals are reported by the JSON compiler
+            return None
+        return None
+
+    @staticmethod
+    def valid(type_, value):
+        """
+        Checks whether a computed value can be compiled as a literal.
+        """
+        if type_ == IntType.instance():
+            return _int_min <= value <= _int_max
+        if type_ == FloatType.instance():
+            return math.isfinite(value)
+        if type_ == TimeType.instance():
+            return 0 <= value <= _int_max
+        return True
+
+    @staticmethod
+    def values(tree, type_, value):
+        """
+        Builds the values tree of a constant.
+        """
+        if type_ == IntType.instance():
+            literal = Tree('number', [tree.create_token('INT', str(value))])
+        elif type_ == FloatType.instance():
+            literal = Tree('number', [tree.create_token('FLOAT',
+                                                        repr(value))])
+        elif type_ == StringType.instance():
+            # the JSON compiler evaluates the escape codes of strings
+            text = value.encode('unicode_escape').decode('ascii')
+            literal = Tree('string', [tree.create_token('DOUBLE_QUOTED',
+                                                        text)])
+        elif type_ == BooleanType.instance():
+            text = 'true' if value else 'false'
+            literal = Tree('boolean', [tree.create_token(text.upper(),
+                                                         text)])
+        else:
+            assert type_ == TimeType.instance()
+            literal = Tree('time', [tree.create_token('RAW_TIME',
+                                                      f'{value}ms')])
+        return Tree('values', [literal])
+
+    def replace(self, tree, type_, value):
+        """
+        Replaces an expression with a constant.
+        """
+        values = self.values(tree, type_, value)
+        tree.children = [Tree('entity', [values])]
+        tree.kind = 'primary_expression'
+
+    def expression(self, tree):
+        """
+        Folds an expression whose operands have been folded already.
+        """
+        first_child = tree.children[0]
+        if len(tree.children) == 1:
+            return
+        elif len(tree.children) == 2:
+            if tree.children[1].data == 'as_operator':
+                self.as_expression(tree, first_child, tree.children[1])
+            else:
+                self.unary_expression(tree, first_child.children[0],
+                                      tree.children[1])
+        else:
+            op = tree.children[1].children[0]
+            operands = [first_child, *tree.children[2:]]
+            self.nary_expression(tree, tree.children[1], op, operands)
+
+    def as_expression(self, tree, expression, as_operator):
+        constant = self.constant(expression)
+        base_type = as_operator.types.base_type
+        if constant is None or base_type is None:
+            return
+        type_, value = constant
+        to = self.cast_types.get(base_type.children[0].value)
+        if to is None:
+            return
+        to = to.instance()
+        if to != type_:
+            if type_ == IntType.instance() and to == FloatType.instance():
+                try:
+                    value = float(value)
+                except OverflowError:
+                    return
+            elif type_ == IntType.instance() and \
+                    to == StringType.instance():
+                value = str(value)
+            else:
+                # other casts are up to the runtime
+                return
+        if self.valid(to, value):
+            self.replace(tree, to, value)
+            self.folded += 1
+
+    def unary_expression(self, tree, op, expression):
+        constant = self.constant(expression)
+        if op.type != 'NOT' or constant is None or \
+                constant[0] != BooleanType.instance():
+            return
+        self.replace(tree, BooleanType.instance(), not constant[1])
+        self.folded += 1
+
+    def nary_expression(self, tree, operator, op, operands):
+        if op.type not in self.operations:
+            return
+        constants = [self.constant(o) for o in operands]
+        if op.type == 'PLUS' and any(c is not None and
+                                     c[0] == StringType.instance()
+                                     for c in constants):
+            return self.concatenation(tree, operator, operands, constants)
+        operation, boolean = self.operations[op.type]
+        if None in constants or (boolean and len(constants) != 2):
+            return
+        type_, value = constants[0]
+        for other_type, other in constants[1:]:
+            if other_type != type_:
+                return
+            value = operation(type_, value, other)
+            if value is None or not (boolean or self.valid(type_, value)):
+                return
+        if boolean:
+            type_ = BooleanType.instance()
+        self.replace(tree, type_, value)
+        self.folded += len(operands) - 1
+
+    def concatenation(self, tree, operator, operands, constants):
+        """
+        Merges the adjacent string literals of a string concatenation, which
+        might be a concatenation of string templates. All operands of a
+        string concatenation are strings, as the semantic analysis casts the
+        other ones, thus nested concatenations are merged as well.
+        """
+        flat = []
+        for operand, constant in zip(operands, constants):
+            if constant is None and len(operand.children) > 2 and \
+                    operand.children[1].children[0].type == 'PLUS':
+                # a nested concatenation
+                for nested in (operand.children[0], *operand.children[2:]):
+                    flat.append((nested, self.constant(nested)))
+            else:
+                flat.append((operand, constant))
+        merged = []
+        for operand, constant in flat:
+            previous = merged[-1][1] if merged else None
+            if constant is not None and previous is not None and \
+                    constant[0] == previous[0] == StringType.instance():
+                value = previous[1] + constant[1]
+                merged[-1] = (merged[-1][0], (StringType.instance(), value))
+            else:
+                merged.append((operand, constant))
+        if len(merged) == len(flat):
+            return
+        self.folded += len(flat) - len(merged)
+        if len(merged) == 1:
+            self.replace(tree, *merged[0][1])
+            return
+        children = []
+        for operand, constant in merged:
+            if constant is not None:
+                self.replace(operand, *constant)
+            children.append(operand)
+        tree.children = [children[0], operator, *children[1:]]
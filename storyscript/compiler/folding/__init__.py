@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+from storyscript.compiler.folding.ConstantFolder import ConstantFolder
+
+__all__ = ['ConstantFolder']
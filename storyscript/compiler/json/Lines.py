@@ -6,14 +6,22 @@ class Lines:
     """
     Holds compiled lines and provides methods for operation on lines.
     """
+
+    # the methods of lines which are exited by a following block
+    exit_methods = ('if', 'elif', 'try', 'catch')
+
     def __init__(self, story):
         self.story = story
         self.lines = {}
         self._lines = []  # sorted line nr (by insertion)
+        self._exit_line = None  # the last line with an exit method
         self.variables = []
+        self._variable_names = set()  # the hashable names of all variables
+        self._variable_objects = []  # the other names of all variables
         self.services = []
         self.functions = {}
         self.output_scopes = {}
+        self._outputs = {}  # the outputs of a scope and its parents
         self.finished_scopes = []
 
     def entrypoint(self):
@@ -50,6 +58,11 @@ class Lines:
             previous_line['name'] = name
 
         self.variables.append(name)
+        for value in name:
+            try:
+                self._variable_names.add(value)
+            except TypeError:
+                self._variable_objects.append(value)
 
     def set_next(self, line_number):
         """
@@ -64,18 +77,18 @@ class Lines:
         Sets the current line as the exit line for a previous one, as needed
         in if/elif/else and try/catch/finally blocks.
         """
-        methods = ['if', 'elif', 'try', 'catch']
-        for line_number in self._lines[::-1]:
-            if self.lines[line_number]['method'] in methods:
-                self.finished_scopes = []
-                self.lines[line_number]['exit'] = line
-                break
+        if self._exit_line is not None:
+            self.finished_scopes = []
+            self.lines[self._exit_line]['exit'] = line
 
     def set_scope(self, line, parent, output=[]):
         """
         Keeps track of output scopes so that defined outputs are recognized for
         nested children.
         """
+        if line in self.output_scopes:
+            # the outputs of this scope might have been resolved already
+            self._outputs = {}
         self.output_scopes[line] = {'parent': parent, 'output': output}
 
     def finish_scope(self, line):
@@ -85,19 +98,30 @@ class Lines:
         """
         self.finished_scopes.append(line)
 
+    def scope_outputs(self, line):
+        """
+        Returns the outputs defined by a scope and its parents.
+        """
+        scopes = []
+        while line in self.output_scopes and line not in self._outputs:
+            scopes.append(line)
+            parent = self.output_scopes[line].get('parent')
+            assert parent != line
+            line = parent or None
+        outputs = self._outputs.get(line, frozenset())
+        for line in reversed(scopes):
+            output = self.output_scopes[line]['output']
+            if output:
+                outputs = outputs.union(output)
+            self._outputs[line] = outputs
+        return outputs
+
     def is_output(self, parent, service):
         """
         Checks whether a service has been defined as output for this block
         or for its parents.
         """
-        if parent in self.output_scopes:
-            scope = self.output_scopes[parent]
-            if service in scope['output']:
-                return True
-            if scope['parent']:
-                assert scope['parent'] != parent
-                return self.is_output(scope['parent'], service)
-        return False
+        return service in self.scope_outputs(parent)
 
     def make(self, method, line, name=None, args=None, service=None,
              command=None, function=None, output=None, enter=None, exit=None,
@@ -123,6 +147,8 @@ class Lines:
         }
         # save insertion order
         self._lines.append(line)
+        if method in self.exit_methods:
+            self._exit_line = line
 
     def check_service_name(self, service, line):
         """
@@ -162,7 +188,7 @@ class Lines:
         """
         Checks whether a variable has been defined so far
         """
-        for vs in self.variables:
-            if variable_name in vs:
-                return True
-        return False
+        try:
+            return variable_name in self._variable_names
+        except TypeError:
+            return variable_name in self._variable_objects
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 from enum import Enum
 
+from lark.exceptions import UnexpectedInput
 from lark.lexer import Token
 
 from storyscript.compiler.lowering.Faketree import FakeTree
+from storyscript.compiler.lowering.PassManager import Pass, PassManager
 from storyscript.compiler.lowering.utils import service_to_mutation, \
         unicode_escape
+from storyscript.exceptions import CompilerError, StorySyntaxError
 from storyscript.parser.Transformer import Transformer
 from storyscript.parser.Tree import Tree
 
@@ -29,6 +32,8 @@ class Lowering:
         """
         self.parser = parser
         self.features = features
+        self.timings = None
+        self.blocks = None
 
     @staticmethod
     def fake_tree(block):
@@ -211,14 +216,11 @@ class Lowering:
                 'string': buf
             }
 
-    def eval(self, orig_node, code_string, fake_tree):
+    def parse_template_story(self, orig_node, code_string, column):
         """
-        Evaluates a string by parsing it to its AST representation.
-        Inserts the AST expression as fake_node and returns the path
-        reference to the inserted fake_node.
+        Parses the code of a string template as a story and returns its only
+        statement. This also reports the errors of invalid templates.
         """
-        line = orig_node.line()
-        column = int(orig_node.column()) + 1
         # add whitespace as padding to fixup the column location of the
         # resulting tokens.
         from storyscript.Story import Story
@@ -233,6 +235,31 @@ class Lowering:
             orig_node.expect(len(new_node.children) == 1,
                              'string_templates_no_assignment')
             new_node = new_node.children[0]
+        return new_node
+
+    def parse_template(self, orig_node, code_string, column):
+        """
+        Parses the code of a string template to its AST representation.
+        """
+        try:
+            new_node = self.parser.parse_template(code_string, column + 1)
+        except (CompilerError, StorySyntaxError, UnexpectedInput):
+            # parsing the template as a story reports the error
+            new_node = None
+        if new_node is None:
+            new_node = self.parse_template_story(orig_node, code_string,
+                                                 column)
+        return new_node
+
+    def eval(self, orig_node, code_string, fake_tree):
+        """
+        Evaluates a string by parsing it to its AST representation.
+        Inserts the AST expression as fake_node and returns the path
+        reference to the inserted fake_node.
+        """
+        line = orig_node.line()
+        column = int(orig_node.column()) + 1
+        new_node = self.parse_template(orig_node, code_string, column)
         # for now only expressions or service_blocks are allowed inside string
         # templates
         if new_node.data == 'service_block' and \
@@ -381,9 +408,11 @@ class Lowering:
         # concise_when_blocks can only occur at the root-level, hence we can
         # directly iterate here:
         if node.data == 'block':
-            fake_tree = self.fake_tree(node)
+            fake_tree = None
             for i, c in enumerate(node.children):
                 if c.data == 'concise_when_block':
+                    if fake_tree is None:
+                        fake_tree = self.fake_tree(node)
                     node.children[i] = self.process_concise_block(c, fake_tree)
 
     def process_concise_block(self, node, fake_tree):
@@ -496,15 +525,11 @@ class Lowering:
             Tree('expression', node.children),
         ]
 
-    def visit_cmp_expr(self, node):
+    def lower_cmp_expr(self, node, parent, scope):
         """
-        Visit assignments and lower destructors
+        Rewrites comparisons, s.t. only `==`, `<` and `<=` are used.
         """
-        if not hasattr(node, 'children') or len(node.children) == 0:
-            return
-
-        if node.data == 'expression' and node.kind == 'cmp_expression' and \
-                len(node.children) == 3:
+        if node.kind == 'cmp_expression' and len(node.children) == 3:
             cmp_op = node.child(1)
             assert cmp_op.data == 'cmp_operator'
             cmp_tok = cmp_op.child(0)
@@ -513,118 +538,128 @@ class Lowering:
                     cmp_tok.type == 'GREATER':
                 self.rewrite_cmp_expr(node)
 
-        for c in node.children:
-            self.visit_cmp_expr(c)
-
-    def visit_arguments(self, node):
+    def lower_arguments(self, node, parent, scope):
         """
         Transforms an argument tree. Short-hand argument (:foo) will be
         expanded.
         """
-        if not hasattr(node, 'children') or len(node.children) == 0:
-            return
+        Transformer.argument_shorthand(node)
 
-        if node.data == 'arguments':
-            Transformer.argument_shorthand(node)
+    @staticmethod
+    def enter_foreach_block(node, parent, scope):
+        output = node.foreach_statement
+        assert output is not None
+        return scope.update(output=output)
 
-        for c in node.children:
-            self.visit_arguments(c)
+    @staticmethod
+    def enter_service_block(node, parent, scope):
+        output = node.service.service_fragment
+        assert output is not None
+        return scope.update(output=output)
 
-    def visit_as_expr(self, node, block):
+    def lower_as_expr(self, node, parent, scope):
         """
-        Visit assignments and move 'as' up the tree if required
+        Move 'as' up the tree if required
         """
-        if not hasattr(node, 'children') or len(node.children) == 0:
-            return
-
-        if node.data == 'foreach_block':
-            block = node.foreach_statement
-            assert block is not None
-        elif node.data == 'service_block' or node.data == 'when_block':
-            block = node.service.service_fragment
-            block = node.service.service_fragment
-            assert block is not None
-
-        if node.data == 'expression' and node.kind == 'as_expression':
+        if node.kind == 'as_expression':
             as_op = node.as_operator
             if as_op is not None and as_op.output_names is not None:
+                # the operand might still be a comparison to be rewritten
+                operand = node.children[0]
+                if operand.data == 'expression':
+                    self.lower_cmp_expr(operand, node, scope)
                 output = Tree('output', as_op.output_names.children)
-                node.expect(block is not None, 'service_no_inline_output')
-                block.children.append(output)
+                node.expect(scope.output is not None,
+                            'service_no_inline_output')
+                scope.output.children.append(output)
                 node.children = [node.children[0].children[0]]
 
-        for c in node.children:
-            self.visit_as_expr(c, block)
-
-    def visit_function_dot(self, node, block):
+    def lower_function_dot(self, node, parent, scope):
         """
-        Visit function call with more than one path and lower
-        them into mutations.
+        Lowers function calls with more than one path into mutations.
         """
-        if not hasattr(node, 'children') or len(node.children) == 0:
-            return
-
-        if node.data == 'call_expression':
-            call_expr = node
-            if len(call_expr.path.children) > 1:
-                path_fragments = call_expr.path.children
-                call_expr.children = [
-                    Tree('expression', [
-                        Tree('entity', [
-                            Tree('path', call_expr.path.children[:-1])
-                        ])
-                    ]),
-                    Tree('mutation_fragment', [
-                        path_fragments[-1].children[0],
-                        *call_expr.children[1:]
+        call_expr = node
+        if len(call_expr.path.children) > 1:
+            path_fragments = call_expr.path.children
+            call_expr.children = [
+                Tree('expression', [
+                    Tree('entity', [
+                        Tree('path', call_expr.path.children[:-1])
                     ])
-                ]
-                call_expr.data = 'mutation'
+                ]),
+                Tree('mutation_fragment', [
+                    path_fragments[-1].children[0],
+                    *call_expr.children[1:]
+                ])
+            ]
+            call_expr.data = 'mutation'
 
-        for c in node.children:
-            self.visit_function_dot(c, block)
+    def enter_block(self, node, parent, scope):
+        # only generate a fake_block once for every line
+        # node: block in which the fake assignments should be inserted
+        return scope.update(block=self.fake_tree(node))
 
-    def visit_dot_expression(self, node, block, parent):
+    def lower_dot_expression(self, node, parent, scope):
         """
-        Visit dot expression and lower them into mutation fragments.
+        Lowers dot expressions into mutation fragments.
         """
-        if not hasattr(node, 'children') or len(node.children) == 0:
-            return
-
-        if node.data == 'block':
-            # only generate a fake_block once for every line
-            # node: block in which the fake assignments should be inserted
-            block = self.fake_tree(node)
-
-        if node.data == 'dot_expression':
-            dot_expr = node
-            expression = Tree('mutation', [
-                parent.expression,
-                Tree('mutation_fragment', [
-                    dot_expr.child(0),  # name
-                    dot_expr.arguments
-                ])
+        dot_expr = node
+        expression = Tree('mutation', [
+            parent.expression,
+            Tree('mutation_fragment', [
+                dot_expr.child(0),  # name
+                dot_expr.arguments
             ])
-            path = block.add_assignment(expression,
-                                        original_line=parent.line())
-            parent.children = [Tree('entity', [path])]
-
-        for c in node.children:
-            self.visit_dot_expression(c, block, parent=node)
+        ])
+        path = scope.block.add_assignment(expression,
+                                          original_line=parent.line())
+        parent.children = [Tree('entity', [path])]
 
-    def process(self, tree):
+    def passes(self, profiled=False):
         """
-        Applies several preprocessing steps to the existing AST.
+        Registers all lowering passes. Passes whose rules only depend on the
+        nodes they rewrite share a traversal. The other passes insert new
+        lines into blocks, which must be seen by all later passes, or their
+        errors would be reported in a different order.
         """
         pred = Lowering.is_inline_expression
-        self.visit_concise_when(tree)
-        self.visit_cmp_expr(tree)
-        self.visit_as_expr(tree, block=None)
-        self.visit_arguments(tree)
-        self.visit_assignment(tree, block=None, parent=None)
-        self.visit_string_templates(tree, block=None, parent=None)
-        self.visit_function_dot(tree, block=None)
-        self.visit_dot_expression(tree, block=None, parent=None)
-        self.visit(tree, None, None, pred,
-                   self.replace_expression, parent=None)
+        passes = PassManager(profiled=profiled)
+        passes.add('concise_when', self.visit_concise_when)
+        passes.fuse(
+            Pass('cmp_expr', enter={'expression': self.lower_cmp_expr}),
+            Pass('as_expr', enter={
+                'foreach_block': self.enter_foreach_block,
+                'service_block': self.enter_service_block,
+                'when_block': self.enter_service_block,
+                'expression': self.lower_as_expr,
+            }),
+            # shorthands can only be detected after 'as' has been moved
+            Pass('arguments', leave={'arguments': self.lower_arguments}),
+        )
+        passes.add('assignment', lambda tree: self.visit_assignment(
+            tree, block=None, parent=None))
+        passes.add('string_templates', lambda tree:
+                   self.visit_string_templates(tree, block=None, parent=None))
+        passes.fuse(
+            Pass('function_dot', enter={
+                'call_expression': self.lower_function_dot,
+            }),
+            Pass('dot_expression', enter={
+                'block': self.enter_block,
+                'dot_expression': self.lower_dot_expression,
+            }),
+        )
+        passes.add('inline_expressions', lambda tree: self.visit(
+            tree, None, None, pred, self.replace_expression, parent=None))
+        return passes
+
+    def process(self, tree, profiled=False):
+        """
+        Applies several preprocessing steps to the existing AST. The passes
+        are timed if `profiled`.
+        """
+        passes = self.passes(profiled=profiled)
+        passes.run(tree)
+        self.timings = passes.timings
+        self.blocks = passes.blocks
         return tree
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+from collections import OrderedDict
+
+from storyscript.parser.Tree import Tree
+
+
+class Pass:
+    """
+    A lowering pass which is made of rules for specific node kinds.
+    `enter` rules are applied before the children of a node are visited and
+    may return a new scope for the children, `leave` rules are applied after
+    the children have been visited.
+    """
+
+    def __init__(self, name, enter=None, leave=None):
+        self.name = name
+        self.enter = enter or {}
+        self.leave = leave or {}
+
+
+class Scope:
+    """
+    Values of the enclosing nodes, which are set by `enter` rules. Values
+    which haven't been set are `None`.
+    """
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    def update(self, **values):
+        """
+        Returns a new scope with updated values.
+        """
+        scope = Scope(**self.__dict__)
+        scope.__dict__.update(values)
+        return scope
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return None
+
+
+class PassManager:
+    """
+    Runs the lowering passes in their registration order. Fused passes share
+    a single traversal of the tree and their rules are applied in the order
+    of the passes at every node. The passes are only timed if `profiled`.
+    """
+
+    def __init__(self, profiled=False):
+        self.profiled = profiled
+        self.stages = []
+        self.timings = OrderedDict()
+        # the change of allocated memory blocks, by stage
+        self.blocks = OrderedDict()
+
+    def add(self, name, run):
+        """
+        Adds a pass which traverses the tree on its own with `run(tree)`.
+        """
+        self.timings[name] = 0.0
+        self.stages.append((name, run))
+
+    def fuse(self, *passes):
+        """
+        Adds passes which are applied in a single traversal.
+        """
+        enter = {}
+        leave = {}
+        for p in passes:
+            self.timings[p.name] = 0.0
+            for kind, rule in p.enter.items():
+                enter.setdefault(kind, []).append((p.name, rule))
+            for kind, rule in p.leave.items():
+                leave.setdefault(kind, []).append((p.name, rule))
+
+        apply = self.apply if self.profiled else self.apply_rules
+
+        def walk(node, parent, scope):
+            if not node.children:
+                return
+
+            rules = enter.get(node.data)
+            if rules is not None:
+                scope = apply(rules, node, parent, scope)
+
+            for c in node.children:
+                if isinstance(c, Tree):
+                    walk(c, node, scope)
+
+            rules = leave.get(node.data)
+            if rules is not None:
+                apply(rules, node, parent, scope)
+
+        def traverse(tree):
+            walk(tree, None, Scope())
+
+        def profiled_traverse(tree):
+            # the time spent in rules is recorded for their passes
+            names = [p.name for p in passes]
+            rule_time = sum(self.timings[name] for name in names)
+            walk(tree, None, Scope())
+            rule_time -= sum(self.timings[name] for name in names)
+            self.timings['traversal'] += rule_time
+
+        run = profiled_traverse if self.profiled else traverse
+        self.stages.append(('traversal', run))
+        self.timings['traversal'] = 0.0
+
+    @staticmethod
+    def apply_rules(rules, node, parent, scope):
+        """
+        Applies rules to a node and returns the scope for its children.
+        """
+        for name, rule in rules:
+            new_scope = rule(node, parent, scope)
+            if new_scope is not None:
+                scope = new_scope
+        return scope
+
+    def apply(self, rules, node, parent, scope):
+        """
+        Applies rules to a node like `apply_rules` and records their time.
+        """
+        timings = self.timings
+        for name, rule in rules:
+            start = time.perf_counter()
+            new_scope = rule(node, parent, scope)
+            timings[name] += time.perf_counter() - start
+            if new_scope is not None:
+                scope = new_scope
+        return scope
+
+    def run(self, tree):
+        """
+        Runs all passes. If profiled, the time spent in every pass is
+        recorded. The time of fused traversals which isn't spent in rules is
+        recorded as `traversal`. The allocated memory blocks are recorded
+        per stage.
+        """
+        if not self.profiled:
+            for name, run in self.stages:
+                run(tree)
+            return tree
+        blocks = self.blocks
+        for name, run in self.stages:
+            allocated = sys.getallocatedblocks()
+            start = time.perf_counter()
+            run(tree)
+            self.timings[name] += time.perf_counter() - start
+            allocated = sys.getallocatedblocks() - allocated
+            blocks[name] = blocks.get(name, 0) + allocated
+        return tree
@@ -332,31 +332,43 @@ class ExpressionResolver:
         item = self.types(c).type()
         return base_symbol(ListType(item))
 
+    # the types of the base type tokens
+    base_types = {
+        'BOOLEAN_TYPE': BooleanType,
+        'INT_TYPE': IntType,
+        'FLOAT_TYPE': FloatType,
+        'STRING_TYPE': StringType,
+        'ANY_TYPE': AnyType,
+        'OBJECT_TYPE': ObjectType,
+        'FUNCTION_TYPE': AnyType,
+        'TIME_TYPE': TimeType,
+        'REGEXP_TYPE': RegExpType,
+    }
+
     def base_type(self, tree):
         """
         Resolves a base type expression to a type
         """
         assert tree.data == 'base_type'
         tok = tree.first_child()
-        if tok.type == 'BOOLEAN_TYPE':
-            return base_symbol(BooleanType.instance())
-        elif tok.type == 'INT_TYPE':
-            return base_symbol(IntType.instance())
-        elif tok.type == 'FLOAT_TYPE':
-            return base_symbol(FloatType.instance())
-        elif tok.type == 'STRING_TYPE':
-            return base_symbol(StringType.instance())
-        elif tok.type == 'ANY_TYPE':
-            return base_symbol(AnyType.instance())
-        elif tok.type == 'OBJECT_TYPE':
-            return base_symbol(ObjectType.instance())
-        elif tok.type == 'FUNCTION_TYPE':
-            return base_symbol(AnyType.instance())
-        elif tok.type == 'TIME_TYPE':
-            return base_symbol(TimeType.instance())
-        else:
-            assert tok.type == 'REGEXP_TYPE'
-            return base_symbol(RegExpType.instance())
+        type_ = self.base_types.get(tok.type)
+        assert type_ is not None, tok.type
+        return base_symbol(type_.instance())
+
+    def void(self, tree):
+        return base_symbol(AnyType.instance())
+
+    # the handlers of values, by the name of their tree
+    value_handlers = {
+        'string': string,
+        'boolean': boolean,
+        'list': list,
+        'number': number,
+        'time': time,
+        'map': map,
+        'regular_expression': regular_expression,
+        'void': void,
+    }
 
     def values(self, tree):
         """
@@ -364,23 +376,9 @@ class ExpressionResolver:
         """
         subtree = tree.child(0)
         if hasattr(subtree, 'data'):
-            if subtree.data == 'string':
-                return self.string(subtree)
-            elif subtree.data == 'boolean':
-                return self.boolean(subtree)
-            elif subtree.data == 'list':
-                return self.list(subtree)
-            elif subtree.data == 'number':
-                return self.number(subtree)
-            elif subtree.data == 'time':
-                return self.time(subtree)
-            elif subtree.data == 'map':
-                return self.map(subtree)
-            elif subtree.data == 'regular_expression':
-                return self.regular_expression(subtree)
-            else:
-                assert subtree.data == 'void'
-                return base_symbol(AnyType.instance())
+            handler = self.value_handlers.get(subtree.data)
+            assert handler is not None, subtree.data
+            return handler(self, subtree)
 
         assert subtree.type == 'NAME'
         return self.path(tree)
@@ -510,20 +508,21 @@ class ExpressionResolver:
     def call_expression(self, tree):
         return self.resolve_function(tree)
 
+    # the handlers of base expressions, by the name of their tree
+    base_expression_handlers = {
+        'expression': expression,
+        'service': service,
+        'mutation': mutation,
+        'call_expression': call_expression,
+        'path': path,
+    }
+
     def base_expression(self, tree):
         """
         Compiles an soon to be expression object with the given tree.
         """
         assert tree.data == 'base_expression'
         child = tree.child(0)
-        if child.data == 'expression':
-            return self.expression(child)
-        elif child.data == 'service':
-            return self.service(child)
-        elif child.data == 'mutation':
-            return self.mutation(child)
-        elif child.data == 'call_expression':
-            return self.call_expression(child)
-        else:
-            assert child.data == 'path'
-            return self.path(child)
+        handler = self.base_expression_handlers.get(child.data)
+        assert handler is not None, child.data
+        return handler(self, child)
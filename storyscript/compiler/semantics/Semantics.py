@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from storyscript.Profiler import phase
 
 from .FunctionResolver import FunctionResolver
 from .TypeResolver import TypeResolver
@@ -16,12 +17,16 @@ class Semantics:
 
     visitors = [FunctionResolver, TypeResolver]
 
-    def process(self, tree):
+    def process(self, tree, profile=None):
+        """
+        Runs the visitors, recording them in `profile` if given.
+        """
         self.function_table = FunctionTable()
         self.mutation_table = MutationTable.init()
         for visitor in self.visitors:
             v = visitor(function_table=self.function_table,
                         mutation_table=self.mutation_table,
                         features=self.features)
-            v.visit(tree)
+            with phase(profile, f'semantics/{visitor.__name__}'):
+                v.visit(tree)
         return tree
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import types
 
 from storyscript.parser import Tree
 
@@ -10,14 +11,37 @@ class BaseVisitor:
         self.features = features
 
 
+def _handlers(cls):
+    """
+    Builds the dispatch table of a visitor class, which maps the names of
+    nodes to the methods handling them.
+    """
+    handlers = {}
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            if isinstance(value, types.FunctionType) and \
+                    not name.startswith('_'):
+                handlers[name] = value
+    return handlers
+
+
 class SelectiveVisitor(BaseVisitor):
     """
     A selective visitor which only visits defined nodes.
     visit_children must be called explicitly.
     """
+
+    # the methods handling nodes, by the names of the nodes
+    handlers = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.handlers = _handlers(cls)
+
     def visit(self, tree):
-        if hasattr(self, tree.data):
-            return getattr(self, tree.data)(tree)
+        handler = self.handlers.get(tree.data)
+        if handler is not None:
+            return handler(self, tree)
 
     def visit_children(self, tree):
         for c in tree.children:
@@ -30,9 +54,18 @@ class ScopeSelectiveVisitor(BaseVisitor):
     A selective visitor which only visits defined nodes.
     visit_children must be called explicitly.
     """
+
+    # the methods handling nodes, by the names of the nodes
+    handlers = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.handlers = _handlers(cls)
+
     def visit(self, tree, scope=None):
-        if hasattr(self, tree.data):
-            return getattr(self, tree.data)(tree, scope)
+        handler = self.handlers.get(tree.data)
+        if handler is not None:
+            return handler(self, tree, scope)
 
     def visit_children(self, tree, scope):
         for c in tree.children:
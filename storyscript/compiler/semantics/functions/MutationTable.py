@@ -1,3 +1,4 @@
+from functools import lru_cache
 from itertools import chain
 
 from storyscript.compiler.semantics.functions.HubMutations import hub
@@ -14,6 +15,7 @@ class MutationOverloads:
         self._obj = {}
         self._name = name
         self._type = type_
+        self._all = None
 
     def add_overloads(self, overloads):
         for name, overload in overloads.items():
@@ -23,13 +25,16 @@ class MutationOverloads:
         if name not in self._obj:
             self._obj[name] = []
         self._obj[name].append(overload)
+        self._all = None
 
     def all(self):
         """
-        Builds a sorted list of all available overloads.
+        Returns a sorted list of all available overloads.
         """
-        overloads = chain.from_iterable(self._obj.values())
-        return list(sorted(overloads, key=lambda m: m.cmp_name()))
+        if self._all is None:
+            overloads = chain.from_iterable(self._obj.values())
+            self._all = list(sorted(overloads, key=lambda m: m.cmp_name()))
+        return self._all
 
     def single(self):
         """
@@ -70,6 +75,15 @@ class MutationOverloads:
         """
         return self._name
 
+    def with_type(self, type_):
+        """
+        Returns the same overloads for a specific type.
+        """
+        overloads = MutationOverloads(self._name, type_)
+        overloads._obj = self._obj
+        overloads._all = self.all()
+        return overloads
+
 
 class MutationTable:
     """
@@ -77,6 +91,9 @@ class MutationTable:
     """
     def __init__(self):
         self.mutations = {}
+        # resolved overloads by (type key, name), the key `None` stands for
+        # overloads on any type
+        self._overloads = {}
 
     def insert(self, mutation):
         """
@@ -97,6 +114,7 @@ class MutationTable:
         else:
             muts[t] = {}
         muts[t][arg_names] = mutation
+        self._overloads.clear()
 
     @staticmethod
     def type_key(type_):
@@ -114,32 +132,55 @@ class MutationTable:
             mo.add_overloads(overloads)
         return mo
 
-    def resolve(self, type_, name):
+    def overloads(self, key, name):
         """
-        Returns the mutation `name` or `None`.
+        Returns the overloads of the mutation `name` for a type key or on
+        any type if the key is `None`. The overloads are only built once.
         """
+        overloads = self._overloads.get((key, name), None)
+        if overloads is not None:
+            return overloads
+
         muts = self.mutations.get(name, None)
         if muts is None:
             return None
 
+        if key is None:
+            overloads = self._resolve_any(muts, name)
+        else:
+            type_overloads = muts.get(key, None)
+            if type_overloads is None:
+                return None
+            overloads = MutationOverloads(name, None)
+            overloads.add_overloads(type_overloads)
+        self._overloads[(key, name)] = overloads
+        return overloads
+
+    def resolve(self, type_, name):
+        """
+        Returns the mutation `name` or `None`.
+        """
         if type_ == AnyType.instance():
-            return self._resolve_any(muts, name)
+            return self.overloads(None, name)
 
-        t = self.type_key(type(type_))
-        overloads = muts.get(t, None)
+        overloads = self.overloads(self.type_key(type(type_)), name)
         if overloads is None:
             return None
-
-        mo = MutationOverloads(name, type_)
-        mo.add_overloads(overloads)
-        return mo
+        return overloads.with_type(type_)
 
     @classmethod
+    @lru_cache(maxsize=None)
     def init(cls):
         """
-        Builds a list of all mutations of the Hub.
+        Builds a list of all mutations of the Hub. The table is built once
+        and shared by all compilations, thus it must not be modified.
         """
         mi = cls()
         for m in hub.mutations():
             mi.insert(m)
+        # resolve everything now, s.t. the shared table is never modified
+        for name, muts in mi.mutations.items():
+            mi.overloads(None, name).all()
+            for key in muts:
+                mi.overloads(key, name).all()
         return mi
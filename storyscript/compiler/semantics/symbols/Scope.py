@@ -5,23 +5,64 @@ from storyscript.compiler.semantics.types.Types import ObjectType
 from .Symbols import StorageClass, Symbol, Symbols
 
 
+_missing = object()
+
+
 class Scope:
     """
-    Manages an individual scope
+    Manages an individual scope.
+    Every scope caches the symbols it resolved, including missing symbols,
+    s.t. repeated lookups don't walk the parent scopes. The caches of a
+    scope tree are valid for one generation, which ends whenever a symbol is
+    inserted into a scope with child scopes.
     """
 
     def __init__(self, parent=None):
         self._parent = parent
         self._symbols = Symbols()
+        self._children = False
+        if parent is None:
+            # the generation is shared by all scopes of a tree
+            self._generation = [0]
+        else:
+            parent._children = True
+            self._generation = parent._generation
+        self._resolved = {}
+        self._resolved_generation = self._generation[0]
 
     def insert(self, sym):
         self._symbols.insert(sym)
+        generation = self._generation
+        valid = self._resolved_generation == generation[0]
+        if self._children:
+            # the caches of the child scopes might contain this name
+            generation[0] += 1
+        if valid:
+            self._resolved[sym.name()] = sym
+            self._resolved_generation = generation[0]
 
     def resolve(self, path):
-        for scope in self.scopes():
-            p = scope._symbols.resolve(path)
-            if p:
-                return p
+        generation = self._generation[0]
+        walked = []
+        scope = self
+        symbol = None
+        while scope is not None:
+            if scope._resolved_generation != generation:
+                scope._resolved = {}
+                scope._resolved_generation = generation
+            symbol = scope._resolved.get(path, _missing)
+            if symbol is not _missing:
+                break
+            walked.append(scope)
+            symbol = scope._symbols.resolve(path)
+            if symbol is not None:
+                break
+            scope = scope._parent
+        else:
+            symbol = None
+        for scope in walked:
+            scope._resolved[path] = symbol
+        return symbol
 
     def symbols(self):
         """
@@ -39,9 +80,10 @@ class Scope:
         """
         Iterator over this and all its parent scopes
         """
-        yield self
-        if self._parent is not None:
-            yield from self._parent.scopes()
+        scope = self
+        while scope is not None:
+            yield scope
+            scope = scope._parent
 
     def pretty(self):
         indent = '\t'
@@ -77,16 +119,19 @@ class ScopeJoiner:
         if self.scope is None:
             self.scope = scope
             self.symbols = scope._symbols._symbols
+            self.names = None
         else:
             # join symbols
-            symbols = scope._symbols._symbols
-            for k in [*self.symbols.keys()]:
-                if k not in symbols:
-                    del self.symbols[k]
+            names = scope._symbols._symbols.keys()
+            if self.names is None:
+                self.names = self.symbols.keys() & names
+            else:
+                self.names &= names
 
     def insert_to(self, scope):
         """
         Inserts the joined set of symbols into a scope.
         """
-        for s in self.symbols.values():
-            scope.insert(s)
+        for name, s in self.symbols.items():
+            if self.names is None or name in self.names:
+                scope.insert(s)
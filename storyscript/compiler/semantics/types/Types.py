@@ -16,13 +16,42 @@ def singleton(fn):
     return wrapped
 
 
+_missing = object()
+
+
+def memoize(fn):
+    """
+    Caches the results of a function of interned types
+    """
+    results = {}
+
+    def wrapped(*args):
+        result = results.get(args, _missing)
+        if result is _missing:
+            result = results.setdefault(args, fn(*args))
+        return result
+    return wrapped
+
+
+_binary_ops = {}
+
+
 def binary_op(op, left, right):
     """
     Default binary operation:
         1) if both types are equal -> left.op(op)
         2) if string concat and the other type can be stringified -> string
         3) try to implicitly convert left to right or right -> implicit.op(op)
+    The results are cached by the type of `op`, which is all they depend on.
     """
+    key = (op.type if op else None, left, right)
+    new_type = _binary_ops.get(key, _missing)
+    if new_type is _missing:
+        new_type = _binary_ops.setdefault(key, _binary_op(op, left, right))
+    return new_type
+
+
+def _binary_op(op, left, right):
     if left == right:
         return left.op(op)
     if op and op.type == 'PLUS':
@@ -76,9 +105,25 @@ def implicit_cast(t1, t2):
 
 class BaseType:
     """
-    Base class of a type.
+    Base class of a type. Types are interned, i.e. structurally equal types
+    are the same object, s.t. types are equal if they are identical and
+    can be used as dict keys.
     """
 
+    _interned = {}
+
+    def __new__(cls, *args):
+        key = (cls, *args)
+        t = BaseType._interned.get(key)
+        if t is None:
+            t = object.__new__(cls)
+            t._args = args
+            t = BaseType._interned.setdefault(key, t)
+        return t
+
+    def __reduce__(self):
+        return type(self), self._args
+
     def binary_op(self, other, op):
         """
         Returns the new_type if the type supports this operation.
@@ -170,9 +215,6 @@ class BooleanType(BaseType):
     def __str__(self):
         return 'boolean'
 
-    def __eq__(self, other):
-        return isinstance(other, BooleanType)
-
     def op(self, op):
         return IntType.instance()
 
@@ -208,9 +250,6 @@ class NoneType(BaseType):
     def __str__(self):
         return 'none'
 
-    def __eq__(self, other):
-        return isinstance(other, NoneType)
-
     def can_be_assigned(self, other):
         return False
 
@@ -248,9 +287,6 @@ class IntType(BaseType):
     def __str__(self):
         return 'int'
 
-    def __eq__(self, other):
-        return isinstance(other, IntType)
-
     def op(self, op):
         return self
 
@@ -295,9 +331,6 @@ class FloatType(BaseType):
     def __str__(self):
         return 'float'
 
-    def __eq__(self, other):
-        return isinstance(other, FloatType)
-
     def op(self, op):
         return self
 
@@ -331,9 +364,6 @@ class StringType(BaseType):
     def __str__(self):
         return 'string'
 
-    def __eq__(self, other):
-        return isinstance(other, StringType)
-
     def op(self, op):
         if op.type == 'PLUS':
             return self
@@ -373,9 +403,6 @@ class TimeType(BaseType):
     def __str__(self):
         return 'time'
 
-    def __eq__(self, other):
-        return isinstance(other, TimeType)
-
     def op(self, op):
         if op.type == 'PLUS' or op.type == 'DASH':
             return self
@@ -406,9 +433,6 @@ class RegExpType(BaseType):
     def __str__(self):
         return 'regexp'
 
-    def __eq__(self, other):
-        return isinstance(other, RegExpType)
-
     def op(self, op):
         # no operations allowed on RegExp
         return None
@@ -444,9 +468,6 @@ class RangeType(BaseType):
     def __str__(self):
         return 'range'
 
-    def __eq__(self, other):
-        return isinstance(other, RangeType)
-
     @singleton
     def instance():
         """
@@ -466,15 +487,12 @@ class ListType(BaseType):
     def __str__(self):
         return f'List[{self.inner}]'
 
-    def __eq__(self, other):
-        return isinstance(other, ListType) and \
-            self.inner == other.inner
-
     def op(self, op):
         if op.type == 'PLUS':
             return self
         return None
 
+    @memoize
     def implicit_to(self, other):
         if self == other:
             return self
@@ -513,6 +531,7 @@ class ListType(BaseType):
     def hashable(self):
         return False
 
+    @memoize
     def explicit_from(self, other):
         if self == other:
             return self
@@ -537,14 +556,10 @@ class MapType(BaseType):
     def __str__(self):
         return f'Map[{self.key},{self.value}]'
 
-    def __eq__(self, other):
-        return isinstance(other, MapType) and \
-               self.key == other.key and \
-               self.value == other.value
-
     def op(self, op):
         return None
 
+    @memoize
     def implicit_to(self, other):
         if self == other:
             return self
@@ -581,6 +596,7 @@ class MapType(BaseType):
     def hashable(self):
         return False
 
+    @memoize
     def explicit_from(self, other):
         if self == other:
             return self
@@ -600,9 +616,6 @@ class ObjectType(BaseType):
     def __str__(self):
         return f'Object'
 
-    def __eq__(self, other):
-        return isinstance(other, ObjectType)
-
     def op(self, op):
         return None
 
@@ -638,9 +651,6 @@ class AnyType(BaseType):
     def __str__(self):
         return 'any'
 
-    def __eq__(self, other):
-        return isinstance(other, AnyType)
-
     def can_be_assigned(self, other):
         return True
 
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import click
+
+
+class BundleError(Exception):
+    """
+    The errors of all stories of a bundle, when they are collected instead
+    of stopping at the first error.
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+    @property
+    def error(self):
+        """
+        The error of the first story, s.t. it can be handled like a
+        StoryError
+        """
+        return self.errors[0].error
+
+    def messages(self):
+        return [error.message() for error in self.errors]
+
+    def echo(self):
+        """
+        Prints the message of every error
+        """
+        click.echo('\n\n'.join(self.messages()))
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
+from .BundleError import BundleError
 from .CompilerError import CompilerError
 from .InternalCompilerError import InternalCompilerError, internal_assert
 from .ProcessingError import ProcessingError
 from .StoryError import StoryError
 from .StorySyntaxError import StorySyntaxError
 
-__all__ = ['CompilerError', 'InternalCompilerError', 'internal_assert',
-           'ProcessingError', 'StoryError', 'StorySyntaxError']
+__all__ = ['BundleError', 'CompilerError', 'InternalCompilerError',
+           'internal_assert', 'ProcessingError', 'StoryError',
+           'StorySyntaxError']
@@ -271,6 +271,15 @@ class Grammar:
         self.ebnf.block = block
         self.ebnf.nested_block = 'indent block+ dedent'
 
+    def template(self):
+        """
+        Defines the code of string templates, which can be an expression or a
+        service call. Lark only supports one start rule, thus templates are
+        marked with a token which is inserted by the parser.
+        """
+        self.ebnf._TEMPLATE_START = r'/(?!)TEMPLATE_START/'
+        self.ebnf.template = 'template_start (absolute_expression, service) nl'
+
     def build(self):
         self.ebnf._WS = '(" ")+'
         self.macros()
@@ -289,7 +298,8 @@ class Grammar:
         self.try_block()
         self.throw_statement()
         self.block()
-        self.ebnf.start = 'nl? block*'
+        self.template()
+        self.ebnf.start = 'nl? block*, template'
         self.ebnf.ignore('_WS')
         self.ebnf.SINGLE_LINE_COMMENT = r'/(\r?\n)?\s*#[^\n\r]*/'
         self.ebnf.ignore('SINGLE_LINE_COMMENT')
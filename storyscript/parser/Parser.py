@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
+import copy
 import io
+import itertools
+from collections import OrderedDict
+from functools import partial
 
 from lark import Lark
+from lark.exceptions import UnexpectedInput
+from lark.lexer import PatternStr, Token
+from lark.parsers.lalr_parser import _Parser as LalrParser
 
 from .Grammar import Grammar
 from .Indenter import CustomIndenter
+from .ParserCache import ParserCache
 from .Transformer import Transformer
 from .Tree import Tree
+from ..exceptions import CompilerError, StorySyntaxError
 
 
 class Parser:
@@ -14,10 +23,25 @@ class Parser:
     Wraps up the parser submodule and exposes parsing and lexing
     functionalities.
     """
-    def __init__(self, algo='lalr', ebnf=None):
+    # the number of parsed string templates which are cached
+    templates_size = 512
+    # the number of syntax errors after which parse_errors stops
+    errors_limit = 100
+    # statements continuing the block of the statement before them
+    continuations = ('else', 'catch', 'finally')
+
+    def __init__(self, algo='lalr', ebnf=None, cache=None):
         self.algo = algo
         self.ebnf = ebnf
+        if cache is None:
+            cache = ParserCache()
+        self.cache = cache
         self.lark = self._lark()
+        # fused LALR parsers, by allow_single_quotes
+        self.parsers = {}
+        # parsed string templates, by their code
+        self.templates = OrderedDict()
+        self.keywords = self._keywords()
 
     @staticmethod
     def indenter():
@@ -41,9 +65,82 @@ class Parser:
 
     def _lark(self):
         """
-        Get the grammar and initialize Lark.
+        Get the grammar and initialize Lark, reusing the parser tables from
+        the cache whenever possible.
+        """
+        grammar = self.grammar()
+        return self.cache.get(grammar, self.algo,
+                              lambda: self._build_lark(grammar))
+
+    def _keywords(self):
+        """
+        Returns the keywords of the grammar, which the contextual lexer reads
+        as names where the keyword isn't allowed.
+        """
+        return frozenset(
+            t.pattern.value for t in self.lark.lexer_conf.tokens
+            if isinstance(t.pattern, PatternStr) and
+            t.pattern.value.isidentifier()
+        )
+
+    def _build_lark(self, grammar):
+        """
+        Initialize Lark, building the parser tables.
+        """
+        return Lark(grammar, parser=self.algo, postlex=self.indenter())
+
+    def copy(self):
+        """
+        Returns a parser with its own parsing state (indenter, lexer state and
+        transformers), but sharing the parse tables and lexers with this one.
+        A parser can't be used by multiple threads at once, but its copies
+        can be used concurrently.
+        """
+        parser = copy.copy(self)
+        lark = copy.copy(self.lark)
+        lark.options = copy.copy(lark.options)
+        lark.options.postlex = self.indenter()
+        lark.lexer_conf = copy.copy(lark.lexer_conf)
+        lark.lexer_conf.postlex = lark.options.postlex
+        lark.parser = copy.copy(lark.parser)
+        lark.parser.lexer_conf = lark.lexer_conf
+        lark.parser.lexer = copy.copy(lark.parser.lexer)
+        parser.lark = lark
+        parser.parsers = {}
+        parser.templates = OrderedDict()
+        return parser
+
+    @classmethod
+    def transform_callback(cls, callback, transformer):
+        """
+        Rebuilds a tree building callback of lark, s.t. it calls the
+        transformer instead of creating a lark tree.
+        """
+        if isinstance(callback, partial):
+            # the innermost callback: partial(tree_class, rule_name)
+            return partial(transformer.reduce, callback.args[0])
+        callback = copy.copy(callback)
+        callback.node_builder = cls.transform_callback(callback.node_builder,
+                                                       transformer)
+        return callback
+
+    def fused_parser(self, allow_single_quotes):
+        """
+        Returns a LALR parser which applies the transformer while reducing,
+        reusing the parse tables of lark, and its transformer.
         """
-        return Lark(self.grammar(), parser=self.algo, postlex=self.indenter())
+        parser = self.parsers.get(allow_single_quotes)
+        if parser is None:
+            lalr = self.lark.parser.parser.parser
+            transformer = self.transformer(allow_single_quotes)
+            callbacks = {
+                rule: self.transform_callback(callback, transformer)
+                for rule, callback in lalr.callbacks.items()
+            }
+            parser = (LalrParser(self.lark.parser.parser._parse_table,
+                                 callbacks), transformer)
+            self.parsers[allow_single_quotes] = parser
+        return parser
 
     def parse(self, source, allow_single_quotes):
         """
@@ -53,11 +150,203 @@ class Parser:
             return Tree('empty', [])
         source = '{}\n'.format(source)
         lark = self.lark
-        tree = lark.parse(source)
-        result = self.transformer(allow_single_quotes).transform(tree)
+        if self.algo == 'lalr':
+            frontend = lark.parser
+            parser, transformer = self.fused_parser(allow_single_quotes)
+            transformer.error = None
+            result = parser.parse(frontend.lex(source),
+                                  frontend.lexer.set_parser_state)
+            if transformer.error is not None:
+                raise transformer.error
+        else:
+            tree = lark.parse(source)
+            transformer = self.transformer(allow_single_quotes)
+            result = transformer.transform(tree)
         result.parser = self
         return result
 
+    @staticmethod
+    def error_line(error):
+        """
+        Returns the line of a syntax error, or None if it's not known.
+        """
+        line = getattr(error, 'line', None)
+        if line is None or line == 'None':
+            return None
+        return int(str(line).split('.')[0])
+
+    @staticmethod
+    def indentation(line):
+        return len(line) - len(line.lstrip())
+
+    @classmethod
+    def skip_statement(cls, lines, line):
+        """
+        Blanks the statement at `line` with its block and the blocks
+        continuing it, keeping the lines of the other statements. Returns the
+        last blanked line. Lines start with 1.
+        """
+        indent = cls.indentation(lines[line - 1])
+        end = line
+        while end < len(lines):
+            following = lines[end]
+            stripped = following.lstrip()
+            if stripped and cls.indentation(following) <= indent:
+                if cls.indentation(following) < indent or \
+                        stripped.split(' ', 1)[0] not in cls.continuations:
+                    break
+            end += 1
+        for i in range(line - 1, end):
+            lines[i] = ''
+        return end
+
+    @classmethod
+    def parent_statement(cls, lines, line):
+        """
+        Returns the line of the statement whose block contains `line`, or
+        None at the top level.
+        """
+        indent = cls.indentation(lines[line - 1])
+        for parent in range(line - 1, 0, -1):
+            source = lines[parent - 1]
+            if source.strip() and cls.indentation(source) < indent:
+                return parent
+        return None
+
+    @classmethod
+    def statement(cls, lines, line):
+        """
+        Returns the line of the statement at `line`, which is the first
+        statement of the chain if it continues another statement.
+        """
+        indent = cls.indentation(lines[line - 1])
+        while lines[line - 1].split(None, 1)[0] in cls.continuations:
+            previous = line - 1
+            while previous > 0 and (not lines[previous - 1].strip() or
+                                    cls.indentation(lines[previous - 1]) >
+                                    indent):
+                previous -= 1
+            if previous == 0:
+                break
+            line = previous
+        return line
+
+    @classmethod
+    def has_block(cls, lines, line):
+        """
+        Checks whether the statement at `line` still has a nested block.
+        """
+        indent = cls.indentation(lines[line - 1])
+        for following in lines[line:]:
+            if following.strip():
+                return cls.indentation(following) > indent
+        return False
+
+    def parse_errors(self, source, allow_single_quotes, error=None):
+        """
+        Finds the syntax errors of the source string. After an error, the
+        statement containing it is skipped and the source is parsed again,
+        s.t. the later statements are checked too. Errors caused by skipping
+        a statement are dropped by skipping the statement containing it.
+        `error` is the error of parsing the source, if it's known.
+        """
+        original = source.split('\n')
+        lines = list(original)
+        errors = []
+        # the first and the last line of the statement skipped last
+        start, end = 0, 0
+        while len(errors) < self.errors_limit:
+            if error is None:
+                try:
+                    self.parse('\n'.join(lines), allow_single_quotes)
+                    break
+                except (CompilerError, StorySyntaxError,
+                        UnexpectedInput) as e:
+                    error = e
+            line = self.error_line(error)
+            if line is None or line > len(lines):
+                if not errors:
+                    errors.append(error)
+                break
+            if line > end:
+                errors.append(error)
+                start = line
+            else:
+                start = self.parent_statement(original, start)
+                if start is None:
+                    break
+            while True:
+                start = self.statement(original, start)
+                end = self.skip_statement(lines, start)
+                # a block can't be empty
+                parent = self.parent_statement(original, start)
+                if parent is None or self.has_block(lines, parent):
+                    break
+                start = parent
+            error = None
+        return errors
+
+    @classmethod
+    def move_tree(cls, tree, column):
+        """
+        Copies a tree, moving all its tokens by `column` columns.
+        """
+        children = []
+        for child in tree.children:
+            if isinstance(child, Tree):
+                children.append(cls.move_tree(child, column))
+                continue
+            token = Token(child.type, str(child), child.pos_in_stream + column,
+                          child.line, child.column + column)
+            token.value = child.value
+            token.end_line = child.end_line
+            if child.end_column is not None:
+                token.end_column = child.end_column + column
+            children.append(token)
+        moved = Tree(tree.data, children)
+        for name, value in tree.__dict__.items():
+            # e.g. the kind of expressions
+            if name not in moved.__dict__ and not name.startswith('_'):
+                moved.__dict__[name] = value
+        return moved
+
+    def parse_template(self, source, column):
+        """
+        Parses the code of a string template, which starts at `column`, to
+        an expression or service. Templates are cached by their code, and
+        `False` is cached for the ones which can't be parsed separately.
+        Returns `None` if templates can't be parsed separately.
+        """
+        if self.algo != 'lalr':
+            return None
+        tree = self.templates.get(source)
+        if tree is None:
+            frontend = self.lark.parser
+            parser, transformer = self.fused_parser(allow_single_quotes=True)
+            transformer.error = None
+            start = Token('_TEMPLATE_START', '')
+            lexed = []
+            tokens = itertools.chain([start], frontend.lex(f'{source}\n'))
+            tokens = (lexed.append(t) or t for t in tokens)
+            result = parser.parse(tokens, frontend.lexer.set_parser_state)
+            if transformer.error is not None:
+                raise transformer.error
+            if any(t.type == 'NAME' and t.value in self.keywords
+                   for t in lexed):
+                # keywords are never names, e.g. "{break}" isn't a path
+                tree = False
+            else:
+                tree = result.template.child(0)
+            self.templates[source] = tree
+            if len(self.templates) > self.templates_size:
+                self.templates.popitem(last=False)
+        else:
+            self.templates.move_to_end(source)
+        if tree is False:
+            return None
+        # the column of the first character is 1
+        return self.move_tree(tree, column - 1)
+
     def lex(self, source):
         """
         Lexes the source string
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import os
+import pickle
+import threading
+import time
+
+import lark
+from lark.parsers.lalr_analysis import Reduce, Shift
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Lark compares LALR actions by identity, so the module-level `Shift` and
+    `Reduce` markers must not be copied.
+    """
+    actions = {'Shift': Shift, 'Reduce': Reduce}
+
+    def persistent_id(self, obj):
+        if obj is Shift or obj is Reduce:
+            return obj.name
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def persistent_load(self, pid):
+        return _Pickler.actions[pid]
+
+
+class ParserCache:
+    """
+    Stores built Lark parsers (LALR tables and lexers) on disk, so that new
+    processes don't need to rebuild them from the grammar.
+    """
+
+    # bump whenever the format of the cached parsers changes
+    version = 1
+    # entries which haven't been used for this long are removed, in seconds
+    max_age = 30 * 24 * 60 * 60
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = self.default_directory()
+        self.directory = directory
+
+    @staticmethod
+    def default_directory():
+        """
+        Returns the directory used for caching, which can be overwritten
+        with STORYSCRIPT_CACHE_DIR.
+        """
+        directory = os.getenv('STORYSCRIPT_CACHE_DIR')
+        if directory:
+            return directory
+        base = os.getenv('XDG_CACHE_HOME')
+        if not base:
+            base = os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'storyscript')
+
+    @classmethod
+    def key(cls, grammar, algo):
+        """
+        Computes the cache key of a grammar.
+        """
+        text = f'{cls.version}\n{lark.__version__}\n{algo}\n{grammar}'
+        return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+    @staticmethod
+    def dumps(parser):
+        """
+        Serializes a parser.
+        """
+        f = io.BytesIO()
+        _Pickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(parser)
+        return f.getvalue()
+
+    @staticmethod
+    def loads(data):
+        """
+        Deserializes a parser.
+        """
+        return _Unpickler(io.BytesIO(data)).load()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'parser-{key}.pickle')
+
+    def load(self, key):
+        """
+        Loads a cached parser or returns `None` if the cache is missing or
+        unusable.
+        """
+        try:
+            with io.open(self.path(key), 'rb') as f:
+                parser = self.loads(f.read())
+        except Exception:
+            return None
+        self.used(self.path(key))
+        return parser
+
+    @staticmethod
+    def used(path):
+        """
+        Marks an entry of a cache as used, s.t. it isn't pruned.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def prune(directory, suffixes, max_age, max_entries=None):
+        """
+        Removes the entries of a cache which haven't been used for `max_age`
+        seconds and the least recently used entries beyond `max_entries`.
+        The keys change with every grammar or compiler, thus the entries of
+        old ones would stay forever otherwise.
+        """
+        try:
+            entries = [(entry.stat().st_mtime, entry.path)
+                       for entry in os.scandir(directory)
+                       if entry.name.endswith(suffixes)]
+        except OSError:
+            return
+        entries.sort(reverse=True)
+        expired = time.time() - max_age
+        for i, (mtime, path) in enumerate(entries):
+            if mtime < expired or \
+                    (max_entries is not None and i >= max_entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def write(path, dump):
+        """
+        Writes the bytes returned by `dump` to a file of a cache. The caches
+        are only an optimization, thus failures are ignored.
+        """
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with io.open(tmp_path, 'wb') as f:
+                f.write(dump())
+            # atomic, s.t. concurrent processes never see partial files
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save(self, key, parser):
+        """
+        Saves a parser to the cache and prunes the old parsers.
+        """
+        self.write(self.path(key), lambda: self.dumps(parser))
+        self.prune(self.directory, ('.pickle', '.tmp'), self.max_age)
+
+    def get(self, grammar, algo, build):
+        """
+        Returns the cached parser for a grammar or builds and caches it.
+        """
+        key = self.key(grammar, algo)
+        parser = self.load(key)
+        if parser is None:
+            parser = build()
+            self.save(key, parser)
+        return parser
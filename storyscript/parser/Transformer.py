@@ -27,6 +27,20 @@ class Transformer(LarkTransformer):
 
     def __init__(self, allow_single_quotes=False):
         self.allow_single_quotes = allow_single_quotes
+        self.error = None
+
+    def reduce(self, rule, matches):
+        """
+        Transforms a rule while it's being parsed. Errors are deferred until
+        the parsing finished, as syntax errors of the parser take precedence.
+        Afterwards plain trees are built.
+        """
+        if self.error is None:
+            try:
+                return getattr(self, rule)(matches)
+            except Exception as e:
+                self.error = e
+        return Tree(rule, matches)
 
     @classmethod
     def is_keyword(cls, token):
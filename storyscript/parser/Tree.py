@@ -18,17 +18,27 @@ class Tree(LarkTree):
                 if item.data == path:
                     return item
 
+    def lookup(self, name):
+        """
+        Finds the first direct subtree with the given name
+        """
+        for child in self.children:
+            if isinstance(child, Tree) and child.data == name:
+                return child
+        return None
+
     def node(self, path):
         """
         Finds a subtree or a nested subtree, using path
         """
-        shards = path.split('.')
+        if '.' not in path:
+            return self.lookup(path)
         current = None
-        for shard in shards:
+        for shard in path.split('.'):
             if current is None:
-                current = self.walk(self, shard)
+                current = self.lookup(shard)
             else:
-                current = self.walk(current, shard)
+                current = current.lookup(shard)
         return current
 
     def first_child(self):
@@ -213,4 +223,7 @@ class Tree(LarkTree):
         return tree
 
     def __getattr__(self, attribute):
+        if attribute.startswith('_'):
+            # private and special attributes are never subtrees
+            raise AttributeError(attribute)
         return self.node(attribute)
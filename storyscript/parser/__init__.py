@@ -2,9 +2,10 @@ from .Ebnf import Ebnf
 from .Grammar import Grammar
 from .Indenter import CustomIndenter
 from .Parser import Parser
+from .ParserCache import ParserCache
 from .Transformer import Transformer
 from .Tree import Tree
 
 
-__all__ = ['CustomIndenter', 'Ebnf', 'Grammar', 'Parser', 'Transformer',
-           'Tree']
+__all__ = ['CustomIndenter', 'Ebnf', 'Grammar', 'Parser', 'ParserCache',
+           'Transformer', 'Tree']
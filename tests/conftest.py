@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from pytest import fixture
+
+
+@fixture(scope='session')
+def cache_root(tmp_path_factory):
+    """
+    A cache directory shared by all tests, s.t. the parser is built once
+    """
+    return tmp_path_factory.mktemp('cache')
+
+
+@fixture(autouse=True)
+def cache_dir(monkeypatch, cache_root):
+    """
+    Keeps the parser and compile caches of tests out of the user's cache
+    """
+    monkeypatch.setenv('STORYSCRIPT_CACHE_DIR', str(cache_root))
+    return cache_root
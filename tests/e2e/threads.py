@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+from os import path
+
+from click import unstyle
+
+from pytest import fixture
+
+from storyscript.Api import Api
+
+from utils import parse_features
+
+test_dir = path.dirname(path.realpath(__file__))
+features = {'globals': True}
+
+
+def output(result):
+    """
+    Serializes a compilation result, s.t. results can be compared bytewise
+    """
+    if result.errors():
+        return unstyle(result.errors()[0].message())
+    return json.dumps(result.result(), sort_keys=True)
+
+
+def compile_story(item):
+    story_path, source, story_features = item
+    return output(Api.loads(source, story_features))
+
+
+def compile_map(item):
+    story_path, source, story_features = item
+    return output(Api.load_map({story_path: source}, story_features))
+
+
+@fixture(scope='module')
+def corpus():
+    stories = []
+    for story_path in sorted(glob(path.join(test_dir, '**', '*.story'),
+                                  recursive=True)):
+        with io.open(story_path, 'r') as f:
+            source = f.read()
+        story_path = path.relpath(story_path, test_dir)
+        stories.append((story_path, source,
+                        parse_features(features, source)))
+    return stories
+
+
+@fixture
+def switch_often():
+    """
+    Lets threads switch very often to provoke races
+    """
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_threaded(fn, corpus, threads=16, repeat=2):
+    expected = [fn(item) for item in corpus]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(fn, corpus * repeat))
+    assert results == expected * repeat
+
+
+def test_threads_loads(corpus, switch_often):
+    """
+    Ensures stories compiled by many threads at once match the serial output
+    """
+    run_threaded(compile_story, corpus)
+
+
+def test_threads_load_map(corpus, switch_often):
+    run_threaded(compile_map, corpus)
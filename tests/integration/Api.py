@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from unittest.mock import patch
 
 from pytest import raises
@@ -19,6 +21,35 @@ def test_api_load_map_compiling_try_block():
     assert e.value.short_message() == 'E0007: Missing value after `=`'
 
 
+def test_api_load_map_all_errors():
+    """
+    Ensures the errors of all stories are returned with all_errors
+    """
+    files = {'a.story': 'a = (\nb = 1\nc = +', 'b.story': 'x = 1',
+             'c.story': 'return 1'}
+    result = Api.load_map(files, all_errors=True)
+    assert result.result() is None
+    errors = [(e.path, e.int_line(), e.short_message()[:5])
+              for e in result.errors()]
+    assert errors == [('a.story', 1, 'E0007'), ('a.story', 3, 'E0041'),
+                      ('c.story', 1, 'E0004')]
+
+
+def test_api_load_map_profile():
+    """
+    Ensures the phases of every story are profiled
+    """
+    files = {'a.story': 'a = 1', 'b.story': 'b = 2'}
+    result = Api.load_map(files, profile=True)
+    profile = result.profile()
+    assert list(profile['stories']) == ['a.story', 'b.story']
+    phases = list(profile['total'])
+    for name in ('parse', 'lowering', 'semantics',
+                 'semantics/TypeResolver', 'json'):
+        assert name in phases
+    assert phases.index('lowering') < phases.index('semantics')
+
+
 def test_api_load_map_compiling_try_block_loads():
     """
     Ensures Api.load functions return errors
@@ -100,3 +131,29 @@ def test_compiler_only_comments():
     result = api_result['stories']['a.story']
     assert result['tree'] == {}
     assert result['entrypoint'] is None
+
+
+def test_api_aload_map_executors():
+    """
+    Ensures stories compiled concurrently by threads or processes have the
+    same result as with Api.load_map
+    """
+    files = {'a.story': 'a = 1', 'b.story': 'b = [1, 2]\nc = b[0]'}
+    expected = Api.load_map(files).result()
+
+    async def aload_map(executor):
+        semaphore = asyncio.Semaphore(2)
+        return await Api.aload_map(files, executor=executor,
+                                   semaphore=semaphore)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert asyncio.run(aload_map(executor)).result() == expected
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert asyncio.run(aload_map(executor)).result() == expected
+
+
+def test_api_aloads_process_error():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        s = asyncio.run(Api.aloads('foo =', executor=executor))
+    e = s.errors()[0]
+    assert e.short_message() == 'E0007: Missing value after `=`'
@@ -21,7 +21,7 @@ def test_cli_exit_code(mocker):
     runner = CliRunner()
     m = mock.mock_open(read_data='foo =')
     mocker.patch.object(io, 'open', m)
-    e = runner.invoke(Cli.compile, ['/compile/path'])
+    e = runner.invoke(Cli.compile, ['/compile/path', '--no-cache'])
 
     assert e.exit_code == 1
     assert e.output == \
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from pytest import fixture
+
+from storyscript.Client import Client
+from storyscript.Server import Server, _Handler
+
+
+@fixture
+def server(tmpdir):
+    server = Server(path=str(tmpdir.join('s.sock')))
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+
+
+def test_server_requests(server, tmpdir):
+    """
+    Ensures a client can send several requests over one connection
+    """
+    tmpdir.join('one.story').write('a = 1\n')
+    client = Client(path=server.server_address)
+    assert client.connect()
+    response = client.request('loads', source='a = 1')
+    assert response['result']['tree']['1']['args'][0]['int'] == 1
+    response = client.request('compile', cwd=str(tmpdir), path='one.story',
+                              cache=False)
+    assert '"entrypoint": [\n    "one.story"\n  ]' in response['result']
+    response = client.request('loads', source='a = (')
+    assert response['id'] == 3
+    assert response['result'] is None
+    client.close()
+
+
+def test_server_idle_client(monkeypatch, server):
+    """
+    Ensures an idle client doesn't block the other clients and reconnects
+    when it sends its next request
+    """
+    monkeypatch.setattr(_Handler, 'timeout', 0.1)
+    idle = Client(path=server.server_address)
+    assert idle.connect()
+    idle.request('loads', source='a = 1')
+    client = Client(path=server.server_address)
+    assert client.connect()
+    assert client.request('loads', source='a = 1')['errors'] == []
+    client.close()
+    assert idle.request('loads', source='a = 1')['errors'] == []
+    idle.close()
@@ -89,7 +89,7 @@ def test_compiler_expression_whitespace(source_pair):
     if source.startswith('b'):
         full_source = 'b=0\nc=0\n' + full_source
         index = '3'
-    result = Api.loads(full_source).result()
+    result = Api.loads(full_source, features={'fold': False}).result()
     assert result['tree'][index]['method'] == 'expression'
     assert result['tree'][index]['name'] == ['a']
     assert len(result['tree'][index]['args']) == 1
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from pytest import mark
+
+from storyscript.Api import Api
+
+
+def compile_args(source, fold=True):
+    """
+    Compiles a story and returns the arguments of its last line
+    """
+    result = Api.loads(source, features={'fold': fold}).result()
+    tree = result['tree']
+    return tree[list(tree)[-1]]['args']
+
+
+@mark.parametrize('source,expected', [
+    ('a = 60 * 60 * 24', {'$OBJECT': 'int', 'int': 86400}),
+    ('a = 1 + 2.5', {'$OBJECT': 'float', 'float': 3.5}),
+    ('a = 2.0 / 4.0', {'$OBJECT': 'float', 'float': 0.5}),
+    ('a = 5 % 3', {'$OBJECT': 'int', 'int': 2}),
+    ('a = 2 ^ 3', {'$OBJECT': 'int', 'int': 8}),
+    ('a = 1 < 2', {'$OBJECT': 'boolean', 'boolean': True}),
+    ('a = 1 == 2', {'$OBJECT': 'boolean', 'boolean': False}),
+    ('a = true and false', {'$OBJECT': 'boolean', 'boolean': False}),
+    ('a = "x" + 1', {'$OBJECT': 'string', 'string': 'x1'}),
+    ('a = 1m + 1s', {'$OBJECT': 'time', 'ms': 61000}),
+    ('a = "x{60 * 60}y"', {'$OBJECT': 'string', 'string': 'x3600y'}),
+])
+def test_folding(source, expected):
+    assert compile_args(source) == [expected]
+
+
+@mark.parametrize('source', [
+    'a = 1 / 0',
+    'a = 2.0 / 0.0',
+    'a = -5 % 3',
+    'a = 9223372036854775807 + 1',
+    'a = 2 ^ 64',
+    'a = 1s - 1m',
+])
+def test_folding_left_to_runtime(source):
+    assert compile_args(source) == compile_args(source, fold=False)
+
+
+def test_folding_string_template():
+    """
+    Ensures that the constant parts of string templates are merged
+    """
+    args = compile_args('b = 3\na = "x{1 + 1}y{b}"')
+    assert args[0]['expression'] == 'sum'
+    assert args[0]['values'][0] == {'$OBJECT': 'string', 'string': 'x2y'}
+    assert args[0]['values'][1]['$OBJECT'] == 'type_cast'
+
+
+def test_folding_disabled():
+    args = compile_args('a = 60 * 60', fold=False)
+    assert args[0]['$OBJECT'] == 'expression'
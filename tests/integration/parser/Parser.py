@@ -266,3 +266,19 @@ def test_parser_string_double_quoted():
     ar_exp = arith_exp(result)
     lhs = get_entity(ar_exp).values.string.child(0)
     assert lhs == r'"b\n.\\.\".c"'
+
+
+@mark.parametrize('source, lines', [
+    ('a = 1\n', []),
+    ('a = (\nb = 1\nc = +\n', [1, 3]),
+    ('if true\n    a = +\n    b = 1\nelse\n    c = 2 +\nd = (\n', [2, 5, 6]),
+    ('while true\n    a = +\nb = (\n', [2, 3]),
+])
+def test_parser_parse_errors(source, lines):
+    """
+    Ensures all syntax errors are found, without errors caused by skipping
+    statements
+    """
+    parser = _parser()
+    errors = parser.parse_errors(source, allow_single_quotes=False)
+    assert [parser.error_line(error) for error in errors] == lines
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import asyncio
 from unittest.mock import ANY
 
 from pytest import raises
@@ -6,8 +7,9 @@ from pytest import raises
 from storyscript.Api import Api
 from storyscript.Bundle import Bundle
 from storyscript.Features import Features
+from storyscript.Profiler import Profiler
 from storyscript.Story import Story
-from storyscript.exceptions import StoryError
+from storyscript.exceptions import BundleError, StoryError
 
 
 def test_api_loads(patch):
@@ -24,6 +26,19 @@ def test_api_loads(patch):
     assert result == Story.process()
 
 
+def test_api_loads_profile(patch):
+    patch.init(Story)
+    patch.object(Story, 'process')
+    result = Api.loads('string', profile=True)
+    assert result.profile() == {}
+
+
+def test_api_loads_no_profile(patch):
+    patch.init(Story)
+    patch.object(Story, 'process')
+    assert Api.loads('string').profile() is None
+
+
 def test_api_load(patch, magic):
     """
     Ensures Api.load can compile stories from a file stream
@@ -48,12 +63,41 @@ def test_api_load_map(patch, magic):
     patch.object(Bundle, 'bundle')
     files = {'a.story': "import 'b' as b", 'b.story': 'x = 0'}
     result = Api.load_map(files).result()
-    Bundle.__init__.assert_called_with(story_files=files, features=ANY)
+    Bundle.__init__.assert_called_with(story_files=files, features=ANY,
+                                       profiler=None)
     assert isinstance(Bundle.__init__.call_args[1]['features'], Features)
-    Bundle.bundle.assert_called()
+    Bundle.bundle.assert_called_with(jobs=1, all_errors=False)
     assert result == Bundle.bundle()
 
 
+def test_api_load_map_profile(patch):
+    patch.init(Bundle)
+    patch.object(Bundle, 'bundle')
+    result = Api.load_map({'a.story': 'x = 0'}, profile=True)
+    profiler = Bundle.__init__.call_args[1]['profiler']
+    assert isinstance(profiler, Profiler)
+    assert result.profile() == {'stories': {}, 'total': {}}
+
+
+def test_api_load_map_jobs(patch):
+    patch.init(Bundle)
+    patch.object(Bundle, 'bundle')
+    Api.load_map({}, jobs=4)
+    Bundle.bundle.assert_called_with(jobs=4, all_errors=False)
+
+
+def test_api_load_map_all_errors(patch):
+    """
+    Ensures Api.load_map returns the errors of all stories
+    """
+    patch.init(Bundle)
+    patch.object(Bundle, 'bundle', side_effect=BundleError(['one', 'two']))
+    result = Api.load_map({}, all_errors=True)
+    Bundle.bundle.assert_called_with(jobs=1, all_errors=True)
+    assert result.errors() == ['one', 'two']
+    assert result.result() is None
+
+
 def test_api_loads_internal_error(patch):
     """
     Ensures Api.loads handles unknown errors
@@ -158,3 +202,77 @@ def test_api_load_map_internal_error_debug(patch):
         Api.load_map({}, features={'debug': True}).check_success()
 
     assert str(e.value) == 'An unknown error.'
+
+
+def test_api_aloads(patch):
+    """
+    Ensures Api.aloads compiles a story in an executor
+    """
+    async def acompile(self, storypath, executor, semaphore):
+        self.stories[storypath] = {'tree': {}}
+
+    patch.object(Bundle, 'acompile', acompile)
+    result = asyncio.run(Api.aloads('string')).result()
+    assert result == {'tree': {}}
+
+
+def test_api_aloads_executor(patch):
+    patch.object(Bundle, 'acompile', side_effect=StoryError(None, None))
+    s = asyncio.run(Api.aloads('string', executor='executor',
+                               semaphore='semaphore'))
+    Bundle.acompile.assert_called_with('story', executor='executor',
+                                       semaphore='semaphore')
+    assert isinstance(s.errors()[0], StoryError)
+
+
+def test_api_aloads_internal_error(patch):
+    patch.object(Bundle, 'acompile', side_effect=Exception('ICE'))
+    s = asyncio.run(Api.aloads('string'))
+    assert s.errors()[0].message().startswith('E0001: Internal error')
+    with raises(Exception):
+        asyncio.run(Api.aloads('string', features={'debug': True}))
+
+
+def test_api_aloads_cancelled(patch):
+    patch.object(Bundle, 'acompile', side_effect=asyncio.CancelledError())
+    with raises(asyncio.CancelledError):
+        asyncio.run(Api.aloads('string'))
+
+
+def test_api_aload_map(patch):
+    patch.init(Bundle)
+
+    async def abundle(self, executor, semaphore, all_errors):
+        return {'stories': {}}
+
+    patch.object(Bundle, 'abundle', abundle)
+    files = {'a.story': 'x = 0'}
+    result = asyncio.run(Api.aload_map(files)).result()
+    Bundle.__init__.assert_called_with(story_files=files, features=ANY)
+    assert result == {'stories': {}}
+
+
+def test_api_aload_map_error(patch):
+    patch.object(Bundle, 'abundle', side_effect=StoryError(None, None))
+    s = asyncio.run(Api.aload_map({}, executor='executor',
+                                  semaphore='semaphore'))
+    Bundle.abundle.assert_called_with(executor='executor',
+                                      semaphore='semaphore',
+                                      all_errors=False)
+    assert isinstance(s.errors()[0], StoryError)
+
+
+def test_api_aload_map_all_errors(patch):
+    patch.object(Bundle, 'abundle', side_effect=BundleError(['one', 'two']))
+    s = asyncio.run(Api.aload_map({}, all_errors=True))
+    Bundle.abundle.assert_called_with(executor=None, semaphore=None,
+                                      all_errors=True)
+    assert s.errors() == ['one', 'two']
+
+
+def test_api_aload_map_internal_error(patch):
+    patch.object(Bundle, 'abundle', side_effect=Exception('ICE'))
+    s = asyncio.run(Api.aload_map({}))
+    assert s.errors()[0].message().startswith('E0001: Internal error')
+    with raises(Exception):
+        asyncio.run(Api.aload_map({}, features={'debug': True}))
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 import json
+from unittest.mock import ANY
 
 from pytest import fixture, raises
 
 import storyscript.App as AppModule
 from storyscript.App import App
 from storyscript.Bundle import Bundle
+from storyscript.BundleWriter import BundleWriter
+from storyscript.Watcher import Watcher
 from storyscript.exceptions import StoryError
 from storyscript.parser import Grammar
 
@@ -60,8 +63,10 @@ def test_app_compile(patch, bundle):
     patch.object(json, 'dumps')
     result = App.compile('path')
     Bundle.from_path.assert_called_with('path', ignored_path=None,
-                                        features=None)
-    Bundle.from_path().bundle.assert_called_with(ebnf=None)
+                                        features=None, cache=None,
+                                        profiler=None)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=1,
+                                                 all_errors=False)
     json.dumps.assert_called_with(Bundle.from_path().bundle(), indent=2)
     assert result == json.dumps()
 
@@ -71,8 +76,10 @@ def test_app_compile_concise(patch, bundle):
     patch.object(AppModule, '_clean_dict')
     result = App.compile('path', concise=True)
     Bundle.from_path.assert_called_with('path', ignored_path=None,
-                                        features=None)
-    Bundle.from_path().bundle.assert_called_with(ebnf=None)
+                                        features=None, cache=None,
+                                        profiler=None)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=1,
+                                                 all_errors=False)
     AppModule._clean_dict.assert_called_with(Bundle.from_path().bundle())
     json.dumps.assert_called_with(AppModule._clean_dict(), indent=2)
     assert result == json.dumps()
@@ -82,7 +89,8 @@ def test_app_compile_ignored_path(patch, bundle):
     patch.object(json, 'dumps')
     App.compile('path', ignored_path='ignored')
     Bundle.from_path.assert_called_with('path', ignored_path='ignored',
-                                        features=None)
+                                        features=None, cache=None,
+                                        profiler=None)
 
 
 def test_app_compile_ebnf(patch, bundle):
@@ -91,7 +99,59 @@ def test_app_compile_ebnf(patch, bundle):
     """
     patch.object(json, 'dumps')
     App.compile('path', ebnf='ebnf')
-    Bundle.from_path().bundle.assert_called_with(ebnf='ebnf')
+    Bundle.from_path().bundle.assert_called_with(ebnf='ebnf', jobs=1,
+                                                 all_errors=False)
+
+
+def test_app_compile_jobs(patch, bundle):
+    patch.object(json, 'dumps')
+    App.compile('path', jobs=4)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=4,
+                                                 all_errors=False)
+
+
+def test_app_compile_cache(patch, bundle):
+    patch.object(json, 'dumps')
+    App.compile('path', cache='cache')
+    Bundle.from_path.assert_called_with('path', ignored_path=None,
+                                        features=None, cache='cache',
+                                        profiler=None)
+
+
+def test_app_compile_all_errors(patch, bundle):
+    patch.object(json, 'dumps')
+    App.compile('path', all_errors=True)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=1,
+                                                 all_errors=True)
+
+
+def test_app_compile_stream(patch, bundle):
+    patch.init(BundleWriter)
+    result = App.compile('path', concise=True, stream='stream', compact=True)
+    assert result is None
+    BundleWriter.__init__.assert_called_with('stream', compact=True,
+                                             concise=True)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=1,
+                                                 writer=ANY,
+                                                 all_errors=False)
+    writer = Bundle.from_path().bundle.call_args[1]['writer']
+    assert isinstance(writer, BundleWriter)
+
+
+def test_app_compile_stream_first(patch, magic, bundle):
+    """
+    Ensures the first story is written to the stream
+    """
+    Bundle.from_path().bundle.return_value = {'stories': {'my_story': 42}}
+    stream = magic()
+    App.compile('path', first=True, stream=stream)
+    stream.write.assert_called_with('42')
+
+
+def test_app_compile_compact(patch, bundle):
+    Bundle.from_path().bundle.return_value = {'stories': {'a': [1, 2]}}
+    result = App.compile('path', compact=True)
+    assert result == '{"stories":{"a":[1,2]}}'
 
 
 def test_app_compile_first(patch, bundle):
@@ -102,8 +162,10 @@ def test_app_compile_first(patch, bundle):
     patch.object(json, 'dumps')
     result = App.compile('path', first=True)
     Bundle.from_path.assert_called_with('path', ignored_path=None,
-                                        features=None)
-    Bundle.from_path().bundle.assert_called_with(ebnf=None)
+                                        features=None, cache=None,
+                                        profiler=None)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=1,
+                                                 all_errors=False)
     json.dumps.assert_called_with(42, indent=2)
     assert result == json.dumps()
 
@@ -122,8 +184,62 @@ def test_app_compile_first_error(patch, bundle):
         'E0055: The option `--first`/-`f` can only be used ' \
         'if one story is complied.'
     Bundle.from_path.assert_called_with('path', ignored_path=None,
-                                        features=None)
-    Bundle.from_path().bundle.assert_called_with(ebnf=None)
+                                        features=None, cache=None,
+                                        profiler=None)
+    Bundle.from_path().bundle.assert_called_with(ebnf=None, jobs=1,
+                                                 all_errors=False)
+
+
+@fixture
+def watcher(patch):
+    """
+    Lets the watcher report one valid and one invalid story
+    """
+    def watch(self):
+        self.sources.update({'one.story': 'a = 1', 'two.story': 'a = ('})
+        yield ['one.story', 'two.story']
+
+    patch.object(Watcher, 'watch', watch)
+
+
+def test_app_parse_watch(watcher):
+    results = list(App.parse_watch('/path'))
+    assert results[0][0] == 'one.story'
+    assert results[0][1].data == 'start'
+    assert results[1][0] == 'two.story'
+    assert isinstance(results[1][1], StoryError)
+
+
+def test_app_compile_watch(watcher):
+    results = list(App.compile_watch('/path'))
+    assert results[0][0] == 'one.story'
+    tree = json.loads(results[0][1])['one.story']['tree']
+    assert tree['1']['args'][0]['$OBJECT'] == 'int'
+    assert results[1][0] == 'two.story'
+    assert isinstance(results[1][1], StoryError)
+
+
+def test_app_compile_watch_concise(patch, watcher):
+    patch.object(AppModule, '_clean_dict', return_value={})
+    results = list(App.compile_watch('/path', concise=True))
+    assert results[0] == ('one.story', json.dumps({'one.story': {}},
+                                                  indent=2))
+
+
+def test_app_compile_watch_first_compact(watcher):
+    results = list(App.compile_watch('/path', first=True, compact=True))
+    result = json.loads(results[0][1])
+    assert result['tree']['1']['args'][0]['$OBJECT'] == 'int'
+    assert results[0][1] == json.dumps(result, separators=(',', ':'))
+
+
+def test_app_compile_watch_removed(patch, watcher):
+    """
+    Ensures removed stories are forgotten before compiling the changes
+    """
+    patch.object(Bundle, 'unload_removed')
+    list(App.compile_watch('/path'))
+    assert Bundle.unload_removed.call_count == 1
 
 
 def test_app_lex(bundle):
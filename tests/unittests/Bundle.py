@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from unittest.mock import ANY
 
-from pytest import fixture
+from pytest import fixture, raises
 
-from storyscript.Bundle import Bundle
+from storyscript import Bundle as BundleModule
+from storyscript.Bundle import Bundle, _compile_worker, _init_worker
+from storyscript.CompileCache import CompileCache
 from storyscript.Features import Features
+from storyscript.GitIgnore import GitIgnore
+from storyscript.Profiler import Profiler
 from storyscript.Story import Story
-from storyscript.parser import Parser
+from storyscript.exceptions import BundleError, StoryError
+from storyscript.parser import Grammar, Parser
 
 
 @fixture
@@ -16,9 +23,17 @@ def bundle(patch):
     return Bundle()
 
 
+@fixture
+def cache(tmpdir):
+    return CompileCache(directory=str(tmpdir))
+
+
 def test_bundle_init(bundle):
     assert bundle.stories == {}
     assert bundle.story_files == {}
+    assert bundle.loaded == {}
+    assert bundle.cache is None
+    assert bundle.profiler is None
 
 
 def test_bundle_init_files():
@@ -53,62 +68,85 @@ def test_bundle_gitignores_failed(patch):
     assert result == []
 
 
-def test_bundle_ignores(patch):
-    patch.object(os.path, 'isdir')
-    patch.object(os, 'walk', return_value=[('root', [], ['one.story', 'two'])])
-    result = Bundle.ignores('path')
-    os.walk.assert_called_with('path')
-    assert result == ['root/one.story']
-
-
-def test_bundle_ignores_not_dir(patch):
-    patch.many(os.path, ['relpath', 'isdir'])
-    os.path.isdir.return_value = False
-    result = Bundle.ignores('path')
-    os.path.relpath.assert_called_with('path')
-    assert result == [os.path.relpath()]
-
-
-def test_bundle_filter_path(patch):
-    patch.object(os.path, 'relpath')
-    result = Bundle.filter_path('./root', 'one.story', [])
-    os.path.relpath.assert_called_with('./root/one.story')
-    assert result == os.path.relpath()
-
-
-def test_bundle_filter_path_ignores():
-    result = Bundle.filter_path('./root', 'one.story', ['root/one.story'])
-    assert result is None
-
-
 def test_bundle_parse_directory(patch, bundle):
     """
     Ensures parse_directory can parse a directory
     """
     patch.object(os, 'walk', return_value=[('root', [], ['one.story', 'two'])])
-    patch.object(Bundle, 'gitignores')
+    patch.object(Bundle, 'ignored')
+    Bundle.ignored().ignored.return_value = False
     result = Bundle.parse_directory('dir')
-    assert Bundle.gitignores.call_count == 1
+    Bundle.ignored.assert_called_with(None)
     os.walk.assert_called_with('dir')
+    Bundle.ignored().ignored.assert_called_with(os.path.abspath('root'),
+                                                'one.story')
     assert result == ['root/one.story']
 
 
-def test_bundle_parse_directory_gitignored(patch, bundle):
+def test_bundle_parse_directory_ignored(patch, bundle):
     """
-    Ensures parse_directory does not return gitignored files
+    Ensures parse_directory does not return ignored files
     """
     patch.object(os, 'walk', return_value=[('./root', [], ['one.story'])])
-    patch.object(Bundle, 'gitignores')
-    Bundle.gitignores.return_value = ['root/one.story']
-    assert Bundle.parse_directory('dir') == []
+    patch.object(Bundle, 'ignored')
+    Bundle.ignored().ignored.return_value = True
+    assert Bundle.parse_directory('dir', ignored_path='ignored') == []
+    Bundle.ignored.assert_called_with('ignored')
 
 
-def test_bundle_parse_directory_ignored_path(patch, bundle):
-    patch.object(os, 'walk', return_value=[('./root', [], ['one.story'])])
-    patch.many(Bundle, ['gitignores', 'ignores'])
-    Bundle.gitignores.return_value = []
-    Bundle.parse_directory('dir', ignored_path='ignored')
-    Bundle.ignores.assert_called_with('ignored')
+def test_bundle_parse_directory_subdirs(patch):
+    """
+    Ensures parse_directory doesn't enter ignored directories
+    """
+    subdirs = ['one', 'two']
+    patch.object(os, 'walk', return_value=[('root', subdirs, [])])
+    ignores = GitIgnore()
+    patch.object(ignores, 'ignored', side_effect=[True, False])
+    Bundle.parse_directory('dir', ignores=ignores)
+    root = os.path.abspath('root')
+    ignores.ignored.assert_called_with(root, 'two', True)
+    assert subdirs == ['two']
+
+
+def test_bundle_parse_directory_ignores(patch):
+    """
+    Ensures ignored stories aren't looked up again when they're given
+    """
+    patch.object(os, 'walk', return_value=[('root', [], ['one.story'])])
+    patch.object(Bundle, 'ignored')
+    ignores = GitIgnore()
+    ignores.ignore('root/one.story')
+    assert Bundle.parse_directory('dir', ignores=ignores) == []
+    assert Bundle.ignored.call_count == 0
+
+
+def test_bundle_ignored(patch):
+    patch.object(os, 'getenv', return_value=None)
+    patch.object(GitIgnore, 'from_directory')
+    result = Bundle.ignored()
+    os.getenv.assert_called_with('STORYSCRIPT_GIT_IGNORES')
+    GitIgnore.from_directory.assert_called_with(os.getcwd())
+    assert GitIgnore.from_directory().ignore.call_count == 0
+    assert result == GitIgnore.from_directory()
+
+
+def test_bundle_ignored_path(patch):
+    patch.object(os, 'getenv', return_value=None)
+    patch.object(GitIgnore, 'from_directory')
+    Bundle.ignored('ignored')
+    GitIgnore.from_directory().ignore.assert_called_with('ignored')
+
+
+def test_bundle_ignored_git(patch):
+    """
+    Ensures the ignored files can be asked from git
+    """
+    patch.object(os, 'getenv', return_value='1')
+    patch.object(Bundle, 'gitignores', return_value=['one.story'])
+    patch.object(GitIgnore, 'from_files')
+    result = Bundle.ignored()
+    GitIgnore.from_files.assert_called_with(['one.story'])
+    assert result == GitIgnore.from_files.return_value
 
 
 def test_bundle_from_path(patch):
@@ -172,6 +210,30 @@ def test_bundle_load_story_not_read(patch, bundle):
     assert bundle.story_files['one.story'] == Story.read()
 
 
+def test_bundle_load_story_loaded(bundle):
+    """
+    Ensures Bundle.load_story returns the same story until its source changes
+    """
+    bundle.story_files['one.story'] = 'a = 1'
+    story = bundle.load_story('one.story')
+    assert bundle.loaded == {'one.story': story}
+    assert bundle.load_story('one.story') is story
+    bundle.story_files['one.story'] = 'a = 2'
+    assert bundle.load_story('one.story').story == 'a = 2'
+    assert bundle.loaded['one.story'] is not story
+
+
+def test_bundle_unload_removed(bundle):
+    """
+    Ensures Bundle.unload_removed forgets the stories which are no longer
+    in story_files
+    """
+    bundle.story_files = {'one.story': 'hello'}
+    bundle.loaded = {'one.story': 'tree', 'two.story': 'tree'}
+    bundle.unload_removed()
+    assert bundle.loaded == {'one.story': 'tree'}
+
+
 def test_bundle_find_stories(patch, bundle):
     """
     Ensures Bundle.find_stories returns the list of loaded stories
@@ -205,13 +267,98 @@ def test_bundle_compile(mocker, patch, bundle):
     compile = bundle.compile
     patch.many(Bundle, ['compile', 'load_story'])
     patch.many(Story, ['parse'])
+    story = Bundle.load_story.return_value
+    compiled = story.compiled
 
     compile(['one.story'], parser=None)
     Bundle.load_story.assert_called_with('one.story')
 
-    story = Bundle.load_story()
     story.compile.assert_called()
-    assert bundle.stories['one.story'] == story.compiled
+    assert bundle.stories['one.story'] == compiled
+    assert story.tree is None
+    assert story.compiled is None
+    assert story.profile is None
+
+
+def test_bundle_compile_profiler(patch, bundle):
+    patch.many(Bundle, ['load_story', 'add_story'])
+    bundle.profiler = Profiler()
+    bundle.compile(['one.story'], parser=None)
+    story = Bundle.load_story.return_value
+    assert story.profile is bundle.profiler.profiles['one.story']
+
+
+def test_bundle_compile_all_errors(patch, bundle):
+    patch.many(Bundle, ['load_story', 'try_compile', 'add_story'])
+    Bundle.try_compile.side_effect = [False, True]
+    compiled = Bundle.load_story.return_value.compiled
+    bundle.errors = {}
+    bundle.compile(['one.story', 'two.story'], parser='parser')
+    Bundle.try_compile.assert_called_with('two.story', Bundle.load_story(),
+                                          'parser')
+    Bundle.add_story.assert_called_once_with('two.story', compiled)
+
+
+def test_bundle_try_compile(magic, bundle):
+    story = magic()
+    bundle.errors = {}
+    assert bundle.try_compile('one.story', story, 'parser') is True
+    story.parse.assert_called_with(parser='parser')
+    assert story.compile.call_count == 1
+    assert bundle.errors == {}
+
+
+def test_bundle_try_compile_syntax_errors(magic, bundle):
+    """
+    Ensures all syntax errors of a story are collected
+    """
+    story = magic()
+    error = StoryError('error', None)
+    story.parse.side_effect = error
+    errors = [StoryError('one', None), StoryError('two', None)]
+    story.syntax_errors.return_value = errors
+    bundle.errors = {}
+    assert bundle.try_compile('one.story', story, 'parser') is False
+    story.syntax_errors.assert_called_with('parser', error='error')
+    assert story.compile.call_count == 0
+    assert bundle.errors == {'one.story': errors}
+    assert errors[0].path == 'one.story'
+
+
+def test_bundle_try_compile_error(magic, bundle):
+    story = magic()
+    error = StoryError('error', None)
+    story.compile.side_effect = error
+    bundle.errors = {}
+    assert bundle.try_compile('one.story', story, 'parser') is False
+    assert bundle.errors == {'one.story': [error]}
+    assert error.path == 'one.story'
+
+
+def test_bundle_raise_errors(bundle):
+    bundle.errors = {'two.story': ['two'], 'one.story': ['one', 'three']}
+    with raises(BundleError) as e:
+        bundle.raise_errors(['one.story', 'two.story', 'four.story'])
+    assert e.value.errors == ['one', 'three', 'two']
+
+
+def test_bundle_raise_errors_none(bundle):
+    bundle.raise_errors(['one.story'])
+    bundle.errors = {}
+    bundle.raise_errors(['one.story'])
+
+
+def test_bundle_bundle_all_errors(patch, bundle):
+    """
+    Ensures all errors are collected and raised with all_errors
+    """
+    patch.object(Bundle, 'find_stories',
+                 return_value=['one.story', 'two.story'])
+    bundle.story_files = {'one.story': 'a = (', 'two.story': 'a = +'}
+    with raises(BundleError) as e:
+        bundle.bundle(all_errors=True)
+    paths = [error.path for error in e.value.errors]
+    assert paths == ['one.story', 'two.story']
 
 
 def test_bundle_bundle(patch, bundle):
@@ -233,6 +380,316 @@ def test_bundle_bundle_ebnf(patch, bundle):
                                       parser=Bundle.parser())
 
 
+def test_bundle_bundle_jobs(patch, bundle):
+    patch.many(Bundle, ['find_stories', 'services', 'compile_parallel',
+                        'parser'])
+    Bundle.find_stories.return_value = ['one.story', 'two.story']
+    bundle.bundle(jobs=4)
+    Bundle.compile_parallel.assert_called_with(Bundle.find_stories(),
+                                               parser=Bundle.parser(),
+                                               ebnf=None, jobs=4)
+
+
+def test_bundle_bundle_jobs_single_story(patch, bundle):
+    """
+    Ensures no processes are started for a single story
+    """
+    patch.many(Bundle, ['find_stories', 'services', 'compile',
+                        'compile_parallel', 'parser'])
+    Bundle.find_stories.return_value = ['one.story']
+    bundle.bundle(jobs=4)
+    assert Bundle.compile_parallel.call_count == 0
+    Bundle.compile.assert_called_with(['one.story'], parser=Bundle.parser())
+
+
+def test_bundle_bundle_jobs_profiler(patch, bundle):
+    """
+    Ensures profiled stories are compiled in this process
+    """
+    patch.many(Bundle, ['find_stories', 'services', 'compile',
+                        'compile_parallel', 'parser'])
+    Bundle.find_stories.return_value = ['one.story', 'two.story']
+    bundle.profiler = Profiler()
+    bundle.bundle(jobs=4)
+    assert Bundle.compile_parallel.call_count == 0
+    Bundle.compile.assert_called_with(Bundle.find_stories(),
+                                      parser=Bundle.parser())
+
+
+def test_bundle_load_cached(cache):
+    bundle = Bundle(story_files={'one.story': 'a = 1', 'two.story': 'b = 2'},
+                    cache=cache)
+    key = cache.key('a = 1', bundle.features, Grammar().build())
+    cache.save(key, {'tree': 'one'})
+    missing = bundle.load_cached(['one.story', 'two.story'], parser=None)
+    assert bundle.stories == {'one.story': {'tree': 'one'}}
+    assert list(missing) == ['two.story']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_bundle_load_cached_ebnf(patch, cache):
+    patch.object(CompileCache, 'key')
+    bundle = Bundle(story_files={'one.story': 'a = 1'}, cache=cache)
+    parser = Parser()
+    patch.object(Parser, 'grammar', return_value='grammar')
+    bundle.load_cached(['one.story'], parser=parser)
+    CompileCache.key.assert_called_with('a = 1', bundle.features, 'grammar')
+
+
+def test_bundle_bundle_cache(patch, cache):
+    """
+    Ensures only stories missing from the cache are compiled and that the
+    order of the stories is kept
+    """
+    patch.many(Bundle, ['compile', 'services'])
+    bundle = Bundle(story_files={'one.story': 'a = 1', 'two.story': 'b = 2'},
+                    cache=cache)
+    key = cache.key('b = 2', bundle.features, Grammar().build())
+    cache.save(key, {'tree': 'two'})
+
+    def compile(stories, parser):
+        assert stories == ['one.story']
+        bundle.add_story('one.story', {'tree': 'one'})
+
+    Bundle.compile.side_effect = compile
+    result = bundle.bundle()
+    assert list(result['stories'].items()) == [('one.story', {'tree': 'one'}),
+                                               ('two.story', {'tree': 'two'})]
+    key = cache.key('a = 1', bundle.features, Grammar().build())
+    assert cache.load(key) == {'tree': 'one'}
+
+
+def test_bundle_add_story(bundle):
+    bundle.add_story('one.story', 'compiled')
+    assert bundle.stories == {'one.story': 'compiled'}
+
+
+def test_bundle_add_story_writer(magic, bundle):
+    bundle.writer = magic()
+    bundle.add_story('one.story', 'compiled')
+    bundle.writer.add.assert_called_with('one.story', 'compiled')
+    assert bundle.stories == {}
+
+
+def test_bundle_add_story_cache(magic, bundle):
+    bundle.cache = magic()
+    bundle.cache_keys = {'one.story': 'key'}
+    bundle.add_story('one.story', 'compiled')
+    bundle.cache.save.assert_called_with('key', 'compiled')
+    assert bundle.cache_keys == {}
+
+
+def test_bundle_bundle_writer(patch, magic, bundle):
+    patch.many(Bundle, ['find_stories', 'services', 'compile', 'parser'])
+    writer = magic()
+    assert bundle.bundle(writer=writer) is None
+    assert bundle.writer == writer
+    writer.begin.assert_called_with(Bundle.find_stories())
+    Bundle.compile.assert_called_with(Bundle.find_stories(),
+                                      parser=Bundle.parser())
+    writer.end.assert_called()
+
+
+def test_bundle_bundle_cache_jobs(patch, cache):
+    patch.many(Bundle, ['compile', 'compile_parallel', 'load_cached',
+                        'services'])
+    Bundle.load_cached.return_value = {'one.story': 'key'}
+    bundle = Bundle(story_files={'one.story': '', 'two.story': ''},
+                    cache=cache)
+    bundle.stories = {'one.story': {}, 'two.story': {}}
+    bundle.bundle(jobs=4)
+    assert Bundle.compile_parallel.call_count == 0
+    Bundle.compile.assert_called_with(['one.story'], parser=None)
+
+
+def test_bundle_compile_parallel(patch, magic, bundle):
+    patch.object(BundleModule, 'ProcessPoolExecutor')
+    bundle.story_files = {'one.story': 'a = 1', 'two.story': 'b = 2'}
+    executor = BundleModule.ProcessPoolExecutor().__enter__()
+    executor.map.return_value = iter(['one', 'two'])
+    bundle.compile_parallel(['one.story', 'two.story'], parser=None,
+                            ebnf='ebnf', jobs=2)
+    BundleModule.ProcessPoolExecutor.assert_called_with(
+        max_workers=2, initializer=_init_worker, initargs=('ebnf',))
+    assert executor.map.call_args[0][1] == ['a = 1', 'b = 2']
+    assert list(bundle.stories.items()) == [('one.story', 'one'),
+                                            ('two.story', 'two')]
+
+
+def test_bundle_compile_parallel_error(patch, bundle):
+    """
+    Ensures the first failed story is compiled again to raise its error
+    """
+    patch.object(BundleModule, 'ProcessPoolExecutor')
+    patch.object(Bundle, 'compile')
+    Bundle.compile.side_effect = ValueError()
+    bundle.story_files = {'one.story': '', 'two.story': '', 'three.story': ''}
+    executor = BundleModule.ProcessPoolExecutor().__enter__()
+    executor.map.return_value = iter(['one', None, None])
+    with raises(ValueError):
+        bundle.compile_parallel(['one.story', 'two.story', 'three.story'],
+                                parser='parser', ebnf=None, jobs=2)
+    Bundle.compile.assert_called_once_with(['two.story'], parser='parser')
+    assert bundle.stories == {'one.story': 'one'}
+
+
+def test_bundle_compile_parallel_all_cpus(patch, bundle):
+    patch.object(BundleModule, 'ProcessPoolExecutor')
+    patch.object(os, 'cpu_count', return_value=3)
+    bundle.story_files = {'one.story': ''}
+    bundle.compile_parallel(['one.story'], parser=None, ebnf=None, jobs=0)
+    assert BundleModule.ProcessPoolExecutor.call_args[1]['max_workers'] == 3
+
+
+def test_bundle_init_worker(patch):
+    patch.object(BundleModule, '_parser')
+    _init_worker(None)
+    assert BundleModule._worker['parser'] == BundleModule._parser()
+
+
+def test_bundle_init_worker_ebnf(patch):
+    patch.init(Parser)
+    _init_worker('ebnf')
+    Parser.__init__.assert_called_with(ebnf='ebnf')
+    assert isinstance(BundleModule._worker['parser'], Parser)
+
+
+def test_bundle_compile_worker(patch):
+    BundleModule._worker['parser'] = None
+    assert _compile_worker('a = 1', {})['tree']['1']['args'] is not None
+
+
+def test_bundle_compile_worker_error():
+    BundleModule._worker['parser'] = None
+    assert _compile_worker('a = (', {}) is None
+
+
+def test_bundle_compile_worker_default_parser(patch):
+    """
+    Ensures workers of executors without initializer use the default parser
+    """
+    BundleModule._worker.clear()
+    patch.object(Story, 'parse')
+    patch.object(Story, 'compile')
+    _compile_worker('a = 1', {})
+    Story.parse.assert_called_with(parser=None)
+
+
+def test_bundle_acompile(bundle):
+    bundle.story_files = {'one.story': 'a = 1'}
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        asyncio.run(bundle.acompile('one.story', executor=executor))
+    assert bundle.stories['one.story']['tree']['1']['method'] == 'expression'
+
+
+def test_bundle_acompile_semaphore(patch, bundle):
+    async def acompile():
+        semaphore = asyncio.Semaphore(1)
+        await semaphore.acquire()
+        task = asyncio.ensure_future(bundle.acompile('one.story',
+                                                     semaphore=semaphore))
+        await asyncio.sleep(0.01)
+        assert Bundle.compile.call_count == 0
+        semaphore.release()
+        await task
+
+    patch.object(Bundle, 'compile')
+    asyncio.run(acompile())
+    Bundle.compile.assert_called_with(['one.story'], None)
+
+
+def test_bundle_acompile_process(patch, bundle):
+    patch.object(BundleModule, '_offload')
+
+    async def offload(executor, semaphore, fn, *args):
+        return 'compiled'
+
+    BundleModule._offload.side_effect = offload
+    executor = ProcessPoolExecutor(max_workers=1)
+    bundle.story_files = {'one.story': 'a = 1'}
+    asyncio.run(bundle.acompile('one.story', executor=executor))
+    BundleModule._offload.assert_called_with(executor, None, _compile_worker,
+                                             'a = 1', bundle.features.features)
+    assert bundle.stories == {'one.story': 'compiled'}
+
+
+def test_bundle_acompile_process_error(patch, bundle):
+    """
+    Ensures stories which failed in a process are compiled again in a thread
+    """
+    patch.object(BundleModule, '_offload')
+
+    async def offload(executor, semaphore, fn, *args):
+        return None
+
+    BundleModule._offload.side_effect = offload
+    executor = ProcessPoolExecutor(max_workers=1)
+    bundle.story_files = {'one.story': 'a = ('}
+    asyncio.run(bundle.acompile('one.story', executor=executor))
+    BundleModule._offload.assert_called_with(None, None, bundle.compile,
+                                             ['one.story'], None)
+
+
+def test_bundle_abundle(patch, bundle):
+    """
+    Ensures the stories are kept in their order, no matter which story is
+    compiled first
+    """
+    async def acompile(self, storypath, executor, semaphore):
+        if storypath == 'one.story':
+            await asyncio.sleep(0.01)
+        self.stories[storypath] = {'services': [storypath]}
+
+    patch.object(Bundle, 'acompile', acompile)
+    bundle.story_files = {'one.story': '', 'two.story': ''}
+    result = asyncio.run(bundle.abundle())
+    assert list(result['stories']) == ['one.story', 'two.story']
+    assert result['services'] == ['one.story', 'two.story']
+    assert result['entrypoint'] == ['one.story', 'two.story']
+
+
+def test_bundle_abundle_error(patch, bundle):
+    """
+    Ensures the first story in order raises its error, and the stories which
+    are still compiled are cancelled
+    """
+    cancelled = []
+
+    async def acompile(self, storypath, executor, semaphore):
+        if storypath == 'one.story':
+            await asyncio.sleep(0.01)
+            raise ValueError(storypath)
+        if storypath == 'two.story':
+            raise KeyError(storypath)
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(storypath)
+            raise
+
+    patch.object(Bundle, 'acompile', acompile)
+    bundle.story_files = {'one.story': '', 'two.story': '', 'three.story': ''}
+    with raises(ValueError):
+        asyncio.run(bundle.abundle())
+    assert cancelled == ['three.story']
+
+
+def test_bundle_abundle_all_errors(patch, bundle):
+    """
+    Ensures the errors of all stories are raised in the order of the stories
+    """
+    async def acompile(self, storypath, executor, semaphore):
+        if storypath == 'one.story':
+            await asyncio.sleep(0.01)
+        self.errors[storypath] = [storypath]
+
+    patch.object(Bundle, 'acompile', acompile)
+    bundle.story_files = {'one.story': '', 'two.story': ''}
+    with raises(BundleError) as e:
+        asyncio.run(bundle.abundle(all_errors=True))
+    assert e.value.errors == ['one.story', 'two.story']
+
+
 def test_bundle_bundle_trees(patch, bundle):
     patch.many(Bundle, ['find_stories', 'parse', 'parser'])
     result = bundle.bundle_trees()
@@ -256,26 +713,26 @@ def test_bundle_lex(patch, bundle):
     """
     Ensures Bundle.lex can lex a bundle
     """
-    patch.object(Story, 'from_file')
+    patch.object(Bundle, 'load_story')
     patch.object(Bundle, 'find_stories', return_value=['story'])
     patch.object(Bundle, 'parser')
     result = bundle.lex()
-    Story.from_file.assert_called_with('story', features=bundle.features)
+    Bundle.load_story.assert_called_with('story')
     Bundle.parser.assert_called_with(None)
-    Story.from_file().lex.assert_called_with(parser=Bundle.parser())
-    assert result['story'] == Story.from_file().lex()
+    Bundle.load_story().lex.assert_called_with(parser=Bundle.parser())
+    assert result['story'] == Bundle.load_story().lex()
 
 
 def test_bundle_lex_ebnf(patch, bundle):
     """
     Ensures Bundle.lex supports specifying an ebnf file
     """
-    patch.object(Story, 'from_file')
+    patch.object(Bundle, 'load_story')
     patch.object(Bundle, 'find_stories', return_value=['story'])
     patch.object(Bundle, 'parser')
     bundle.lex(ebnf='ebnf')
     Bundle.parser.assert_called_with('ebnf')
-    Story.from_file().lex.assert_called_with(parser=Bundle.parser())
+    Bundle.load_story().lex.assert_called_with(parser=Bundle.parser())
 
 
 def test_bundle_bundle_lower(patch, bundle, magic):
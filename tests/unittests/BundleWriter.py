@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+from pytest import fixture, mark
+
+from storyscript.BundleWriter import BundleWriter, _clean_dict
+
+
+@fixture
+def stream():
+    return io.StringIO()
+
+
+@fixture
+def stories():
+    return {
+        'one.story': {'tree': {'1': {'args': [], 'next': None}},
+                      'services': ['b', 'a']},
+        'two.story': {'tree': {}, 'services': ['a'], 'entrypoint': '1'},
+    }
+
+
+def write(stream, stories, order=None, **options):
+    writer = BundleWriter(stream, **options)
+    writer.begin(list(stories))
+    for storypath in order or stories:
+        writer.add(storypath, stories[storypath])
+    writer.end()
+    return stream.getvalue()
+
+
+def bundle(stories):
+    services = set()
+    for story in stories.values():
+        services.update(story['services'])
+    return {'stories': stories, 'services': sorted(services),
+            'entrypoint': list(stories)}
+
+
+def test_bundlewriter(stream, stories):
+    expected = json.dumps(bundle(stories), indent=2)
+    assert write(stream, stories) == expected
+
+
+def test_bundlewriter_compact(stream, stories):
+    expected = json.dumps(bundle(stories), separators=(',', ':'))
+    assert write(stream, stories, compact=True) == expected
+
+
+@mark.parametrize('compact', [False, True])
+def test_bundlewriter_concise(stream, stories, compact):
+    expected = json.dumps(_clean_dict(bundle(stories)), indent=2)
+    if compact:
+        expected = json.dumps(json.loads(expected), separators=(',', ':'))
+    assert write(stream, stories, concise=True, compact=compact) == expected
+
+
+@mark.parametrize('concise', [False, True])
+def test_bundlewriter_empty(stream, concise):
+    expected = bundle({})
+    if concise:
+        expected = _clean_dict(expected)
+    assert write(stream, {}, concise=concise) == json.dumps(expected,
+                                                            indent=2)
+
+
+def test_bundlewriter_order(stream, stories):
+    """
+    Ensures stories which were compiled first wait for the stories before
+    them
+    """
+    writer = BundleWriter(stream)
+    writer.begin(list(stories))
+    writer.add('two.story', stories['two.story'])
+    assert stream.getvalue() == '{\n  "stories": {'
+    writer.add('one.story', stories['one.story'])
+    assert writer.pending == {}
+    writer.end()
+    assert stream.getvalue() == json.dumps(bundle(stories), indent=2)
+
+
+def test_bundlewriter_story_written(stream, stories):
+    """
+    Ensures a story is written as soon as it's added
+    """
+    writer = BundleWriter(stream)
+    writer.begin(list(stories))
+    writer.add('one.story', stories['one.story'])
+    assert '"one.story": {' in stream.getvalue()
+    assert '"two.story"' not in stream.getvalue()
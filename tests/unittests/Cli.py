@@ -1,16 +1,25 @@
 # -*- coding: utf-8 -*-
 import io
+import json
 import os
+import shutil
+import tempfile
+from unittest.mock import ANY
 
 import click
 from click.testing import CliRunner
 
-from pytest import fixture, mark
+from pytest import fixture, mark, raises
 
 from storyscript.App import App
 from storyscript.Cli import Cli
+from storyscript.Client import Client
+from storyscript.CompileCache import CompileCache
+from storyscript.Profiler import Profiler
 from storyscript.Project import Project
+from storyscript.Server import Server
 from storyscript.Version import version
+from storyscript.exceptions.BundleError import BundleError
 from storyscript.exceptions.CompilerError import CompilerError
 from storyscript.exceptions.StoryError import StoryError
 
@@ -27,7 +36,7 @@ def echo(patch):
 
 @fixture
 def app(patch):
-    patch.many(App, ['compile', 'parse'])
+    patch.many(App, ['compile', 'parse', 'compile_watch', 'parse_watch'])
     return App
 
 
@@ -98,7 +107,9 @@ def test_cli_compile_with_ignore_option(runner, app):
                                 '--ignore', 'path/sub_dir/my_fake.story'])
     App.compile.assert_called_with('path/fake.story', ebnf=None,
                                    ignored_path='path/sub_dir/my_fake.story',
-                                   concise=False, first=False, features={})
+                                   concise=False, first=False, features={},
+                                   jobs=1, cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
 
 
 def test_cli_parse_with_ignore_option(runner, app):
@@ -132,6 +143,22 @@ def test_cli_parse_raw(runner, echo, app, tree):
     click.echo.assert_called_with(tree)
 
 
+def test_cli_parse_watch(patch, runner, echo, app, tree):
+    """
+    Ensures the parse command can watch stories and prints their errors
+    """
+    patch.object(StoryError, 'echo')
+    error = StoryError(CompilerError(None), None)
+    App.parse_watch.return_value = iter([('one', tree), ('two', error)])
+    e = runner.invoke(Cli.parse, ['/path', '--watch'])
+    assert e.exit_code == 0
+    App.parse_watch.assert_called_with('/path', ebnf=None, ignored_path=None,
+                                       lower=False, features={})
+    click.echo.assert_any_call(tree.pretty())
+    click.echo.assert_called_with('File: two')
+    StoryError.echo.assert_called_once()
+
+
 def test_cli_parse_path(runner, echo, app):
     """
     Ensures the parse command supports specifying a path.
@@ -268,9 +295,31 @@ def test_cli_compile(patch, runner, echo, app):
     runner.invoke(Cli.compile, [])
     App.compile.assert_called_with(os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=False, features={})
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
     click.style.assert_called_with('Script syntax passed!', fg='green')
-    click.echo.assert_called_with(click.style())
+    click.echo.assert_any_call(click.style())
+    click.echo.assert_called_with('Cache: 0 hits, 0 misses')
+
+
+def test_cli_compile_cache(runner, echo, app):
+    """
+    Ensures the compile command reuses cached stories by default
+    """
+    runner.invoke(Cli.compile, [])
+    cache = App.compile.call_args[1]['cache']
+    assert isinstance(cache, CompileCache)
+
+
+def test_cli_compile_no_cache(runner, echo, app):
+    runner.invoke(Cli.compile, ['--no-cache'])
+    App.compile.assert_called_with(os.getcwd(), ebnf=None,
+                                   ignored_path=None, concise=False,
+                                   first=False, features={}, jobs=1,
+                                   cache=None, compact=False,
+                                   all_errors=False, profiler=None)
+    assert click.echo.call_count == 1
 
 
 def test_cli_compile_path(patch, runner, app):
@@ -280,17 +329,110 @@ def test_cli_compile_path(patch, runner, app):
     runner.invoke(Cli.compile, ['/path'])
     App.compile.assert_called_with('/path', ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=False, features={})
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
+
+
+def test_cli_compile_jobs(patch, runner, app):
+    """
+    Ensures the compile command supports compiling with several processes
+    """
+    runner.invoke(Cli.compile, ['/path', '--jobs', '4'])
+    App.compile.assert_called_with('/path', ebnf=None,
+                                   ignored_path=None, concise=False,
+                                   first=False, features={}, jobs=4,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
+
+
+def test_cli_compile_watch(patch, runner, echo, app):
+    """
+    Ensures the compile command can watch stories and prints the result of
+    every changed story
+    """
+    patch.many(StoryError, ['echo'])
+    patch.object(click, 'style')
+    error = StoryError(CompilerError(None), None)
+    App.compile_watch.return_value = iter([('one', 'json'), ('two', error)])
+    e = runner.invoke(Cli.compile, ['/path', '--watch'])
+    assert e.exit_code == 0
+    App.compile_watch.assert_called_with('/path', ebnf=None,
+                                         ignored_path=None, concise=False,
+                                         first=False, compact=False,
+                                         features={})
+    assert App.compile.call_count == 0
+    click.style.assert_called_with('Script syntax passed!', fg='green')
+    click.echo.assert_any_call('File: one')
+    click.echo.assert_called_with('File: two')
+    StoryError.echo.assert_called_once()
+
+
+def test_cli_compile_watch_options(runner, echo, app):
+    App.compile_watch.return_value = iter([])
+    runner.invoke(Cli.compile, ['/path', '--watch', '--first', '--compact'])
+    App.compile_watch.assert_called_with('/path', ebnf=None,
+                                         ignored_path=None, concise=False,
+                                         first=True, compact=True,
+                                         features={})
+
+
+@mark.parametrize('option', [['--jobs', '2'], ['--all-errors']])
+def test_cli_compile_watch_bundle_options(runner, echo, app, option):
+    """
+    Ensures the options of whole bundles are rejected in watch mode
+    """
+    e = runner.invoke(Cli.compile, ['/path', '--watch'] + option)
+    assert e.exit_code == 2
+    assert 'are not supported' in e.output
+    assert App.compile_watch.call_count == 0
+
+
+def test_cli_compile_watch_json(runner, echo, app):
+    App.compile_watch.return_value = iter([('one', 'json')])
+    runner.invoke(Cli.compile, ['/path', '--watch', '--json'])
+    click.echo.assert_called_once_with('json')
+
+
+def test_cli_compile_watch_silent(runner, echo, app):
+    App.compile_watch.return_value = iter([('one', 'json')])
+    runner.invoke(Cli.compile, ['/path', '--watch', '--silent'])
+    assert click.echo.call_count == 0
+
+
+def test_cli_compile_watch_debug(runner, echo, app):
+    ce = CompilerError(None)
+    App.compile_watch.return_value = iter([('one', StoryError(ce, None))])
+    e = runner.invoke(Cli.compile, ['/path', '--watch', '--debug'])
+    assert e.exception is ce
 
 
 def test_cli_compile_output_file(patch, runner, app):
     """
-    Ensures the compile command supports specifying an output file.
+    Ensures the compile command supports specifying an output file, which
+    is only replaced once the stories have been compiled.
     """
     patch.object(io, 'open')
-    runner.invoke(Cli.compile, ['/path', 'hello.story', '-j'])
-    io.open.assert_called_with('hello.story', 'w')
-    io.open().__enter__().write.assert_called_with(App.compile())
+    patch.object(os, 'replace')
+    e = runner.invoke(Cli.compile, ['/path', 'hello.story', '-j'])
+    assert e.exit_code == 0
+    io.open.assert_called_with('hello.story.tmp', 'w')
+    stream = io.open().__enter__()
+    assert App.compile.call_args[1]['stream'] == stream
+    os.replace.assert_called_with('hello.story.tmp', 'hello.story')
+
+
+def test_cli_compile_output_file_error(patch, runner, app, tmpdir):
+    """
+    Ensures the output file is kept if the stories can't be compiled
+    """
+    output = tmpdir.join('out.json')
+    output.write('old')
+    App.compile.side_effect = StoryError(CompilerError(None), None)
+    e = runner.invoke(Cli.compile, ['/path', str(output), '-j'])
+    assert e.exit_code == 1
+    assert output.read() == 'old'
+    assert tmpdir.listdir() == [output]
 
 
 @mark.parametrize('option', ['--silent', '-s'])
@@ -301,7 +443,9 @@ def test_cli_compile_silent(runner, echo, app, option):
     result = runner.invoke(Cli.compile, [option])
     App.compile.assert_called_with(os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=False, features={})
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
     assert result.output == ''
     assert click.echo.call_count == 0
 
@@ -314,7 +458,9 @@ def test_cli_compile_concise(runner, echo, app, option):
     runner.invoke(Cli.compile, [option])
     App.compile.assert_called_with(os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=True,
-                                   first=False, features={})
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
 
 
 @mark.parametrize('option', ['--first', '-f'])
@@ -325,40 +471,175 @@ def test_cli_compile_first(runner, echo, app, option):
     runner.invoke(Cli.compile, [option])
     App.compile.assert_called_with(os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=True, features={})
+                                   first=True, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
 
 
 def test_cli_compile_debug(runner, echo, app):
     runner.invoke(Cli.compile, ['--debug'])
     App.compile.assert_called_with(os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=False, features={})
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
 
 
 def test_cli_compile_features(runner, echo, app):
     runner.invoke(Cli.compile, ['--preview=globals'])
     App.compile.assert_called_with(os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=False, features={'globals': True})
+                                   first=False,
+                                   features={'globals': True}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
 
 
 @mark.parametrize('option', ['--json', '-j'])
-def test_cli_compile_json(runner, echo, app, option):
+def test_cli_compile_json(patch, runner, echo, app, option):
     """
-    Ensures --json outputs json
+    Ensures --json writes the json to stdout once the stories are compiled
     """
+    stdout = io.StringIO()
+    patch.object(click, 'get_text_stream', return_value=stdout)
+    App.compile.side_effect = lambda stream, **options: stream.write('{}')
     runner.invoke(Cli.compile, [option])
-    App.compile.assert_called_with(os.getcwd(), ebnf=None,
+    click.get_text_stream.assert_called_with('stdout')
+    App.compile.assert_called_with(path=os.getcwd(), ebnf=None,
                                    ignored_path=None, concise=False,
-                                   first=False, features={})
-    click.echo.assert_called_with(App.compile())
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None,
+                                   stream=ANY)
+    assert stdout.getvalue() == '{}'
+    click.echo.assert_called_with()
+
+
+def test_cli_compile_json_spooled(patch, runner, echo, app):
+    """
+    Ensures small outputs are spooled in memory
+    """
+    patch.object(tempfile, 'SpooledTemporaryFile')
+    patch.object(shutil, 'copyfileobj')
+    runner.invoke(Cli.compile, ['--json'])
+    tempfile.SpooledTemporaryFile.assert_called_with(Cli.spool_size,
+                                                     mode='w+')
+
+
+def test_cli_compile_json_error(patch, runner, echo, app):
+    """
+    Ensures nothing is written to stdout when a story fails
+    """
+    def compile(stream, **options):
+        stream.write('{"stories": {')
+        raise StoryError(None, None)
+
+    stdout = io.StringIO()
+    patch.object(click, 'get_text_stream', return_value=stdout)
+    patch.object(StoryError, 'echo')
+    App.compile.side_effect = compile
+    result = runner.invoke(Cli.compile, ['--json'])
+    assert stdout.getvalue() == ''
+    assert result.exit_code == 1
+    StoryError.echo.assert_called_with()
+
+
+def test_cli_compile_profile(patch, runner, echo, app):
+    patch.object(Cli, 'echo_profile')
+    runner.invoke(Cli.compile, ['--profile'])
+    kwargs = App.compile.call_args[1]
+    assert kwargs['cache'] is None
+    assert isinstance(kwargs['profiler'], Profiler)
+    Cli.echo_profile.assert_called_with(kwargs['profiler'], False)
+
+
+def test_cli_compile_profile_json(patch, runner, echo, app):
+    patch.object(click, 'get_text_stream')
+    patch.object(Cli, 'echo_profile')
+    runner.invoke(Cli.compile, ['--profile', '--json'])
+    profiler = App.compile.call_args[1]['profiler']
+    Cli.echo_profile.assert_called_with(profiler, True)
+
+
+def test_cli_compile_profile_server(patch, runner, echo, app):
+    """
+    Ensures profiled stories are compiled by the command itself
+    """
+    patch.object(Cli, 'forward')
+    runner.invoke(Cli.compile, ['--profile', '--server'])
+    assert Cli.forward.call_count == 0
+    assert App.compile.call_count == 1
+
+
+def test_cli_compile_cprofile(runner, echo, app, tmpdir):
+    path = str(tmpdir.join('compile.prof'))
+    runner.invoke(Cli.compile, ['--cprofile', path])
+    assert os.path.exists(path)
+
+
+def test_cli_compile_profiler(patch):
+    patch.init(CompileCache)
+    cache, profiler = Cli.compile_profiler(False, False)
+    assert isinstance(cache, CompileCache)
+    assert profiler is None
+
+
+def test_cli_compile_profiler_no_cache():
+    assert Cli.compile_profiler(True, False) == (None, None)
+
+
+def test_cli_compile_profiler_profile():
+    cache, profiler = Cli.compile_profiler(False, True)
+    assert cache is None
+    assert isinstance(profiler, Profiler)
+
+
+def test_cli_echo_compiled(patch):
+    patch.object(click, 'echo')
+    Cli.echo_compiled('json', None, True, None)
+    click.echo.assert_called_with('json')
+
+
+def test_cli_echo_compiled_counts(patch):
+    patch.object(click, 'echo')
+    Cli.echo_compiled('json', None, False, {'hits': 1, 'misses': 2})
+    click.echo.assert_called_with('Cache: 1 hits, 2 misses')
+
+
+def test_cli_echo_profile(patch):
+    patch.object(click, 'echo')
+    profiler = Profiler()
+    Cli.echo_profile(profiler, False)
+    click.echo.assert_called_with(profiler.table(), err=True)
+
+
+def test_cli_echo_profile_json(patch):
+    patch.object(click, 'echo')
+    Cli.echo_profile(Profiler(), True)
+    output = click.echo.call_args[0][0]
+    assert json.loads(output) == {'stories': {}, 'total': {}}
+    assert click.echo.call_args[1] == {'err': True}
+
+
+def test_cli_echo_profile_none(patch):
+    patch.object(click, 'echo')
+    Cli.echo_profile(None, False)
+    assert click.echo.call_count == 0
+
+
+def test_cli_compile_json_compact(patch, runner, echo, app):
+    patch.object(click, 'get_text_stream')
+    runner.invoke(Cli.compile, ['--json', '--compact'])
+    assert App.compile.call_args[1]['compact'] is True
 
 
 def test_cli_compile_ebnf(runner, echo, app):
     runner.invoke(Cli.compile, ['--ebnf', 'test.ebnf'])
     App.compile.assert_called_with(os.getcwd(), ebnf='test.ebnf',
                                    ignored_path=None, concise=False,
-                                   first=False, features={})
+                                   first=False, features={}, jobs=1,
+                                   cache=ANY, compact=False,
+                                   all_errors=False, profiler=None)
 
 
 def test_cli_compile_ice(runner, echo, app):
@@ -407,6 +688,26 @@ def test_cli_compile_not_found_debug(runner, echo, app):
     assert e.exception.message() == 'Unknown compiler error'
 
 
+def test_cli_compile_all_errors(patch, runner, echo, app):
+    """
+    Ensures the compile command reports the errors of all stories
+    """
+    patch.object(BundleError, 'echo')
+    app.compile.side_effect = BundleError([])
+    e = runner.invoke(Cli.compile, ['--all-errors'])
+    assert app.compile.call_args[1]['all_errors'] is True
+    assert e.exit_code == 1
+    assert BundleError.echo.call_count == 1
+
+
+def test_cli_compile_all_errors_debug(runner, echo, app):
+    ce = CompilerError(None)
+    app.compile.side_effect = BundleError([StoryError(ce, None)])
+    e = runner.invoke(Cli.compile, ['--all-errors', '--debug'])
+    assert e.exit_code == 1
+    assert e.exception is ce
+
+
 def test_cli_lex(patch, magic, runner, app, echo):
     """
     Ensures the lex command outputs lexer tokens
@@ -522,3 +823,116 @@ def test_cli_help(patch, runner, echo):
 def test_cli_version(patch, runner, echo):
     runner.invoke(Cli.version, [])
     click.echo.assert_called_with(version)
+
+
+@fixture
+def forward(patch):
+    patch.object(Cli, 'forward')
+    return Cli.forward
+
+
+def test_cli_compile_server(runner, echo, app, forward):
+    """
+    Ensures the compile command can be forwarded to the server
+    """
+    forward.return_value = {'result': 'json', 'errors': []}
+    runner.invoke(Cli.compile, ['/path', '--server', '--json'])
+    forward.assert_called_with('compile', path='/path', ignored_path=None,
+                               ebnf=None, concise=False, first=False,
+                               features={}, jobs=1, cache=True,
+                               compact=False, all_errors=False)
+    assert App.compile.call_count == 0
+    click.echo.assert_called_with('json')
+
+
+def test_cli_compile_server_cache(runner, echo, app, forward):
+    forward.return_value = {'result': 'json', 'errors': [],
+                            'cache': {'hits': 1, 'misses': 2}}
+    runner.invoke(Cli.compile, ['/path', '--server'])
+    click.echo.assert_called_with('Cache: 1 hits, 2 misses')
+
+
+def test_cli_compile_server_not_running(runner, echo, app, forward):
+    forward.return_value = None
+    runner.invoke(Cli.compile, ['/path', '--server'])
+    assert App.compile.call_count == 1
+
+
+def test_cli_compile_server_debug(runner, echo, app, forward):
+    """
+    Ensures stories are compiled locally with --debug
+    """
+    runner.invoke(Cli.compile, ['/path', '--server', '--debug'])
+    assert forward.call_count == 0
+    assert App.compile.call_count == 1
+
+
+def test_cli_parse_server(runner, echo, app, forward):
+    forward.return_value = {'result': {'one.story': 'tree'}, 'errors': []}
+    runner.invoke(Cli.parse, ['/path', '--server'])
+    forward.assert_called_with('parse', path='/path', ignored_path=None,
+                               ebnf=None, lower=False, features={}, raw=False)
+    assert App.parse.call_count == 0
+    click.echo.assert_called_with('tree')
+
+
+def test_cli_lex_server(patch, runner, echo, forward):
+    patch.object(App, 'lex')
+    forward.return_value = {'result': {'one.story': [['NAME', 'a']]},
+                            'errors': []}
+    runner.invoke(Cli.lex, ['/path', '--server'])
+    forward.assert_called_with('lex', path='/path', ebnf=None, features={})
+    assert App.lex.call_count == 0
+    click.echo.assert_called_with('0 NAME a')
+
+
+def test_cli_serve(patch, runner, echo):
+    patch.init(Server)
+    patch.object(Server, 'serve', side_effect=KeyboardInterrupt())
+    Server.server_address = '/server.sock'
+    e = runner.invoke(Cli.serve, ['--socket', '/server.sock'])
+    assert e.exit_code == 0
+    Server.__init__.assert_called_with(path='/server.sock')
+    click.echo.assert_called_with('Listening on /server.sock')
+    Server.serve.assert_called()
+
+
+def test_cli_serve_running(patch, runner, echo):
+    """
+    Ensures serve stops if a server is running already
+    """
+    error = StoryError.create_error('server_running', path='/server.sock')
+    patch.init(Server)
+    Server.__init__.side_effect = error
+    patch.object(Server, 'serve')
+    patch.object(StoryError, 'echo')
+    e = runner.invoke(Cli.serve, ['--socket', '/server.sock'])
+    assert e.exit_code == 1
+    StoryError.echo.assert_called_with()
+    assert Server.serve.call_count == 0
+
+
+def test_cli_forward(patch):
+    patch.init(Client)
+    patch.many(Client, ['connect', 'request', 'close'])
+    Client.request.return_value = {'result': 'json', 'errors': []}
+    assert Cli.forward('compile', path='/path') == {'result': 'json',
+                                                    'errors': []}
+    Client.request.assert_called_with('compile', cwd=os.getcwd(),
+                                      path='/path')
+    Client.close.assert_called()
+
+
+def test_cli_forward_not_running(patch):
+    patch.init(Client)
+    patch.object(Client, 'connect', return_value=False)
+    assert Cli.forward('compile') is None
+
+
+def test_cli_forward_errors(patch, echo):
+    patch.init(Client)
+    patch.many(Client, ['connect', 'request', 'close'])
+    Client.request.return_value = {'result': None, 'errors': ['error']}
+    with raises(SystemExit):
+        Cli.forward('compile')
+    click.echo.assert_called_with('error')
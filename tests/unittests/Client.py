@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import socket
+
+from pytest import fixture, raises
+
+from storyscript.Client import Client
+from storyscript.Server import Server
+
+
+@fixture
+def client(magic):
+    client = Client(path='/server.sock')
+    client.socket = magic()
+    client.file = magic()
+    return client
+
+
+def test_client_init_default(patch):
+    patch.object(Server, 'default_path', return_value='/default.sock')
+    assert Client().path == '/default.sock'
+
+
+def test_client_connect(patch):
+    patch.object(socket, 'socket')
+    client = Client(path='/server.sock')
+    assert client.connect() is True
+    socket.socket().connect.assert_called_with('/server.sock')
+    assert client.file == socket.socket().makefile()
+
+
+def test_client_connect_not_running(tmpdir):
+    client = Client(path=str(tmpdir.join('s.sock')))
+    assert client.connect() is False
+    assert client.socket is None
+
+
+def test_client_close(client):
+    sock = client.socket
+    client.close()
+    sock.close.assert_called()
+    assert client.socket is None
+
+
+def test_client_close_broken(client):
+    sock = client.socket
+    client.file.close.side_effect = BrokenPipeError()
+    client.close()
+    sock.close.assert_called()
+    assert client.socket is None
+
+
+def test_client_request(client):
+    client.file = io.BytesIO()
+    response = {'id': 1, 'result': 'json', 'errors': []}
+    client.file.readline = lambda: json.dumps(response).encode('utf8')
+    assert client.request('compile', path='/path') == response
+    request = json.loads(client.file.getvalue())
+    assert request == {'id': 1, 'method': 'compile',
+                       'params': {'path': '/path'}}
+
+
+def test_client_request_closed(client):
+    client.file.readline.return_value = b''
+    with raises(ConnectionError):
+        client.request('compile')
+
+
+def test_client_request_reconnect(patch, client):
+    """
+    Ensures requests are sent again when the server closed the connection
+    """
+    patch.object(Client, 'connect', return_value=True)
+    patch.object(Client, 'send', side_effect=[ConnectionError(), 'response'])
+    assert client.request('compile', path='/path') == 'response'
+    assert client.socket is None
+    Client.connect.assert_called_once()
+    Client.send.assert_called_with('compile', {'path': '/path'})
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+
+from pytest import fixture
+
+from storyscript.CompileCache import CompileCache
+from storyscript.Features import Features
+from storyscript.parser import ParserCache
+
+
+@fixture
+def cache(tmpdir):
+    return CompileCache(directory=str(tmpdir))
+
+
+@fixture
+def features():
+    return Features(None)
+
+
+def test_compilecache_init(cache, tmpdir):
+    assert cache.directory == str(tmpdir)
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert cache.pruned is False
+
+
+def test_compilecache_init_default(patch):
+    patch.object(ParserCache, 'default_directory', return_value='/cache')
+    assert CompileCache().directory == '/cache/stories'
+
+
+def test_compilecache_key(features):
+    key = CompileCache.key('a = 1', features, 'grammar')
+    assert key == CompileCache.key('a = 1', Features(None), 'grammar')
+    assert key != CompileCache.key('a = 2', features, 'grammar')
+    assert key != CompileCache.key('a = 1', features, 'grammar2')
+    assert key != CompileCache.key('a = 1', Features({'globals': True}),
+                                   'grammar')
+
+
+def test_compilecache_key_version(patch, features):
+    key = CompileCache.key('a = 1', features, 'grammar')
+    patch.object(CompileCache, 'version', 2)
+    assert key != CompileCache.key('a = 1', features, 'grammar')
+
+
+def test_compilecache_key_sources(patch, features):
+    """
+    Ensures changes of the compiler invalidate the cache
+    """
+    key = CompileCache.key('a = 1', features, 'grammar')
+    patch.object(CompileCache, '_sources', 'changed')
+    assert key != CompileCache.key('a = 1', features, 'grammar')
+
+
+def test_compilecache_sources(patch):
+    patch.object(CompileCache, '_sources', None)
+    sources = CompileCache.sources()
+    assert len(sources) == 64
+    assert CompileCache.sources() == sources
+
+
+def test_compilecache_sources_cached(patch):
+    patch.object(CompileCache, '_sources', 'sources')
+    assert CompileCache.sources() == 'sources'
+
+
+def test_compilecache_save_load(cache):
+    cache.save('key', {'tree': {'1': {}}})
+    assert cache.load('key') == {'tree': {'1': {}}}
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_compilecache_load_used(patch, cache):
+    cache.save('key', {})
+    patch.object(ParserCache, 'used')
+    cache.load('key')
+    ParserCache.used.assert_called_with(cache.path('key'))
+
+
+def test_compilecache_save_prune(patch, cache):
+    """
+    Ensures old stories are only pruned on the first save
+    """
+    patch.object(ParserCache, 'prune')
+    cache.save('key', {})
+    cache.save('key2', {})
+    ParserCache.prune.assert_called_once_with(
+        cache.directory, ('.json', '.tmp'), CompileCache.max_age,
+        CompileCache.max_entries)
+    assert cache.pruned is True
+
+
+def test_compilecache_load_missing(cache):
+    assert cache.load('key') is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_compilecache_load_corrupted(cache):
+    with io.open(cache.path('key'), 'w') as f:
+        f.write('{')
+    assert cache.load('key') is None
+    assert cache.misses == 1
+
+
+def test_compilecache_save_error(patch, cache):
+    """
+    Ensures failures to write the cache are ignored
+    """
+    patch.object(json, 'dumps', side_effect=ValueError())
+    cache.save('key', {})
+    assert os.listdir(cache.directory) == []
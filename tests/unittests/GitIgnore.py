@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+
+from pytest import fixture, mark
+
+from storyscript.GitIgnore import GitIgnore, _Patterns, _translate
+
+
+@fixture
+def repo(patch, tmpdir):
+    patch.object(os, 'getenv', return_value=str(tmpdir.join('config')))
+    tmpdir.mkdir('.git')
+    with tmpdir.as_cwd():
+        yield tmpdir
+
+
+@fixture
+def ignores(repo):
+    return GitIgnore(root=str(repo))
+
+
+@mark.parametrize('pattern, expected', [
+    ('a.story', r'a\.story'),
+    ('*.story', r'[^/]*\.story'),
+    ('a?', 'a[^/]'),
+    ('[ab]', '[ab]'),
+    ('[!ab]', '[^ab]'),
+    ('[a', r'\[a'),
+    (r'\*', r'\*'),
+    ('**/a', '(?:.*/)?a'),
+    ('a/**/b', 'a/(?:.*/)?b'),
+    ('a/**', 'a/.*'),
+    ('a**', 'a[^/]*'),
+])
+def test_translate(pattern, expected):
+    assert _translate(pattern) == expected
+
+
+def test_patterns_parse():
+    negate, regex, dir_only, name = _Patterns.parse('a.story\n')
+    assert negate is False
+    assert regex.pattern == r'(?:.*/)?a\.story'
+    assert dir_only is False
+    assert name == 'a.story'
+
+
+@mark.parametrize('line', ['', '\n', '# comment', '   ', '!', '/'])
+def test_patterns_parse_empty(line):
+    assert _Patterns.parse(line) is None
+
+
+def test_patterns_parse_negate():
+    negate, regex, dir_only, name = _Patterns.parse('!a\r\n')
+    assert negate is True
+    assert name == 'a'
+
+
+@mark.parametrize('line, name', [(r'\#a', '#a'), (r'\!a', '!a')])
+def test_patterns_parse_escaped(line, name):
+    negate, regex, dir_only, _ = _Patterns.parse(line)
+    assert negate is False
+    assert regex.fullmatch(name)
+
+
+def test_patterns_parse_spaces():
+    assert _Patterns.parse('a  ')[3] == 'a'
+    assert _Patterns.parse('a\\ ')[1].fullmatch('a ')
+
+
+def test_patterns_parse_dir():
+    negate, regex, dir_only, name = _Patterns.parse('build/')
+    assert dir_only is True
+    assert name == 'build'
+
+
+def test_patterns_parse_anchored():
+    negate, regex, dir_only, name = _Patterns.parse('/build')
+    assert regex.pattern == 'build'
+    assert name is None
+    assert _Patterns.parse('a/b')[1].pattern == 'a/b'
+
+
+def test_patterns_match():
+    patterns = _Patterns(['one.story', 'build/', '*.tmp', '/root.story'])
+    assert patterns.negations is False
+    assert patterns.names == {'one.story'}
+    assert patterns.dir_names == {'build'}
+    assert patterns.match('a/one.story', 'one.story', False) is True
+    assert patterns.match('build', 'build', True) is True
+    assert patterns.match('build', 'build', False) is None
+    assert patterns.match('a/b.tmp', 'b.tmp', False) is True
+    assert patterns.match('root.story', 'root.story', False) is True
+    assert patterns.match('a/root.story', 'root.story', False) is None
+
+
+def test_patterns_match_negations():
+    patterns = _Patterns(['*.story', '!keep.story', 'dir/', '!dir'])
+    assert patterns.negations is True
+    assert patterns.match('a.story', 'a.story', False) is True
+    assert patterns.match('keep.story', 'keep.story', False) is False
+    assert patterns.match('dir', 'dir', True) is False
+    assert patterns.match('a', 'a', False) is None
+
+
+def test_gitignore_init():
+    ignores = GitIgnore()
+    assert ignores.root is None
+    assert ignores.files is None
+    assert ignores.paths == set()
+    assert ignores.chains == {}
+    assert ignores.ignored_dirs == set()
+    assert ignores.tracked_files == set()
+    assert ignores.tracked_dirs == set()
+
+
+def test_gitignore_find_root(repo):
+    repo.mkdir('a').mkdir('b')
+    assert GitIgnore.find_root('a/b') == str(repo)
+
+
+def test_gitignore_find_root_none(patch):
+    patch.object(os.path, 'exists', return_value=False)
+    assert GitIgnore.find_root('.') is None
+
+
+def test_gitignore_from_directory(patch):
+    patch.object(GitIgnore, 'find_root')
+    ignores = GitIgnore.from_directory('dir')
+    GitIgnore.find_root.assert_called_with('dir')
+    assert ignores.root == GitIgnore.find_root.return_value
+
+
+def test_gitignore_from_files():
+    ignores = GitIgnore.from_files(['one.story', ''])
+    assert ignores.files == {'one.story', ''}
+    assert ignores.root is None
+
+
+def test_gitignore_ignore():
+    ignores = GitIgnore()
+    ignores.ignore('one.story')
+    assert ignores.paths == {os.path.abspath('one.story')}
+
+
+def test_gitignore_read(tmpdir):
+    tmpdir.join('.gitignore').write('a\nb\n')
+    assert GitIgnore.read(str(tmpdir.join('.gitignore'))) == ['a\n', 'b\n']
+    assert GitIgnore.read(str(tmpdir.join('missing'))) == []
+
+
+def test_gitignore_excludes(repo, ignores):
+    repo.mkdir('config').mkdir('git').join('ignore').write('a\n')
+    repo.join('.git').mkdir('info').join('exclude').write('b\n')
+    assert ignores.excludes() == ['a\n', 'b\n']
+    os.getenv.assert_called_with('XDG_CONFIG_HOME')
+
+
+def test_gitignore_chain(repo, ignores):
+    repo.join('.gitignore').write('a\n')
+    repo.mkdir('one').mkdir('two').join('.gitignore').write('b\n')
+    chain = ignores.chain('one/two')
+    assert [base for base, patterns in chain] == ['', '', 'one/two']
+    assert chain[1][1].names == {'a'}
+    assert ignores.chains['one'] == chain[:2]
+    assert ignores.chain('one/two') is chain
+
+
+def test_gitignore_ignored(repo, ignores):
+    repo.join('.gitignore').write('*.log\n/build/\n!keep.log\n')
+    root = str(repo)
+    assert ignores.ignored(root, 'a.log') is True
+    assert ignores.ignored(root, 'keep.log') is False
+    assert ignores.ignored(root, 'a.story') is False
+    assert ignores.ignored(root, 'build', True) is True
+    assert ignores.ignored(os.path.join(root, 'a'), 'build', True) is False
+
+
+def test_gitignore_ignored_nested(repo, ignores):
+    repo.join('.gitignore').write('*.story\n')
+    repo.mkdir('one').join('.gitignore').write('!/two.story\n')
+    one = str(repo.join('one'))
+    assert ignores.ignored(one, 'two.story') is False
+    assert ignores.ignored(one, 'three.story') is True
+    assert ignores.ignored(os.path.join(one, 'a'), 'two.story') is True
+
+
+def test_gitignore_list_tracked(patch, magic, ignores):
+    patch.object(subprocess, 'run',
+                 return_value=magic(returncode=0, stdout=b'b/c\0b/d/e\0'))
+    assert ignores.list_tracked('b') == ['b/c', 'b/d/e']
+    assert subprocess.run.call_args[0][0] == [
+        'git', '--literal-pathspecs', 'ls-files', '-z', '--', 'b']
+    assert subprocess.run.call_args[1]['cwd'] == ignores.root
+
+
+def test_gitignore_list_tracked_error(patch, magic, ignores):
+    patch.object(subprocess, 'run', return_value=magic(returncode=128))
+    assert ignores.list_tracked('b') == []
+
+
+def test_gitignore_list_tracked_no_git(patch, ignores):
+    patch.object(subprocess, 'run', side_effect=FileNotFoundError())
+    assert ignores.list_tracked('b') == []
+
+
+def test_gitignore_tracked(patch, ignores):
+    patch.object(GitIgnore, 'list_tracked', return_value=['a.log'])
+    assert ignores.tracked('a.log', False) is True
+    GitIgnore.list_tracked.assert_called_with('a.log')
+    assert ignores.tracked_files == set()
+    GitIgnore.list_tracked.return_value = []
+    assert ignores.tracked('b.log', False) is False
+
+
+def test_gitignore_tracked_directory(patch, ignores):
+    """
+    Ensures the entries of ignored directories are checked with the files
+    listed for the directory
+    """
+    patch.object(GitIgnore, 'list_tracked',
+                 return_value=['build/sub/q.story'])
+    assert ignores.tracked('build', True) is True
+    assert ignores.tracked_files == {'build/sub/q.story'}
+    assert ignores.tracked_dirs == {'build/sub'}
+    ignores.ignored_dirs.update({'build', 'build/sub'})
+    assert ignores.tracked('build/sub', True) is True
+    assert ignores.tracked('build/other', True) is False
+    assert ignores.tracked('build/sub/q.story', False) is True
+    assert ignores.tracked('build/sub/r.story', False) is False
+    assert GitIgnore.list_tracked.call_count == 1
+
+
+def test_gitignore_ignored_tracked(patch, repo, ignores):
+    """
+    Ensures that tracked files and their directories are never ignored
+    """
+    patch.object(GitIgnore, 'list_tracked',
+                 return_value=['build/sub/q.story'])
+    repo.join('.gitignore').write('/build\n*.story\n')
+    root = str(repo)
+    build = os.path.join(root, 'build')
+    assert ignores.ignored(root, 'build', True) is False
+    assert ignores.ignored(build, 'sub', True) is False
+    assert ignores.ignored(os.path.join(build, 'sub'), 'q.story') is False
+    assert ignores.ignored(os.path.join(build, 'sub'), 'r.story') is True
+    assert ignores.ignored_dirs == {'build', 'build/sub'}
+    assert GitIgnore.list_tracked.call_count == 1
+
+
+def test_gitignore_ignored_tracked_directory(patch, repo, ignores):
+    """
+    Ensures that the untracked files of an ignored directory are ignored
+    """
+    patch.object(GitIgnore, 'list_tracked',
+                 return_value=['build/sub/q.story'])
+    repo.join('.gitignore').write('/build\n!r.story\n')
+    build = os.path.join(str(repo), 'build')
+    assert ignores.ignored(str(repo), 'build', True) is False
+    assert ignores.ignored(build, 'sub', True) is False
+    assert ignores.ignored(build, 'other', True) is True
+    assert ignores.ignored(os.path.join(build, 'sub'), 'r.story') is True
+
+
+def test_gitignore_ignored_untracked(patch, repo, ignores):
+    """
+    Ensures git isn't asked while nothing is ignored
+    """
+    patch.object(GitIgnore, 'list_tracked')
+    assert ignores.ignored(str(repo), 'a.story') is False
+    assert GitIgnore.list_tracked.call_count == 0
+
+
+@mark.skipif(shutil.which('git') is None, reason='git is missing')
+def test_gitignore_ignored_git_index(tmpdir):
+    """
+    Ensures that force-added files are found with the index of git
+    """
+    root = str(tmpdir)
+    subprocess.run(['git', 'init', '-q', root], check=True)
+    tmpdir.join('.gitignore').write('/build\n')
+    tmpdir.mkdir('build').mkdir('sub').join('q.story').write('a = 1\n')
+    subprocess.run(['git', 'add', '-f', 'build/sub/q.story'], cwd=root,
+                   check=True)
+    ignores = GitIgnore(root=root)
+    assert ignores.ignored(root, 'build', True) is False
+    assert ignores.ignored(os.path.join(root, 'build', 'sub'),
+                           'q.story') is False
+
+
+def test_gitignore_ignored_git(repo, ignores):
+    assert ignores.ignored(str(repo), '.git', True) is True
+
+
+def test_gitignore_ignored_outside(repo, ignores):
+    assert ignores.ignored(os.path.dirname(str(repo)), 'a') is False
+
+
+def test_gitignore_ignored_dots(repo, ignores):
+    """
+    Ensures that directories starting with two dots are in the repository
+    """
+    repo.join('.gitignore').write('*.log\n')
+    assert ignores.ignored(str(repo.mkdir('..foo')), 'a.log') is True
+
+
+def test_gitignore_ignored_paths(repo, ignores):
+    ignores.ignore('one')
+    assert ignores.ignored(str(repo), 'one', True) is True
+
+
+def test_gitignore_ignored_files():
+    ignores = GitIgnore.from_files(['one.story'])
+    assert ignores.ignored(os.getcwd(), 'one.story') is True
+    assert ignores.ignored(os.getcwd(), 'two.story') is False
+    assert ignores.ignored(os.getcwd(), '.git', True) is True
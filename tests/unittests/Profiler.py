@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from storyscript import Profiler as ProfilerModule
+from storyscript.Profiler import Profile, Profiler, phase
+
+
+def test_phase():
+    profile = Profile()
+    with phase(profile, 'parse'):
+        pass
+    assert profile.phases['parse']['time'] >= 0
+    assert isinstance(profile.phases['parse']['blocks'], int)
+
+
+def test_phase_nested():
+    """
+    Ensures phases are listed before the phases within them
+    """
+    profile = Profile()
+    with phase(profile, 'lowering'):
+        with phase(profile, 'lowering/desugar'):
+            pass
+    assert list(profile.phases) == ['lowering', 'lowering/desugar']
+
+
+def test_phase_none():
+    assert phase(None, 'parse') is ProfilerModule._no_phase
+    with phase(None, 'parse'):
+        pass
+
+
+def test_profile_add():
+    profile = Profile()
+    profile.add('parse', 1.0)
+    assert profile.phases['parse'] == {'time': 1.0, 'blocks': None}
+    profile.add('parse', 2.0, 3)
+    profile.add('parse', 1.0, -1)
+    assert profile.phases['parse'] == {'time': 4.0, 'blocks': 2}
+
+
+def test_profile_count():
+    profile = Profile()
+    profile.count('folding', 2)
+    profile.count('folding', 3)
+    assert profile.phases['folding'] == {'time': 0.0, 'blocks': None,
+                                         'nodes': 5}
+
+
+def test_profiler_profile():
+    profiler = Profiler()
+    profile = profiler.profile('one.story')
+    assert profiler.profiles == {'one.story': profile}
+
+
+def test_profiler_total():
+    profiler = Profiler()
+    profiler.profile('one.story').add('parse', 1.0, 2)
+    profile = profiler.profile('two.story')
+    profile.add('parse', 2.0, 3)
+    profile.add('json', 1.0)
+    assert profiler.total() == {'parse': {'time': 3.0, 'blocks': 5},
+                                'json': {'time': 1.0, 'blocks': None}}
+
+
+def test_profiler_total_nodes():
+    profiler = Profiler()
+    profiler.profile('one.story').count('folding', 2)
+    profiler.profile('two.story').count('folding', 3)
+    assert profiler.total() == {'folding': {'time': 0.0, 'blocks': None,
+                                            'nodes': 5}}
+
+
+def test_profiler_results():
+    profiler = Profiler()
+    profile = profiler.profile('one.story')
+    profile.add('parse', 1.0, 2)
+    assert profiler.results() == {
+        'stories': {'one.story': profile.phases},
+        'total': {'parse': {'time': 1.0, 'blocks': 2}},
+    }
+
+
+def test_profiler_table():
+    profiler = Profiler()
+    profile = profiler.profile('one.story')
+    profile.add('lowering', 0.5, 10)
+    profile.add('lowering/desugar', 0.25)
+    assert profiler.table().split('\n') == [
+        '1 stories',
+        'Phase      Time (ms)  Blocks',
+        'lowering      500.00     +10',
+        '  desugar     250.00        ',
+    ]
+
+
+def test_profiler_table_nodes():
+    profiler = Profiler()
+    profile = profiler.profile('one.story')
+    profile.add('semantics', 0.5, 10)
+    profile.add('folding', 0.25)
+    profile.count('folding', 12)
+    assert profiler.table().split('\n') == [
+        '1 stories',
+        'Phase      Time (ms)  Blocks  Nodes',
+        'semantics     500.00     +10       ',
+        'folding       250.00             12',
+    ]
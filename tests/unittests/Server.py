@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from pytest import fixture, raises
+
+from storyscript.Api import Api
+from storyscript.App import App
+from storyscript.CompileCache import CompileCache
+from storyscript.Server import Server
+from storyscript.exceptions import BundleError, StoryError
+from storyscript.parser import ParserCache
+
+
+@fixture
+def server(tmpdir):
+    server = Server(path=str(tmpdir.join('s.sock')))
+    yield server
+    server.server_close()
+
+
+def request(method, **params):
+    return json.dumps({'id': 1, 'method': method, 'params': params})
+
+
+def test_server_init(server, tmpdir):
+    assert server.server_address == str(tmpdir.join('s.sock'))
+
+
+def test_server_init_stale_socket(tmpdir):
+    """
+    Ensures a socket left over by a server is replaced
+    """
+    path = tmpdir.join('s.sock')
+    path.write('')
+    server = Server(path=str(path))
+    server.server_close()
+
+
+def test_server_init_directory(tmpdir):
+    """
+    Ensures the directory of the socket is created
+    """
+    path = tmpdir.join('cache', 'dir', 's.sock')
+    server = Server(path=str(path))
+    server.server_close()
+    assert tmpdir.join('cache', 'dir').isdir()
+
+
+def test_server_init_running(server):
+    """
+    Ensures the socket of a running server isn't taken over
+    """
+    with raises(StoryError) as e:
+        Server(path=server.server_address)
+    assert e.value.error.error == 'server_running'
+    assert os.path.exists(server.server_address)
+
+
+def test_server_running(server, tmpdir):
+    assert Server.running(server.server_address) is True
+    assert Server.running(str(tmpdir.join('none.sock'))) is False
+
+
+def test_server_default_path(patch):
+    patch.object(os, 'getenv', return_value='/server.sock')
+    assert Server.default_path() == '/server.sock'
+
+
+def test_server_default_path_cache(patch):
+    patch.object(os, 'getenv', return_value=None)
+    patch.object(ParserCache, 'default_directory', return_value='/cache')
+    assert Server.default_path() == '/cache/server.sock'
+
+
+def test_server_serve(patch, server):
+    patch.many(Server, ['warm_up', 'serve_forever'])
+    server.serve()
+    Server.warm_up.assert_called()
+    assert not os.path.exists(server.server_address)
+
+
+def test_server_respond_loads(server):
+    response = server.respond(request('loads', source='a = 1'))
+    assert response['id'] == 1
+    assert response['errors'] == []
+    assert response['result']['tree']['1']['method'] == 'expression'
+
+
+def test_server_respond_loads_error(server):
+    response = server.respond(request('loads', source='a = ('))
+    assert response['result'] is None
+    assert 'line 1' in response['errors'][0]
+
+
+def test_server_respond_load_map(patch, server):
+    patch.object(Api, 'load_map')
+    Api.load_map().result.return_value = 'result'
+    Api.load_map().errors.return_value = []
+    response = server.respond(request('load_map', files={'a': 'b'},
+                                      features={'globals': True}))
+    Api.load_map.assert_called_with({'a': 'b'}, features={'globals': True},
+                                    all_errors=False)
+    assert response['result'] == 'result'
+
+
+def test_server_respond_bundle_error(patch, magic, server):
+    """
+    Ensures the errors of all stories are returned
+    """
+    errors = [magic(), magic()]
+    patch.object(Api, 'load_map', side_effect=BundleError(errors))
+    response = server.respond(request('load_map', files={}))
+    assert response['errors'] == [errors[0].message(), errors[1].message()]
+
+
+def test_server_respond_unknown_method(server):
+    response = server.respond(request('delete'))
+    assert response['result'] is None
+    assert 'Unknown method delete' in response['errors'][0]
+
+
+def test_server_respond_invalid(server):
+    response = server.respond('{')
+    assert response['id'] is None
+    assert len(response['errors']) == 1
+
+
+def test_server_respond_cwd(patch, server, tmpdir):
+    """
+    Ensures requests are handled in the working directory of the client
+    """
+    cwd = os.getcwd()
+    patch.object(Server, 'lex', side_effect=lambda **params: {
+        'result': os.getcwd(), 'errors': []
+    })
+    response = server.respond(request('lex', cwd=str(tmpdir), path='.'))
+    assert response['result'] == str(tmpdir)
+    assert os.getcwd() == cwd
+
+
+def test_server_compile(patch, server):
+    patch.object(App, 'compile', return_value='json')
+    response = server.compile('/path', features={'globals': True})
+    App.compile.assert_called_with('/path', ignored_path=None, ebnf=None,
+                                   concise=False, first=False,
+                                   features={'globals': True}, jobs=1,
+                                   cache=App.compile.call_args[1]['cache'],
+                                   compact=False, all_errors=False)
+    assert isinstance(App.compile.call_args[1]['cache'], CompileCache)
+    assert response == {'result': 'json', 'errors': [],
+                        'cache': {'hits': 0, 'misses': 0}}
+
+
+def test_server_compile_no_cache(patch, server):
+    patch.object(App, 'compile', return_value='json')
+    response = server.compile('/path', cache=False)
+    assert App.compile.call_args[1]['cache'] is None
+    assert response == {'result': 'json', 'errors': []}
+
+
+def test_server_parse(patch, magic, server):
+    tree = magic()
+    patch.object(App, 'parse', return_value={'one.story': tree})
+    assert server.parse('/path')['result'] == {'one.story': tree.pretty()}
+    assert server.parse('/path', raw=True)['result'] == {
+        'one.story': str(tree)
+    }
+
+
+def test_server_lex(patch, magic, server):
+    token = magic(type='NAME', value='a')
+    patch.object(App, 'lex', return_value={'one.story': [token]})
+    response = server.lex('/path')
+    App.lex.assert_called_with('/path', ebnf=None, features=None)
+    assert response['result'] == {'one.story': [['NAME', 'a']]}
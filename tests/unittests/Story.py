@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 import io
 import os
+import threading
 
 from lark.exceptions import UnexpectedInput, UnexpectedToken
 
 from pytest import fixture, mark, raises
 
-from storyscript.Story import Story
+from storyscript.Profiler import Profile
+from storyscript.Story import Story, _parser
 from storyscript.compiler import Compiler
 from storyscript.compiler.lowering.Lowering import Lowering
 from storyscript.exceptions import CompilerError, StoryError, StorySyntaxError
@@ -34,6 +36,14 @@ def compiler(patch, story):
 def test_story_init(story):
     assert story.story == 'story'
     assert story.path is None
+    assert story._lines is None
+    assert story.profile is None
+
+
+def test_story_lines():
+    story = Story('a\nb', features=None)
+    assert story.lines == ['a', 'b']
+    assert story.lines is story.lines
 
 
 def test_story_init_path():
@@ -46,11 +56,36 @@ def test_story_read(patch):
     Ensures Story.read can read a story
     """
     patch.object(io, 'open')
+    patch.object(os, 'fstat')
+    os.fstat().st_size = 0
     result = Story.read('hello.story')
     io.open.assert_called_with('hello.story', 'r')
     assert result == io.open().__enter__().read()
 
 
+def test_story_read_large(patch):
+    """
+    Ensures large stories are read with mmap
+    """
+    patch.object(io, 'open')
+    patch.object(os, 'fstat')
+    patch.object(Story, 'read_mmap')
+    os.fstat().st_size = Story.mmap_size
+    result = Story.read('hello.story')
+    Story.read_mmap.assert_called_with(io.open().__enter__())
+    assert result == Story.read_mmap()
+
+
+@mark.parametrize('source', ['a = 1\nb = 2\n', 'a = 1\r\nb = 2\rc'])
+def test_story_read_mmap(tmpdir, source):
+    path = tmpdir.join('one.story')
+    path.write_binary(source.encode('utf8'))
+    with io.open(str(path), 'r', encoding='utf8') as file:
+        expected = file.read()
+    with io.open(str(path), 'r', encoding='utf8') as file:
+        assert Story.read_mmap(file) == expected
+
+
 def test_story_read_not_found(patch, capsys):
     patch.object(io, 'open', side_effect=FileNotFoundError)
     patch.object(os, 'path')
@@ -90,6 +125,12 @@ def test_story_parse(patch, story, parser):
     assert story.tree == Parser.parse()
 
 
+def test_story_parse_profile(patch, story, parser):
+    story.profile = Profile()
+    story.parse(parser=parser)
+    assert list(story.profile.phases) == ['parse']
+
+
 def test_story_parse_debug(patch, story, parser):
     story.parse(parser=parser)
     parser.parse.assert_called_with(story.story, allow_single_quotes=False)
@@ -124,12 +165,35 @@ def test_story_parse_error(patch, story, parser, error):
     Story.error.assert_called_with(error)
 
 
+def test_story_syntax_errors(patch, story, parser):
+    patch.object(Parser, 'parse_errors', return_value=['error'])
+    patch.object(Story, 'error')
+    result = story.syntax_errors(parser, error='first')
+    Parser.parse_errors.assert_called_with('story', False, error='first')
+    Story.error.assert_called_with('error')
+    assert result == [Story.error()]
+
+
+def test_story_syntax_errors_parser(patch, story):
+    patch.object(Story, '_parser')
+    story.syntax_errors(None, allow_single_quotes=True)
+    Story._parser().parse_errors.assert_called_with('story', True,
+                                                    error=None)
+
+
 def test_story_compile(patch, story, compiler):
     story.compile()
-    Compiler.compile.assert_called_with(story.tree, story=story, features=None)
+    Compiler.compile.assert_called_with(story.tree, story=story, features=None,
+                                        profile=None)
     assert story.compiled == Compiler.compile()
 
 
+def test_story_compile_profile(patch, story, compiler):
+    story.profile = Profile()
+    story.compile()
+    assert Compiler.compile.call_args[1]['profile'] is story.profile
+
+
 @mark.parametrize('error', [StorySyntaxError('error'), CompilerError('error')])
 def test_story_compiler_error(patch, story, compiler, error):
     """
@@ -173,6 +237,21 @@ def test_story_process(patch, story):
     assert result == story.compiled
 
 
+def test_story_parser_thread():
+    """
+    Ensures every thread gets its own parser, sharing the parse tables
+    """
+    parsers = []
+    thread = threading.Thread(
+        target=lambda: parsers.append(_parser()))
+    thread.start()
+    thread.join()
+    parser = _parser()
+    assert parser is _parser()
+    assert parser is not parsers[0]
+    assert parser.lark.parser.parser is parsers[0].lark.parser.parser
+
+
 def test_story_process_parser(patch, story, parser):
     patch.many(Story, ['parse', 'compile'])
     story.compiled = 'compiled'
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+from pytest import fixture, raises
+
+from storyscript.Bundle import Bundle
+from storyscript.GitIgnore import GitIgnore
+from storyscript.Watcher import Watcher
+
+
+@fixture
+def stories(patch, tmpdir):
+    patch.object(GitIgnore, 'find_root', return_value=None)
+    tmpdir.join('one.story').write('a = 1')
+    with tmpdir.as_cwd():
+        yield tmpdir
+
+
+def write(path, source):
+    """
+    Writes a story with a new modification time
+    """
+    mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, 'w') as f:
+        f.write(source)
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_watcher_init(stories):
+    watcher = Watcher('.')
+    assert isinstance(watcher.ignores, GitIgnore)
+    assert watcher.sources == {}
+
+
+def test_watcher_init_ignored(patch, stories):
+    patch.object(Bundle, 'ignored')
+    watcher = Watcher('.', ignored_path='ignored')
+    Bundle.ignored.assert_called_with('ignored')
+    assert watcher.ignores == Bundle.ignored()
+
+
+def test_watcher_find_stories(stories):
+    assert Watcher('.').find_stories() == ['one.story']
+
+
+def test_watcher_find_stories_file(stories):
+    watcher = Watcher('one.story')
+    assert watcher.ignores is None
+    assert watcher.find_stories() == ['one.story']
+
+
+def test_watcher_poll(stories):
+    watcher = Watcher('.')
+    assert watcher.poll() == ['one.story']
+    assert watcher.sources == {'one.story': 'a = 1'}
+    assert watcher.poll() == []
+
+
+def test_watcher_poll_changed(stories):
+    watcher = Watcher('.')
+    watcher.poll()
+    write('one.story', 'a = 2')
+    write('two.story', 'b = 1')
+    assert sorted(watcher.poll()) == ['one.story', 'two.story']
+    assert watcher.sources['one.story'] == 'a = 2'
+
+
+def test_watcher_poll_touched(stories):
+    """
+    Ensures stories which were only touched aren't reported
+    """
+    watcher = Watcher('.')
+    watcher.poll()
+    write('one.story', 'a = 1')
+    assert watcher.poll() == []
+
+
+def test_watcher_poll_unchanged_stat(patch, stories):
+    """
+    Ensures stories are only read when their stat changed
+    """
+    watcher = Watcher('.')
+    watcher.poll()
+    patch.object(Watcher, 'find_stories', return_value=['one.story'])
+    patch.object(os, 'stat', return_value=os.stat('one.story'))
+    with open('one.story', 'w') as f:
+        f.write('a = 2')
+    assert watcher.poll() == []
+
+
+def test_watcher_poll_removed(stories):
+    watcher = Watcher('.')
+    watcher.poll()
+    os.remove('one.story')
+    assert watcher.poll() == []
+    assert watcher.sources == {}
+    write('one.story', 'a = 1')
+    assert watcher.poll() == ['one.story']
+
+
+def test_watcher_watch(patch, stories):
+    patch.object(time, 'sleep', side_effect=[None, KeyboardInterrupt()])
+    watcher = Watcher('.', interval=0.5)
+    changes = watcher.watch()
+    assert next(changes) == ['one.story']
+    with raises(KeyboardInterrupt):
+        next(changes)
+    time.sleep.assert_called_with(0.5)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
-
+from storyscript.Profiler import Profile
 from storyscript.compiler import Compiler
+from storyscript.compiler.folding import ConstantFolder
 from storyscript.compiler.json import JSONCompiler
 from storyscript.compiler.lowering import Lowering
 from storyscript.compiler.semantics import Semantics
@@ -14,16 +15,76 @@ def test_compiler_generate(patch, magic):
     tree = magic()
     result = Compiler.generate(tree, features=None)
     Lowering.__init__.assert_called_with(parser=tree.parser, features=None)
-    Lowering.process.assert_called_with(tree)
-    Semantics.process.assert_called_with(Lowering.process())
-    assert result == Semantics.process()
+    Lowering.process.assert_called_with(tree, profiled=False)
+    Semantics.process.assert_called_with(Lowering.process.return_value,
+                                         profile=None)
+    assert result == Semantics.process.return_value
+
+
+def test_compiler_generate_profile(patch, magic):
+    def process(self, tree, profiled):
+        assert profiled
+        self.timings = {'desugar': 1.0}
+        self.blocks = {'desugar': 2}
+        return tree
+
+    patch.object(Lowering, 'process', side_effect=process, autospec=True)
+    patch.object(Semantics, 'process')
+    profile = Profile()
+    Compiler.generate(magic(), features=None, profile=profile)
+    assert list(profile.phases) == ['lowering', 'lowering/desugar',
+                                    'semantics']
+    assert profile.phases['lowering/desugar'] == {'time': 1.0, 'blocks': 2}
+    assert Semantics.process.call_args[1]['profile'] is profile
+
+
+def test_compiler_fold(patch, magic):
+    patch.object(ConstantFolder, 'fold')
+    tree = magic()
+    result = Compiler.fold(tree)
+    ConstantFolder.fold.assert_called_with(tree)
+    assert result == ConstantFolder.fold.return_value
+
+
+def test_compiler_fold_profile(patch, magic):
+    def fold(self, tree):
+        self.folded = 3
+        return tree
+
+    patch.object(ConstantFolder, 'fold', side_effect=fold, autospec=True)
+    profile = Profile()
+    Compiler.fold(magic(), profile=profile)
+    assert list(profile.phases) == ['folding']
+    assert profile.phases['folding']['nodes'] == 3
 
 
 def test_compiler_compile(patch, magic):
-    patch.object(Compiler, 'generate')
+    patch.many(Compiler, ['generate', 'fold'])
     patch.object(JSONCompiler, 'compile')
     tree = magic()
-    result = Compiler.compile(tree, story=None, features=None)
-    Compiler.generate.assert_called_with(tree, None)
-    JSONCompiler.compile.assert_called_with(Compiler.generate())
-    assert result == JSONCompiler.compile()
+    features = magic()
+    result = Compiler.compile(tree, story=None, features=features)
+    Compiler.generate.assert_called_with(tree, features, profile=None)
+    Compiler.fold.assert_called_with(Compiler.generate.return_value,
+                                     profile=None)
+    JSONCompiler.compile.assert_called_with(Compiler.fold.return_value)
+    assert result == JSONCompiler.compile.return_value
+
+
+def test_compiler_compile_no_fold(patch, magic):
+    patch.many(Compiler, ['generate', 'fold'])
+    patch.object(JSONCompiler, 'compile')
+    features = magic(fold=False)
+    Compiler.compile(magic(), story=None, features=features)
+    Compiler.fold.assert_not_called()
+    JSONCompiler.compile.assert_called_with(Compiler.generate.return_value)
+
+
+def test_compiler_compile_profile(patch, magic):
+    patch.object(Compiler, 'generate')
+    patch.object(JSONCompiler, 'compile')
+    patch.object(ConstantFolder, 'fold')
+    profile = Profile()
+    Compiler.compile(magic(), story=None, features=magic(), profile=profile)
+    assert Compiler.generate.call_args[1]['profile'] is profile
+    assert list(profile.phases) == ['folding', 'json']
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from lark.lexer import Token
+
+from pytest import fixture, mark
+
+from storyscript.compiler.folding import ConstantFolder
+from storyscript.compiler.semantics.types.Types import BooleanType, \
+    FloatType, IntType, StringType, TimeType
+from storyscript.parser import Tree
+
+
+@fixture
+def folder():
+    return ConstantFolder()
+
+
+def literal(data, type_, value):
+    token = Token(type_, value, line=1, column=1)
+    token.end_column = 2
+    values = Tree('values', [Tree(data, [token])])
+    return Tree('expression', [Tree('entity', [values])])
+
+
+def test_constantfolder_init(folder):
+    assert folder.folded == 0
+    assert folder.constants == {}
+    assert folder.inlined == {}
+    assert folder.references == {}
+
+
+def test_constantfolder_fold(patch, folder):
+    patch.object(ConstantFolder, 'visit')
+    assert folder.fold('tree') == 'tree'
+    ConstantFolder.visit.assert_called_with('tree')
+
+
+@mark.parametrize('data,type_,value,expected', [
+    ('number', 'INT', '3', (IntType.instance(), 3)),
+    ('number', 'FLOAT', '1.5', (FloatType.instance(), 1.5)),
+    ('string', 'DOUBLE_QUOTED', 'a\\nb', (StringType.instance(), 'a\nb')),
+    ('boolean', 'TRUE', 'true', (BooleanType.instance(), True)),
+    ('time', 'RAW_TIME', '1m', (TimeType.instance(), 60000)),
+])
+def test_constantfolder_constant(folder, data, type_, value, expected):
+    assert folder.constant(literal(data, type_, value)) == expected
+
+
+def test_constantfolder_constant_none(magic, folder):
+    assert folder.constant(Tree('expression', [magic(), magic()])) is None
+    assert folder.constant(literal('list', 'INT', '1')) is None
+
+
+@mark.parametrize('type_,value,expected', [
+    (IntType, 2 ** 63 - 1, True),
+    (IntType, 2 ** 63, False),
+    (IntType, -2 ** 63 - 1, False),
+    (FloatType, 1.5, True),
+    (FloatType, float('inf'), False),
+    (TimeType, 0, True),
+    (TimeType, -1, False),
+    (StringType, 'a', True),
+])
+def test_constantfolder_valid(type_, value, expected):
+    assert ConstantFolder.valid(type_.instance(), value) is expected
+
+
+@mark.parametrize('type_,value', [
+    (IntType, 3),
+    (FloatType, 0.5),
+    (StringType, 'a\nb"'),
+    (BooleanType, False),
+    (TimeType, 61000),
+])
+def test_constantfolder_values(folder, type_, value):
+    tree = literal('number', 'INT', '1')
+    values = ConstantFolder.values(tree, type_.instance(), value)
+    expression = Tree('expression', [Tree('entity', [values])])
+    assert folder.constant(expression) == (type_.instance(), value)
+
+
+@mark.parametrize('op,values,expected', [
+    ('MULTIPLIER', ['60', '60', '24'], 86400),
+    ('PLUS', ['1', '2'], 3),
+    ('DASH', ['1', '2'], -1),
+    ('MODULUS', ['5', '3'], 2),
+    ('POWER', ['2', '3'], 8),
+])
+def test_constantfolder_nary_expression(folder, op, values, expected):
+    operands = [literal('number', 'INT', v) for v in values]
+    tree = Tree('expression', [])
+    operator = Tree('arith_operator', [Token(op, '')])
+    folder.nary_expression(tree, operator, operator.children[0], operands)
+    assert tree.kind == 'primary_expression'
+    assert folder.constant(tree) == (IntType.instance(), expected)
+    assert folder.folded == len(values) - 1
+
+
+@mark.parametrize('op,values', [
+    ('BSLASH', ['1', '2']),
+    ('MODULUS', ['-5', '3']),
+    ('MODULUS', ['5', '0']),
+    ('POWER', ['2', '64']),
+    ('POWER', ['2', '-1']),
+    ('PLUS', ['9223372036854775807', '1']),
+])
+def test_constantfolder_nary_expression_runtime(folder, op, values):
+    operands = [literal('number', 'INT', v) for v in values]
+    tree = Tree('expression', [])
+    operator = Tree('arith_operator', [Token(op, '')])
+    folder.nary_expression(tree, operator, operator.children[0], operands)
+    assert tree.children == []
+    assert folder.folded == 0
+
+
+def test_constantfolder_concatenation(magic, folder):
+    operands = [literal('string', 'DOUBLE_QUOTED', 'a'),
+                literal('string', 'DOUBLE_QUOTED', 'b'),
+                magic(),
+                literal('string', 'DOUBLE_QUOTED', 'c')]
+    constants = [folder.constant(o) for o in operands]
+    tree = Tree('expression', [])
+    operator = Tree('arith_operator', [Token('PLUS', '+')])
+    folder.concatenation(tree, operator, operands, constants)
+    assert folder.constant(tree.children[0]) == (StringType.instance(), 'ab')
+    assert tree.children[1:] == [operator, operands[2], operands[3]]
+    assert folder.folded == 1
@@ -55,14 +55,25 @@ def test_lines_set_next(patch, lines):
 
 @mark.parametrize('method', ['if', 'elif', 'try', 'catch'])
 def test_lines_set_exit(patch, lines, method):
+    lines.make(method, '1')
+    lines.make(method, '2')
+    lines.make('method', '3')
     lines.finished_scopes = ['1']
-    lines.lines = {'1': {}, '2': {'method': method}}
-    lines._lines = ['1', '2']
-    lines.set_exit('3')
-    assert lines.lines['2']['exit'] == '3'
+    lines.set_exit('4')
+    assert lines.lines['1']['exit'] is None
+    assert lines.lines['2']['exit'] == '4'
+    assert lines.lines['3']['exit'] is None
     assert lines.finished_scopes == []
 
 
+def test_lines_set_exit_none(lines):
+    lines.make('method', '1')
+    lines.finished_scopes = ['1']
+    lines.set_exit('2')
+    assert lines.lines['1']['exit'] is None
+    assert lines.finished_scopes == ['1']
+
+
 def test_lines_set_scope(patch, lines):
     lines.set_scope('2', '1')
     assert lines.output_scopes['2'] == {'parent': '1', 'output': []}
@@ -73,6 +84,14 @@ def test_lines_set_scope_output(lines):
     assert lines.output_scopes['2']['output'] == ['x']
 
 
+def test_lines_set_scope_again(lines):
+    lines.set_scope('1', None, output=['x'])
+    lines.set_scope('2', '1')
+    assert lines.scope_outputs('2') == {'x'}
+    lines.set_scope('1', None, output=['y'])
+    assert lines.scope_outputs('2') == {'y'}
+
+
 def test_lines_finish_scope(lines):
     lines.finish_scope('1')
     assert lines.finished_scopes == ['1']
@@ -97,6 +116,24 @@ def test_lines_is_output_false(lines):
     assert lines.is_output('1', 'service') is False
 
 
+def test_lines_scope_outputs(lines):
+    lines.set_scope('1', None, output=['a'])
+    lines.set_scope('2', '1')
+    lines.set_scope('3', '2', output=['b', 'c'])
+    assert lines.scope_outputs('3') == {'a', 'b', 'c'}
+    assert lines.scope_outputs('2') == {'a'}
+    assert lines.scope_outputs('2') is lines.scope_outputs('1')
+    assert lines.scope_outputs('4') == set()
+
+
+def test_lines_scope_outputs_cached(lines):
+    lines.set_scope('1', None, output=['a'])
+    lines.set_scope('2', '1', output=['b'])
+    outputs = lines.scope_outputs('2')
+    lines.output_scopes = {}
+    assert lines.scope_outputs('2') is outputs
+
+
 def test_lines_make(lines):
     expected = {'1': {'method': 'method', 'ln': '1', 'output': None,
                       'name': None,
@@ -221,8 +258,22 @@ def test_lines_is_variable_defined(patch, lines):
     """
     Ensures that the check for previously seen variables works
     """
-    lines.variables = [['one', 'two'], ['three']]
+    patch.object(Lines, 'last', return_value={})
+    lines.set_name(['one', 'two'])
+    lines.set_name(['three'])
+    assert lines.variables == [['one', 'two'], ['three']]
     assert lines.is_variable_defined('one')
     assert lines.is_variable_defined('two')
     assert lines.is_variable_defined('three')
     assert not lines.is_variable_defined('four')
+
+
+def test_lines_is_variable_defined_objects(patch, lines):
+    """
+    Ensures that names which can't be hashed are found as well
+    """
+    patch.object(Lines, 'last', return_value={})
+    lines.set_name(['one', {'$OBJECT': 'dot', 'dot': 'two'}])
+    assert lines.is_variable_defined({'$OBJECT': 'dot', 'dot': 'two'})
+    assert not lines.is_variable_defined({'$OBJECT': 'dot', 'dot': 'one'})
+    assert not lines.is_variable_defined(['one'])
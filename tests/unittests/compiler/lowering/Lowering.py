@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 from unittest import mock
 
-from pytest import fixture
+from lark.lexer import Token
+
+from pytest import fixture, raises
 
 from storyscript.compiler.lowering import FakeTree, Lowering
+from storyscript.compiler.lowering.PassManager import Scope
+from storyscript.exceptions import CompilerError
 from storyscript.parser import Tree
 
 
@@ -444,3 +448,97 @@ def test_objects_flatten_template_escapes_uni3(patch, tree):
     assert result == [
         flatten_to_string(r'\N{LATIN CAPITAL LETTER A}'),
     ]
+
+
+def test_preprocessor_parse_template(magic, preprocessor):
+    preprocessor.parser = magic()
+    result = preprocessor.parse_template('node', 'code', 5)
+    preprocessor.parser.parse_template.assert_called_with('code', 6)
+    assert result == preprocessor.parser.parse_template()
+
+
+def test_preprocessor_parse_template_story(patch, magic, preprocessor):
+    """
+    Ensures templates which can't be parsed separately are parsed as stories
+    """
+    patch.object(Lowering, 'parse_template_story')
+    preprocessor.parser = magic()
+    preprocessor.parser.parse_template.side_effect = CompilerError(None)
+    result = preprocessor.parse_template('node', 'code', 5)
+    Lowering.parse_template_story.assert_called_with('node', 'code', 5)
+    assert result == Lowering.parse_template_story()
+
+
+def test_preprocessor_parse_template_internal_error(patch, magic,
+                                                    preprocessor):
+    """
+    Ensures unexpected errors of the template parser aren't hidden
+    """
+    patch.object(Lowering, 'parse_template_story')
+    preprocessor.parser = magic()
+    preprocessor.parser.parse_template.side_effect = KeyError()
+    with raises(KeyError):
+        preprocessor.parse_template('node', 'code', 5)
+    assert Lowering.parse_template_story.call_count == 0
+
+
+def test_preprocessor_parse_template_unsupported(patch, magic, preprocessor):
+    patch.object(Lowering, 'parse_template_story')
+    preprocessor.parser = magic()
+    preprocessor.parser.parse_template.return_value = None
+    result = preprocessor.parse_template('node', 'code', 5)
+    Lowering.parse_template_story.assert_called_with('node', 'code', 5)
+    assert result == Lowering.parse_template_story()
+
+
+def test_preprocessor_process_timings(patch, magic, preprocessor):
+    patch.object(Lowering, 'visit')
+    preprocessor.process(magic())
+    assert list(preprocessor.timings) == [
+        'concise_when', 'cmp_expr', 'as_expr', 'arguments', 'traversal',
+        'assignment', 'string_templates', 'function_dot', 'dot_expression',
+        'inline_expressions'
+    ]
+
+
+def test_preprocessor_lower_as_expr(patch, preprocessor):
+    """
+    Ensures outputs are moved to the enclosing service and comparisons in
+    the operand are rewritten first
+    """
+    operand = Tree('expression', [Tree('entity', [])])
+    as_op = Tree('as_operator', [Tree('output_names', ['x'])])
+    node = Tree('expression', [operand, as_op])
+    node.kind = 'as_expression'
+    output = Tree('service_fragment', [])
+    patch.object(Lowering, 'lower_cmp_expr')
+    preprocessor.lower_as_expr(node, None, Scope(output=output))
+    Lowering.lower_cmp_expr.assert_called_with(operand, node, mock.ANY)
+    assert output.children == [Tree('output', ['x'])]
+    assert node.children == [operand.entity]
+
+
+def test_preprocessor_lower_as_expr_no_output(preprocessor):
+    name = Token('NAME', 'x', line=1)
+    as_op = Tree('as_operator', [Tree('output_names', [name])])
+    node = Tree('expression', [Tree('expression', [Tree('a', [])]), as_op])
+    node.kind = 'as_expression'
+    with raises(CompilerError) as e:
+        preprocessor.lower_as_expr(node, None, Scope())
+    assert e.value.error == 'service_no_inline_output'
+
+
+def test_preprocessor_lower_dot_expression(patch, magic, preprocessor):
+    dot_expr = Tree('dot_expression', [Token('NAME', 'name'),
+                                       Tree('arguments', [])])
+    parent = Tree('expression', [Tree('expression', ['a']), dot_expr])
+    parent.line = lambda: '1'
+    block = magic()
+    preprocessor.lower_dot_expression(dot_expr, parent, Scope(block=block))
+    block.add_assignment.assert_called_with(Tree('mutation', [
+        Tree('expression', ['a']),
+        Tree('mutation_fragment', [Token('NAME', 'name'),
+                                   Tree('arguments', [])]),
+    ]), original_line='1')
+    path = block.add_assignment()
+    assert parent.children == [Tree('entity', [path])]
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+from lark.lexer import Token
+
+from pytest import fixture
+
+from storyscript.compiler.lowering import Pass, PassManager
+from storyscript.compiler.lowering.PassManager import Scope
+from storyscript.parser import Tree
+
+
+@fixture
+def manager():
+    return PassManager()
+
+
+@fixture
+def tree():
+    inner = Tree('inner', [Token('NAME', 'a')])
+    return Tree('outer', [Tree('middle', [inner]), Tree('inner', [])])
+
+
+def test_pass():
+    rules = Pass('name', enter={'a': 'rule'})
+    assert rules.name == 'name'
+    assert rules.enter == {'a': 'rule'}
+    assert rules.leave == {}
+
+
+def test_scope():
+    scope = Scope(a=1)
+    assert scope.a == 1
+    assert scope.b is None
+
+
+def test_scope_update():
+    scope = Scope(a=1, b=2)
+    new = scope.update(b=3)
+    assert (new.a, new.b) == (1, 3)
+    assert scope.b == 2
+
+
+def test_pass_manager_init(manager):
+    assert manager.profiled is False
+    assert PassManager(profiled=True).profiled is True
+
+
+def test_pass_manager_add(manager, magic):
+    run = magic()
+    manager.add('pass', run)
+    assert manager.run('tree') == 'tree'
+    run.assert_called_with('tree')
+    assert manager.timings == {'pass': 0.0}
+    assert manager.blocks == {}
+
+
+def test_pass_manager_add_profiled(magic):
+    manager = PassManager(profiled=True)
+    run = magic()
+    manager.add('pass', run)
+    assert manager.run('tree') == 'tree'
+    run.assert_called_with('tree')
+    assert manager.timings['pass'] >= 0
+    assert isinstance(manager.blocks['pass'], int)
+
+
+def test_pass_manager_apply_rules(magic):
+    scope = Scope()
+    rules = [('one', magic(return_value=None)), ('two', magic())]
+    result = PassManager.apply_rules(rules, 'node', 'parent', scope)
+    rules[0][1].assert_called_with('node', 'parent', scope)
+    rules[1][1].assert_called_with('node', 'parent', scope)
+    assert result == rules[1][1]()
+
+
+def test_pass_manager_fuse(patch, manager, tree):
+    """
+    Ensures unprofiled traversals don't time their rules
+    """
+    patch.object(PassManager, 'apply')
+    manager.fuse(Pass('pass', enter={'inner': lambda *args: None}))
+    manager.run(tree)
+    assert PassManager.apply.call_count == 0
+    assert manager.timings == {'pass': 0.0, 'traversal': 0.0}
+
+
+def test_pass_manager_order(manager, tree):
+    """
+    Ensures enter rules are applied before and leave rules after the
+    children of a node
+    """
+    visited = []
+
+    def rule(name):
+        return lambda node, parent, scope: visited.append((name, node.data))
+
+    manager.fuse(
+        Pass('one', enter={'outer': rule('one'), 'inner': rule('one')}),
+        Pass('two', enter={'inner': rule('two')},
+             leave={'middle': rule('two')}),
+    )
+    manager.run(tree)
+    assert visited == [('one', 'outer'), ('one', 'inner'), ('two', 'inner'),
+                       ('two', 'middle')]
+    assert list(manager.timings) == ['one', 'two', 'traversal']
+
+
+def test_pass_manager_parent(manager, tree):
+    parents = []
+    manager.fuse(Pass('pass', enter={
+        'inner': lambda node, parent, scope: parents.append(parent),
+    }))
+    manager.run(tree)
+    assert parents == [tree.middle]
+
+
+def test_pass_manager_scope(manager, tree):
+    scopes = []
+    manager.fuse(Pass('pass', enter={
+        'middle': lambda node, parent, scope: scope.update(middle=node),
+        'inner': lambda node, parent, scope: scopes.append(scope.middle),
+    }))
+    manager.run(tree)
+    assert scopes == [tree.middle]
+
+
+def test_pass_manager_modified(manager):
+    """
+    Ensures children replaced by an enter rule are visited
+    """
+    new = Tree('new', [Token('NAME', 'a')])
+    tree = Tree('outer', [Tree('old', [Token('NAME', 'a')])])
+    visited = []
+
+    def replace(node, parent, scope):
+        node.children = [new]
+
+    manager.fuse(Pass('pass', enter={
+        'outer': replace,
+        'old': lambda node, parent, scope: visited.append(node),
+        'new': lambda node, parent, scope: visited.append(node),
+    }))
+    manager.run(tree)
+    assert visited == [new]
+
+
+def test_pass_manager_profiled(tree):
+    manager = PassManager(profiled=True)
+    manager.fuse(Pass('pass', enter={'inner': lambda *args: None}))
+    manager.run(tree)
+    assert list(manager.timings) == ['pass', 'traversal']
+    assert manager.timings['pass'] > 0
+    assert list(manager.blocks) == ['traversal']
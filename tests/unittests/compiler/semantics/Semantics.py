@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from storyscript.Profiler import Profile
+from storyscript.compiler.semantics import Semantics
+
+
+def test_semantics_process(patch, magic):
+    visitor = magic(__name__='Resolver')
+    patch.object(Semantics, 'visitors', [visitor])
+    tree = magic()
+    assert Semantics(features=None).process(tree) == tree
+    visitor.return_value.visit.assert_called_with(tree)
+
+
+def test_semantics_process_profile(patch, magic):
+    visitor = magic(__name__='Resolver')
+    patch.object(Semantics, 'visitors', [visitor])
+    profile = Profile()
+    Semantics(features=None).process(magic(), profile=profile)
+    assert list(profile.phases) == ['semantics/Resolver']
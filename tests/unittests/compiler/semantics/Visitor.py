@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from lark.lexer import Token
 
-from storyscript.compiler.semantics.Visitors import SelectiveVisitor
+from storyscript.compiler.semantics.Visitors import ScopeSelectiveVisitor, \
+    SelectiveVisitor
 from storyscript.parser import Tree
 
 
@@ -26,3 +27,34 @@ def test_a_selective_visitor():
     visitor = TestVisitor()
     visitor.visit(tree)
     assert visitor._node == 2
+
+
+def test_selective_visitor_handlers():
+    """
+    Ensures the dispatch tables are built for every visitor class
+    """
+    class TestVisitor(ScopeSelectiveVisitor):
+        def node(self, tree, scope):
+            return scope
+
+        def _private(self, tree, scope):
+            pass
+
+        @staticmethod
+        def static(tree, scope):
+            pass
+
+    class SubVisitor(TestVisitor):
+        def other(self, tree, scope):
+            return 'other'
+
+    assert TestVisitor.handlers['node'] is TestVisitor.node
+    assert '_private' not in TestVisitor.handlers
+    assert 'static' not in TestVisitor.handlers
+    assert 'other' not in TestVisitor.handlers
+    assert SubVisitor.handlers['node'] is TestVisitor.node
+    visitor = SubVisitor(function_table=None, mutation_table=None,
+                         features=None)
+    assert visitor.visit(Tree('node', []), scope='scope') == 'scope'
+    assert visitor.visit(Tree('other', [])) == 'other'
+    assert visitor.visit(Tree('unknown', [])) is None
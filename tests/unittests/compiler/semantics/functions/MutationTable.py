@@ -0,0 +1,68 @@
+from storyscript.compiler.semantics.functions.MutationBuilder import \
+    mutation_builder
+from storyscript.compiler.semantics.functions.MutationTable import \
+    MutationTable
+from storyscript.compiler.semantics.types.Types import AnyType, IntType, \
+    StringType
+
+
+def table(*mutations):
+    mt = MutationTable()
+    for m in mutations:
+        mt.insert(mutation_builder(m))
+    return mt
+
+
+def test_mutation_table_resolve():
+    mt = table('string length -> int', 'string split by:string -> string')
+    overloads = mt.resolve(StringType.instance(), 'split')
+    assert overloads.name() == 'split'
+    assert overloads.type() == StringType.instance()
+    assert overloads.match(['by'])[0].name() == 'split'
+    assert overloads.match(['other']) is None
+
+
+def test_mutation_table_resolve_missing():
+    mt = table('string length -> int')
+    assert mt.resolve(StringType.instance(), 'split') is None
+    assert mt.resolve(IntType.instance(), 'length') is None
+    assert mt.resolve(AnyType.instance(), 'split') is None
+
+
+def test_mutation_table_resolve_any():
+    mt = table('string length -> int', 'int length -> int')
+    overloads = mt.resolve(AnyType.instance(), 'length')
+    assert overloads.type() == AnyType.instance()
+    assert len(overloads.match([])) == 2
+
+
+def test_mutation_table_resolve_memoized():
+    mt = table('string substring start:int -> string',
+               'string substring end:int -> string')
+    first = mt.resolve(StringType.instance(), 'substring')
+    second = mt.resolve(StringType.instance(), 'substring')
+    assert first is not second
+    assert first.all() is second.all()
+    assert mt.resolve(AnyType.instance(), 'substring') is \
+        mt.resolve(AnyType.instance(), 'substring')
+
+
+def test_mutation_table_insert_invalidates():
+    mt = table('string length -> int')
+    assert mt.resolve(StringType.instance(), 'trim') is None
+    mt.insert(mutation_builder('string trim -> string'))
+    assert mt.resolve(StringType.instance(), 'trim').single().name() == 'trim'
+
+
+def test_mutation_table_all_sorted():
+    mt = table('string substring start:int -> string',
+               'string substring end:int -> string')
+    overloads = mt.resolve(StringType.instance(), 'substring').all()
+    assert [m.cmp_name() for m in overloads] == ['substringend',
+                                                 'substringstart']
+
+
+def test_mutation_table_init_shared():
+    mt = MutationTable.init()
+    assert MutationTable.init() is mt
+    assert mt.resolve(StringType.instance(), 'length') is not None
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
-from storyscript.compiler.semantics.symbols.Scope import Scope
-from storyscript.compiler.semantics.symbols.Symbols import Symbols
+from storyscript.compiler.semantics.symbols.Scope import Scope, ScopeJoiner
+from storyscript.compiler.semantics.symbols.Symbols import Symbol, Symbols
+from storyscript.compiler.semantics.types.Types import IntType
 
 
 def test_scope_pretty_none(patch):
@@ -13,7 +14,8 @@ Symbols:
 
 
 def test_scope_pretty(patch, magic):
-    root_scope = '.parent.'
+    root_scope = magic()
+    root_scope.__str__.return_value = '.parent.'
     scope = Scope(parent=root_scope)
     patch.object(Symbols, 'pretty', return_value='.symbols.')
     assert scope.pretty() == """Parent: .parent.
@@ -22,20 +24,64 @@ Symbols:
     Symbols.pretty.assert_called_with(indent='\t')
 
 
-def test_scope_resolve_fail(patch, magic):
-    patch.object(Symbols, 'resolve', return_value=False)
-    patch.object(Scope, 'scopes', return_value=[Scope(), Scope()])
-    scope = Scope()
-    assert scope.resolve('.p.') is None
-    Symbols.resolve.call_count == 2
+def test_scope_resolve_fail():
+    scope = Scope(parent=Scope())
+    assert scope.resolve('a') is None
+    assert scope._resolved == {'a': None}
+    assert scope.parent()._resolved == {'a': None}
 
 
-def test_scope_resolve_sucess(patch, magic):
-    patch.object(Symbols, 'resolve', return_value=True)
-    patch.object(Scope, 'scopes', return_value=[Scope(), Scope()])
-    scope = Scope()
-    assert scope.resolve('.p.') == Symbols.resolve()
-    Symbols.resolve.call_count == 1
+def test_scope_resolve_sucess():
+    root = Scope()
+    a = Symbol('a', IntType.instance())
+    root.insert(a)
+    scope = Scope(parent=Scope(parent=root))
+    assert scope.resolve('a') is a
+    assert scope.parent()._resolved == {'a': a}
+
+
+def test_scope_resolve_cached(patch):
+    root = Scope()
+    root.insert(Symbol('a', IntType.instance()))
+    scope = Scope(parent=root)
+    scope.resolve('a')
+    patch.object(Symbols, 'resolve')
+    assert scope.resolve('a') is root.symbols()._symbols['a']
+    assert Symbols.resolve.call_count == 0
+
+
+def test_scope_resolve_shadowed():
+    root = Scope()
+    scope = Scope(parent=root)
+    assert scope.resolve('a') is None
+    a = Symbol('a', IntType.instance())
+    scope.insert(a)
+    assert scope.resolve('a') is a
+    assert root.resolve('a') is None
+
+
+def test_scope_resolve_parent_insert():
+    """
+    Ensures symbols inserted into a parent scope are resolved by the scopes
+    which cached them as missing
+    """
+    root = Scope()
+    scope = Scope(parent=Scope(parent=root))
+    assert scope.resolve('a') is None
+    a = Symbol('a', IntType.instance())
+    root.insert(a)
+    assert scope.resolve('a') is a
+
+
+def test_scope_insert_generation():
+    root = Scope()
+    root.insert(Symbol('a', IntType.instance()))
+    assert root._generation == [0]
+    scope = Scope(parent=root)
+    scope.insert(Symbol('b', IntType.instance()))
+    assert root._generation == [0]
+    root.insert(Symbol('c', IntType.instance()))
+    assert scope._generation == [1]
 
 
 def test_scope_scopes_single():
@@ -54,3 +100,30 @@ def test_scope_scopes_multiple():
     assert r[0] is s3
     assert r[1] is s2
     assert r[2] is s1
+
+
+def test_scope_joiner():
+    scopes = []
+    for names in ('abc', 'cab', 'bcd'):
+        scope = Scope()
+        for name in names:
+            scope.insert(Symbol(name, IntType.instance()))
+        scopes.append(scope)
+    joiner = ScopeJoiner()
+    for scope in scopes:
+        joiner.add(scope)
+    target = Scope()
+    joiner.insert_to(target)
+    assert list(target.symbols()._symbols) == ['b', 'c']
+    assert target.resolve('b') is scopes[0].resolve('b')
+    assert list(scopes[0].symbols()._symbols) == ['a', 'b', 'c']
+
+
+def test_scope_joiner_single():
+    scope = Scope()
+    scope.insert(Symbol('a', IntType.instance()))
+    joiner = ScopeJoiner()
+    joiner.add(scope)
+    target = Scope()
+    joiner.insert_to(target)
+    assert target.resolve('a') is scope.resolve('a')
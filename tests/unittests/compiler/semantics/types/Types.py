@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
+import copy
+import pickle
+
 from lark.lexer import Token
 
 from pytest import mark, raises
 
 from storyscript.compiler.semantics.types.Types import AnyType, \
     BaseType, BooleanType, FloatType, IntType, ListType, MapType, \
-    NoneType, RegExpType, StringType, singleton
+    NoneType, RegExpType, StringType, binary_op, memoize, singleton
 
 
 def test_singleton():
@@ -64,3 +67,49 @@ def test_none_explicit_from():
 def test_base_type_not_implemented():
     with raises(NotImplementedError):
         BaseType().op(None)
+
+
+def test_memoize():
+    calls = []
+
+    def fn(a, b):
+        calls.append((a, b))
+        return None
+    memoized = memoize(fn)
+    assert memoized(1, 2) is None
+    assert memoized(1, 2) is None
+    assert calls == [(1, 2)]
+
+
+def test_types_interned():
+    assert IntType() is IntType.instance()
+    nested = MapType(StringType.instance(), ListType(IntType.instance()))
+    assert nested is MapType(StringType(), ListType(IntType()))
+    assert nested != MapType(StringType(), ListType(FloatType()))
+    assert {nested: 1}[MapType(StringType(), ListType(IntType()))] == 1
+
+
+def test_types_interned_pickle():
+    nested = ListType(MapType(IntType.instance(), AnyType.instance()))
+    assert pickle.loads(pickle.dumps(nested)) is nested
+    assert copy.deepcopy(nested) is nested
+
+
+def test_binary_op_op_type():
+    """
+    Ensures binary operations are cached by the type of the operator
+    """
+    int_ = IntType.instance()
+    float_ = FloatType.instance()
+    assert binary_op(Token('PLUS', '+'), int_, float_) is float_
+    assert binary_op(Token('PLUS', '-'), int_, float_) is float_
+    string = StringType.instance()
+    assert binary_op(Token('PLUS', '+'), string, int_) is string
+    assert binary_op(Token('DASH', '+'), string, int_) is None
+
+
+def test_list_implicit_to():
+    int_list = ListType(IntType.instance())
+    float_list = ListType(FloatType.instance())
+    assert int_list.implicit_to(float_list) is float_list
+    assert float_list.implicit_to(int_list) is None
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import click
+
+from storyscript.exceptions import BundleError
+
+
+def test_bundleerror(magic):
+    errors = [magic(), magic()]
+    error = BundleError(errors)
+    assert error.errors == errors
+    assert error.messages() == [errors[0].message(), errors[1].message()]
+
+
+def test_bundleerror_error(magic):
+    errors = [magic(), magic()]
+    assert BundleError(errors).error == errors[0].error
+
+
+def test_bundleerror_echo(patch, magic):
+    patch.object(click, 'echo')
+    errors = [magic(), magic()]
+    errors[0].message.return_value = 'one'
+    errors[1].message.return_value = 'two'
+    BundleError(errors).echo()
+    click.echo.assert_called_with('one\n\ntwo')
@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 import io
+from collections import OrderedDict
+from functools import partial
 
 from lark import Lark
+from lark.exceptions import UnexpectedInput
+from lark.lexer import Token
+from lark.parse_tree_builder import ExpandSingleChild
+from lark.parsers.lalr_parser import _Parser as LalrParser
 
-from pytest import fixture
+from pytest import fixture, mark, raises
 
-from storyscript.parser import (CustomIndenter, Grammar, Parser, Transformer,
-                                Tree)
+from storyscript.exceptions import CompilerError, StorySyntaxError
+from storyscript.parser import (CustomIndenter, Grammar, Parser, ParserCache,
+                                Transformer, Tree)
 
 
 @fixture
@@ -15,7 +22,11 @@ def parser(magic, patch):
     parser = Parser()
     parser.algo = 'lalr'
     parser.ebnf = None
+    parser.cache = magic()
     parser.lark = magic()
+    parser.parsers = {}
+    parser.templates = OrderedDict()
+    parser.keywords = frozenset()
     return parser
 
 
@@ -24,6 +35,16 @@ def test_parser_init(patch):
     parser = Parser()
     assert parser.algo == 'lalr'
     assert parser.ebnf is None
+    assert parser.parsers == {}
+    assert parser.templates == {}
+    assert parser.keywords == frozenset()
+
+
+def test_parser_keywords():
+    keywords = Parser().keywords
+    assert 'break' in keywords
+    assert 'then' in keywords
+    assert 'NAME' not in keywords
 
 
 def test_parser_init_algo(patch):
@@ -38,6 +59,12 @@ def test_parser_init_ebnf(patch):
     assert parser.ebnf == 'grammar.ebnf'
 
 
+def test_parser_init_cache(patch):
+    patch.object(Parser, '_lark')
+    assert isinstance(Parser().cache, ParserCache)
+    assert Parser(cache='cache').cache == 'cache'
+
+
 def test_parser_indenter(patch):
     patch.init(CustomIndenter)
     assert isinstance(Parser.indenter(), CustomIndenter)
@@ -67,21 +94,116 @@ def test_parser_grammar_ebnf(patch, parser):
 
 def test_parser_lark(patch, parser):
     """
-    Ensures Parser.lark can produce the correct Lark instance.
+    Ensures Parser.lark loads the Lark instance from the cache.
     """
-    patch.init(Lark)
-    patch.many(Parser, ['indenter', 'grammar'])
+    patch.many(Parser, ['grammar', '_build_lark'])
     result = parser._lark()
+    args = parser.cache.get.call_args[0]
+    assert args[:2] == (parser.grammar(), parser.algo)
+    args[2]()
+    Parser._build_lark.assert_called_with(parser.grammar())
+    assert result == parser.cache.get()
+
+
+def test_parser_build_lark(patch, parser):
+    """
+    Ensures Parser._build_lark can produce the correct Lark instance.
+    """
+    patch.init(Lark)
+    patch.many(Parser, ['indenter'])
+    result = parser._build_lark('grammar')
     kwargs = {'parser': parser.algo, 'postlex': Parser.indenter()}
-    Lark.__init__.assert_called_with(parser.grammar(), **kwargs)
+    Lark.__init__.assert_called_with('grammar', **kwargs)
     assert isinstance(result, Lark)
 
 
-def test_parser_parse(patch, parser):
+def test_parser_copy():
+    parser = Parser()
+    copy = parser.copy()
+    assert copy.lark.parser.parser is parser.lark.parser.parser
+    assert copy.lark.parser.lexer.lexers is parser.lark.parser.lexer.lexers
+    assert copy.lark.parser.lexer is not parser.lark.parser.lexer
+    postlex = copy.lark.options.postlex
+    assert isinstance(postlex, CustomIndenter)
+    assert postlex is not parser.lark.options.postlex
+    assert copy.lark.lexer_conf.postlex is postlex
+    assert copy.lark.parser.lexer_conf.postlex is postlex
+    assert copy.parsers == {}
+    assert copy.templates == {}
+    assert copy.parse('a = 1', False) == parser.parse('a = 1', False)
+
+
+def test_parser_transform_callback(magic):
+    transformer = magic()
+    callback = Parser.transform_callback(partial(Tree, 'rule'), transformer)
+    assert callback.func == transformer.reduce
+    assert callback.args == ('rule',)
+
+
+def test_parser_transform_callback_wrapped(magic):
+    """
+    Ensures wrappers of lark's tree building callbacks are preserved
+    """
+    transformer = Transformer()
+    original = ExpandSingleChild(partial(Tree, 'rule'))
+    callback = Parser.transform_callback(original, transformer)
+    assert isinstance(callback, ExpandSingleChild)
+    assert original.node_builder.func == Tree
+    assert callback.node_builder.func == transformer.reduce
+    assert callback(['a', 'b']) == Tree('rule', ['a', 'b'])
+
+
+def test_parser_fused_parser(patch, parser):
+    patch.many(Parser, ['transformer', 'transform_callback'])
+    patch.init(LalrParser)
+    lalr = parser.lark.parser.parser
+    lalr.parser.callbacks = {'rule': 'callback'}
+    result = parser.fused_parser(True)
+    Parser.transformer.assert_called_with(True)
+    Parser.transform_callback.assert_called_with('callback',
+                                                 Parser.transformer())
+    callbacks = {'rule': Parser.transform_callback()}
+    LalrParser.__init__.assert_called_with(lalr._parse_table, callbacks)
+    assert isinstance(result[0], LalrParser)
+    assert result[1] == Parser.transformer()
+    assert parser.fused_parser(True) == result
+
+
+def test_parser_parse(patch, magic, parser):
     """
     Ensures the build method can build the grammar
     """
+    lalr = magic()
+    transformer = Transformer()
+    patch.object(Parser, 'fused_parser', return_value=(lalr, transformer))
+    result = parser.parse('source', allow_single_quotes=False)
+    Parser.fused_parser.assert_called_with(False)
+    frontend = parser.lark.parser
+    frontend.lex.assert_called_with('source\n')
+    lalr.parse.assert_called_with(frontend.lex(),
+                                  frontend.lexer.set_parser_state)
+    assert result == lalr.parse()
+    assert result.parser == parser
+
+
+def test_parser_parse_error(patch, magic, parser):
+    """
+    Ensures errors of the transformer are raised after parsing
+    """
+    transformer = Transformer()
+    lalr = magic()
+
+    def parse(*args):
+        transformer.error = ValueError('error')
+    lalr.parse.side_effect = parse
+    patch.object(Parser, 'fused_parser', return_value=(lalr, transformer))
+    with raises(ValueError):
+        parser.parse('source', allow_single_quotes=False)
+
+
+def test_parser_parse_earley(patch, parser):
     patch.many(Parser, ['transformer'])
+    parser.algo = 'earley'
     result = parser.parse('source', allow_single_quotes=False)
     parser.lark.parse.assert_called_with('source\n')
     Parser.transformer().transform.assert_called_with(parser.lark.parse())
@@ -95,6 +217,212 @@ def test_parser_parse_empty(patch, parser, magic):
     assert parser.parse('', allow_single_quotes=False) == Tree('empty', [])
 
 
+@mark.parametrize('line, expected', [
+    (3, 3), ('3', 3), ('3.1', 3), (None, None), ('None', None)
+])
+def test_parser_error_line(magic, line, expected):
+    assert Parser.error_line(magic(line=line)) == expected
+
+
+def test_parser_error_line_missing():
+    assert Parser.error_line(Exception()) is None
+
+
+def test_parser_skip_statement():
+    lines = ['if a', '  b', '', '  c', 'else', '  d', 'e']
+    assert Parser.skip_statement(lines, 1) == 6
+    assert lines == ['', '', '', '', '', '', 'e']
+
+
+def test_parser_skip_statement_nested():
+    lines = ['if a', '  b', '  c']
+    assert Parser.skip_statement(lines, 2) == 2
+    assert lines == ['if a', '', '  c']
+
+
+def test_parser_parent_statement():
+    lines = ['if a', '  b', '', '  c']
+    assert Parser.parent_statement(lines, 4) == 1
+    assert Parser.parent_statement(lines, 1) is None
+
+
+def test_parser_statement():
+    lines = ['if a', '  b', 'else if c', '  d', 'else', 'e']
+    assert Parser.statement(lines, 5) == 1
+    assert Parser.statement(lines, 6) == 6
+    assert Parser.statement(['else'], 1) == 1
+
+
+def test_parser_has_block():
+    assert Parser.has_block(['if a', '', '  b'], 1) is True
+    assert Parser.has_block(['if a', '', 'b'], 1) is False
+    assert Parser.has_block(['if a'], 1) is False
+
+
+def test_parser_parse_errors(patch, parser):
+    """
+    Ensures parsing continues after the statement of an error
+    """
+    errors = [UnexpectedInput(), UnexpectedInput(), None]
+    errors[0].line = 1
+    errors[1].line = 3
+
+    def parse(source, allow_single_quotes):
+        error = errors.pop(0)
+        if error is not None:
+            raise error
+
+    patch.object(Parser, 'parse', side_effect=parse)
+    first, second = errors[:2]
+    result = parser.parse_errors('a\nb\nc', False)
+    assert result == [first, second]
+    Parser.parse.assert_called_with('\nb\n', False)
+
+
+def test_parser_parse_errors_error(patch, parser):
+    """
+    Ensures the source isn't parsed again for a known error
+    """
+    error = UnexpectedInput()
+    error.line = 1
+    patch.object(Parser, 'parse')
+    assert parser.parse_errors('a\nb', False, error=error) == [error]
+    Parser.parse.assert_called_once_with('\nb', False)
+
+
+def test_parser_parse_errors_cascade(patch, parser):
+    """
+    Ensures errors caused by skipping a statement aren't reported, but the
+    statement containing it is skipped
+    """
+    first = StorySyntaxError('error')
+    first.line = 2
+    cascade = CompilerError('error')
+    cascade.line = 2
+    patch.object(Parser, 'parse', side_effect=[cascade, None])
+    source = 'if a\n  b c\n  d'
+    result = parser.parse_errors(source, False, error=first)
+    assert result == [first]
+    Parser.parse.assert_called_with('\n\n', False)
+
+
+def test_parser_parse_errors_empty_block(patch, parser):
+    """
+    Ensures a statement whose block would be empty is skipped
+    """
+    error = UnexpectedInput()
+    error.line = 2
+    patch.object(Parser, 'parse')
+    parser.parse_errors('if a\n  b\nc', False, error=error)
+    Parser.parse.assert_called_with('\n\nc', False)
+
+
+def test_parser_parse_errors_no_line(patch, parser):
+    error = UnexpectedInput()
+    error.line = 1
+    unknown = UnexpectedInput()
+    patch.object(Parser, 'parse', side_effect=unknown)
+    assert parser.parse_errors('a', False, error=error) == [error]
+    assert parser.parse_errors('a', False, error=unknown) == [unknown]
+
+
+def test_parser_parse_errors_limit(patch, parser):
+    patch.object(Parser, 'errors_limit', 1)
+    error = UnexpectedInput()
+    error.line = 1
+    patch.object(Parser, 'parse')
+    assert parser.parse_errors('a\nb', False, error=error) == [error]
+    assert Parser.parse.call_count == 0
+
+
+def test_parser_move_tree():
+    token = Token('NAME', 'raw', 1, line=1, column=2)
+    token.value = 'value'
+    token.end_column = 5
+    tree = Tree('outer', [Tree('inner', [token])])
+    tree.kind = 'kind'
+    result = Parser.move_tree(tree, 10)
+    assert result == tree
+    assert result.kind == 'kind'
+    moved = result.inner.child(0)
+    assert moved is not token
+    assert str(moved) == 'raw'
+    assert moved.value == 'value'
+    assert moved.pos_in_stream == 11
+    assert moved.line == 1
+    assert moved.column == 12
+    assert moved.end_column == 15
+    assert token.column == 2
+
+
+def test_parser_parse_template():
+    parser = Parser()
+    result = parser.parse_template('a + 1', 7)
+    assert result.data == 'absolute_expression'
+    token = result.find_first_token()
+    assert token.column == 7
+    assert token.end_column == 8
+    assert list(parser.templates) == ['a + 1']
+
+
+def test_parser_parse_template_service():
+    result = Parser().parse_template("s call x: 'a'", 1)
+    assert result.data == 'service'
+
+
+def test_parser_parse_template_error():
+    with raises(UnexpectedInput):
+        Parser().parse_template('a = 1', 1)
+
+
+@mark.parametrize('code', ['break', 'then', 'x.then'])
+def test_parser_parse_template_keyword(code):
+    """
+    Ensures that keywords aren't read as names inside templates
+    """
+    parser = Parser()
+    assert parser.parse_template(code, 1) is None
+    assert parser.templates == {code: False}
+
+
+def test_parser_parse_template_keyword_cached(patch, parser):
+    parser.templates['break'] = False
+    patch.object(Parser, 'move_tree')
+    assert parser.parse_template('break', 1) is None
+    assert Parser.move_tree.call_count == 0
+
+
+def test_parser_parse_template_start():
+    """
+    Ensures that the template start can't be written in a story
+    """
+    with raises(UnexpectedInput):
+        Parser().parse('<TEMPLATE_START> 1 + 1', allow_single_quotes=False)
+
+
+def test_parser_parse_template_cached(patch, magic, parser):
+    parser.templates['code'] = 'tree'
+    parser.templates['other'] = 'other'
+    patch.object(Parser, 'move_tree')
+    result = parser.parse_template('code', 3)
+    Parser.move_tree.assert_called_with('tree', 2)
+    assert result == Parser.move_tree()
+    assert list(parser.templates) == ['other', 'code']
+
+
+def test_parser_parse_template_evict(patch):
+    parser = Parser()
+    patch.object(Parser, 'templates_size', 2)
+    for code in ['a', 'b', 'c']:
+        parser.parse_template(code, 1)
+    assert list(parser.templates) == ['b', 'c']
+
+
+def test_parser_parse_template_earley(parser):
+    parser.algo = 'earley'
+    assert parser.parse_template('code', 1) is None
+
+
 def test_parser_lex(patch, parser):
     patch.many(Parser, ['indenter'])
     result = parser.lex('source')
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+from lark.parsers.lalr_analysis import Reduce, Shift
+
+from pytest import fixture
+
+from storyscript.parser import ParserCache
+
+
+@fixture
+def cache(tmpdir):
+    return ParserCache(directory=str(tmpdir))
+
+
+def test_parsercache_init(cache, tmpdir):
+    assert cache.directory == str(tmpdir)
+
+
+def test_parsercache_init_default(patch):
+    patch.object(ParserCache, 'default_directory')
+    assert ParserCache().directory == ParserCache.default_directory()
+
+
+def test_parsercache_default_directory(patch):
+    patch.object(os, 'getenv', return_value='/cache')
+    assert ParserCache.default_directory() == '/cache'
+
+
+def test_parsercache_default_directory_xdg(patch):
+    env = {'XDG_CACHE_HOME': '/xdg'}
+    patch.object(os, 'getenv', side_effect=env.get)
+    assert ParserCache.default_directory() == '/xdg/storyscript'
+
+
+def test_parsercache_key():
+    key = ParserCache.key('grammar', 'lalr')
+    assert key == ParserCache.key('grammar', 'lalr')
+    assert key != ParserCache.key('grammar2', 'lalr')
+    assert key != ParserCache.key('grammar', 'earley')
+
+
+def test_parsercache_dumps_loads():
+    data = ParserCache.dumps({'actions': [Shift, Reduce]})
+    result = ParserCache.loads(data)
+    assert result['actions'][0] is Shift
+    assert result['actions'][1] is Reduce
+
+
+def test_parsercache_path(cache):
+    assert cache.path('key') == os.path.join(cache.directory,
+                                             'parser-key.pickle')
+
+
+def test_parsercache_save_load(cache):
+    cache.save('key', {'actions': [Shift, Reduce]})
+    result = cache.load('key')
+    assert result['actions'][0] is Shift
+    assert result['actions'][1] is Reduce
+    assert os.listdir(cache.directory) == ['parser-key.pickle']
+
+
+def test_parsercache_load_used(cache):
+    cache.save('key', 'parser')
+    os.utime(cache.path('key'), (0, 0))
+    assert cache.load('key') == 'parser'
+    assert os.path.getmtime(cache.path('key')) > 0
+
+
+def test_parsercache_load_missing(cache):
+    assert cache.load('key') is None
+
+
+def test_parsercache_load_invalid(cache):
+    with open(cache.path('key'), 'w') as f:
+        f.write('invalid')
+    assert cache.load('key') is None
+
+
+def test_parsercache_save_error(cache):
+    cache.directory = os.path.join(cache.directory, 'file')
+    open(cache.directory, 'w').close()
+    cache.save('key', 'parser')
+    assert cache.load('key') is None
+
+
+def test_parsercache_write(tmpdir):
+    path = tmpdir.join('dir', 'file')
+    ParserCache.write(str(path), lambda: b'data')
+    assert path.read_binary() == b'data'
+    assert tmpdir.join('dir').listdir() == [path]
+
+
+def test_parsercache_write_error(tmpdir):
+    def dump():
+        raise ValueError()
+
+    ParserCache.write(str(tmpdir.join('file')), dump)
+    assert tmpdir.listdir() == []
+
+
+def test_parsercache_used_missing(tmpdir):
+    ParserCache.used(str(tmpdir.join('missing')))
+    assert tmpdir.listdir() == []
+
+
+def test_parsercache_prune(tmpdir):
+    for name, mtime in (('old.pickle', 0), ('old.tmp', 0), ('old.txt', 0),
+                        ('new.pickle', time.time())):
+        tmpdir.join(name).write('')
+        os.utime(str(tmpdir.join(name)), (mtime, mtime))
+    tmpdir.mkdir('stories')
+    ParserCache.prune(str(tmpdir), ('.pickle', '.tmp'), 60)
+    assert sorted(tmpdir.listdir()) == [tmpdir.join('new.pickle'),
+                                        tmpdir.join('old.txt'),
+                                        tmpdir.join('stories')]
+
+
+def test_parsercache_prune_entries(tmpdir):
+    for i in range(3):
+        tmpdir.join(f'{i}.json').write('')
+        os.utime(str(tmpdir.join(f'{i}.json')), (i, i))
+    ParserCache.prune(str(tmpdir), ('.json',), time.time(), max_entries=2)
+    assert sorted(tmpdir.listdir()) == [tmpdir.join('1.json'),
+                                        tmpdir.join('2.json')]
+
+
+def test_parsercache_prune_missing(tmpdir):
+    ParserCache.prune(str(tmpdir.join('missing')), ('.pickle',), 60)
+
+
+def test_parsercache_save_prune(patch, cache):
+    patch.object(ParserCache, 'prune')
+    cache.save('key', 'parser')
+    ParserCache.prune.assert_called_with(cache.directory, ('.pickle', '.tmp'),
+                                         ParserCache.max_age)
+
+
+def test_parsercache_get(patch, cache, magic):
+    build = magic(return_value='parser')
+    patch.object(ParserCache, 'key', return_value='key')
+    assert cache.get('grammar', 'lalr', build) == 'parser'
+    ParserCache.key.assert_called_with('grammar', 'lalr')
+    assert cache.load('key') == 'parser'
+    build.reset_mock()
+    assert cache.get('grammar', 'lalr', build) == 'parser'
+    build.assert_not_called()
@@ -143,6 +143,33 @@ def test_transformer_when_block_no_command(patch, tree):
     ])
 
 
+def test_transformer_init():
+    transformer = Transformer(allow_single_quotes=True)
+    assert transformer.allow_single_quotes is True
+    assert transformer.error is None
+
+
+def test_transformer_reduce(patch):
+    patch.object(Transformer, 'path')
+    transformer = Transformer()
+    result = transformer.reduce('path', ['matches'])
+    Transformer.path.assert_called_with(['matches'])
+    assert result == Transformer.path()
+
+
+def test_transformer_reduce_error(patch):
+    """
+    Ensures errors are deferred and plain trees are built afterwards
+    """
+    error = StorySyntaxError('error')
+    patch.object(Transformer, 'path', side_effect=error)
+    transformer = Transformer()
+    assert transformer.reduce('path', ['a']) == Tree('path', ['a'])
+    assert transformer.reduce('path', ['b']) == Tree('path', ['b'])
+    assert Transformer.path.call_count == 1
+    assert transformer.error is error
+
+
 @mark.parametrize('rule', ['start', 'line', 'block', 'statement'])
 def test_transformer_rules(rule):
     result = getattr(Transformer(), rule)(['matches'])
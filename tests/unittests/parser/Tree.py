@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-from unittest.mock import call
-
 from lark.lexer import Token
 from lark.tree import Tree as LarkTree
 
@@ -41,22 +39,61 @@ def test_tree_walk_token():
     assert result == inner_tree
 
 
+def test_tree_lookup():
+    inner = Tree('inner', [])
+    tree = Tree('rule', [Token('test', 'test'), inner, Tree('inner', [])])
+    assert tree.lookup('inner') is inner
+    assert tree.lookup('missing') is None
+
+
+def test_tree_lookup_children_modified():
+    tree = Tree('rule', [])
+    assert tree.lookup('inner') is None
+    inner = Tree('inner', [])
+    tree.children.append(inner)
+    assert tree.lookup('inner') is inner
+    tree.children[0] = Tree('other', [])
+    assert tree.lookup('inner') is None
+    tree.children = [inner]
+    assert tree.lookup('inner') is inner
+    tree.children.pop()
+    assert tree.lookup('inner') is None
+
+
+def test_tree_lookup_insert_replace():
+    tree = Tree('rule', [Tree('inner', [])])
+    inner = Tree('inner', [])
+    tree.insert(inner)
+    assert tree.lookup('inner') is inner
+    other = Tree('inner', [])
+    tree.replace(0, other)
+    assert tree.lookup('inner') is other
+
+
+def test_tree_lookup_child_renamed():
+    inner = Tree('inner', [])
+    tree = Tree('rule', [inner])
+    assert tree.lookup('inner') is inner
+    inner.rename('other')
+    assert tree.lookup('inner') is None
+    assert tree.lookup('other') is inner
+    inner.data = 'inner'
+    assert tree.lookup('inner') is inner
+
+
 def test_tree_node(patch):
-    patch.object(Tree, 'walk')
+    patch.object(Tree, 'lookup')
     tree = Tree('rule', [])
     result = tree.node('inner')
-    Tree.walk.assert_called_with(tree, 'inner')
-    assert result == Tree.walk()
+    Tree.lookup.assert_called_with('inner')
+    assert result == Tree.lookup()
 
 
-def test_tree_node_nested(patch):
-    patch.object(Tree, 'walk')
-    tree = Tree('rule', [])
-    result = tree.node('inner.nested')
-    assert len(Tree.walk.call_args_list) == 2
-    assert Tree.walk.call_args_list[0] == call(tree, 'inner')
-    assert Tree.walk.call_args_list[1] == call(Tree.walk(), 'nested')
-    assert result == Tree.walk()
+def test_tree_node_nested():
+    nested = Tree('nested', [])
+    tree = Tree('rule', [Tree('inner', [nested])])
+    assert tree.node('inner.nested') is nested
+    assert tree.node('inner.missing') is None
 
 
 def test_tree_first_child():
@@ -165,6 +202,12 @@ def test_tree_attributes(patch):
     assert result == Tree.node()
 
 
+def test_tree_private_attributes():
+    tree = Tree('master', [Tree('_private', [])])
+    with raises(AttributeError):
+        tree._private
+
+
 def test_tree_find():
     """
     Ensures Tree.find can find the correct subtree.
@@ -215,6 +258,34 @@ def test_tree_find_first_token_none():
     assert tree.find_first_token() is None
 
 
+def test_tree_find_first_token_nested_modified():
+    token = Token('X', 'x')
+    leaf = Tree('leaf', [token])
+    tree = Tree('start', [Tree('inner', [leaf])])
+    assert tree.find_first_token() is token
+    other = Token('Y', 'y')
+    leaf.insert(other)
+    assert tree.find_first_token() is other
+
+
+def test_tree_line_token_moved():
+    """
+    Ensures that cached positions follow changes of the token position
+    """
+    token = Token('WORD', 'word', line=1)
+    tree = Tree('outer', [Tree('path', [token])])
+    assert tree.line() == '1'
+    token.line = 2
+    assert tree.line() == '2'
+
+
+def test_tree_line_subtree_rewritten():
+    tree = Tree('outer', [Tree('path', [Token('WORD', 'word', line=1)])])
+    assert tree.line() == '1'
+    tree.path.replace(0, Token('WORD', 'word', line=3))
+    assert tree.line() == '3'
+
+
 def test_tree_extract():
     target = Tree('target', [])
     tree = Tree('tree', [target, Tree('more', [target])])